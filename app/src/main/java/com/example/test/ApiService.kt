@@ -26,7 +26,18 @@ interface ApiService {
     suspend fun getProductsSuspend(
         @Query("skip") skip: Int = 0,
         @Query("limit") limit: Int = 50,
-        @Query("search") search: String? = null
+        @Query("search") search: String? = null,
+        @Query("search_id") searchId: String? = null,
+        @Query("progressive") progressive: Boolean = false
+    ): Response<ProductsResponse>
+    
+    // Результат фонового поиска во внешнем источнике (прогрессивный режим)
+    @GET("/products/pending/{token}")
+    suspend fun getPendingProducts(
+        @Path("token") token: String,
+        @Query("search") search: String,
+        @Query("skip") skip: Int = 0,
+        @Query("limit") limit: Int = 50
     ): Response<ProductsResponse>
     
     @GET("/products/popular")
@@ -36,6 +47,10 @@ interface ApiService {
         @Query("category") category: String = "электроника"
     ): Response<ProductsResponse>
     
+    // Ссылки "Купить" для всех товаров страницы
+    @POST("/products/urls")
+    suspend fun resolveProductUrls(@Body request: ProductUrlsRequest): Response<ProductUrlsResponse>
+    
     @GET("/products/{id}")
     suspend fun getProductByIdSuspend(@Path("id") productId: Int): Response<ProductWithPricesResponse>
     
@@ -46,7 +61,9 @@ interface ApiService {
     @GET("/user/view-history")
     suspend fun getViewHistory(
         @Query("skip") skip: Int = 0,
-        @Query("limit") limit: Int = 50
+        @Query("limit") limit: Int = 50,
+        @Query("cursor") cursor: String? = null,
+        @Query("include_total") includeTotal: Boolean = true
     ): Response<ViewHistoryListResponse>
     
     @DELETE("/user/view-history")
@@ -59,7 +76,9 @@ interface ApiService {
     @GET("/favorites")
     suspend fun getFavorites(
         @Query("skip") skip: Int = 0,
-        @Query("limit") limit: Int = 50
+        @Query("limit") limit: Int = 50,
+        @Query("cursor") cursor: String? = null,
+        @Query("include_total") includeTotal: Boolean = true
     ): Response<FavoritesListResponse>
     
     @DELETE("/favorites/{product_id}")
@@ -72,7 +91,9 @@ interface ApiService {
     @GET("/user/price-alerts")
     suspend fun getPriceAlerts(
         @Query("skip") skip: Int = 0,
-        @Query("limit") limit: Int = 50
+        @Query("limit") limit: Int = 50,
+        @Query("cursor") cursor: String? = null,
+        @Query("include_total") includeTotal: Boolean = true
     ): Response<PriceAlertsListResponse>
     
     @DELETE("/user/price-alerts/{alert_id}")
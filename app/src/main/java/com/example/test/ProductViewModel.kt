@@ -5,8 +5,10 @@ import androidx.lifecycle.MutableLiveData
 import androidx.lifecycle.ViewModel
 import androidx.lifecycle.viewModelScope
 import kotlinx.coroutines.Dispatchers
+import kotlinx.coroutines.Job
 import kotlinx.coroutines.async
 import kotlinx.coroutines.awaitAll
+import kotlinx.coroutines.delay
 import kotlinx.coroutines.launch
 import kotlinx.coroutines.withContext
 
@@ -14,6 +16,9 @@ class ProductViewModel : ViewModel() {
 
     companion object {
         const val PAGE_SIZE = 20
+        // Опрос фонового поиска во внешнем источнике
+        private const val PENDING_POLL_INTERVAL_MS = 1500L
+        private const val PENDING_POLL_MAX_ATTEMPTS = 40
     }
 
     private val _products = MutableLiveData<Resource<List<Product>>>()
@@ -22,10 +27,16 @@ class ProductViewModel : ViewModel() {
     private var allProducts = mutableListOf<Product>()
     var currentPage = 0
     private var isLastPage = false
+    // ID снимка поиска на сервере: следующие страницы читаются из него
+    private var currentSearchId: String? = null
+    // Опрос результата прогрессивного поиска (отменяется при новом поиске)
+    private var pendingJob: Job? = null
 
     fun loadProducts(searchQuery: String = "") {
         currentPage = 0
         isLastPage = false
+        currentSearchId = null
+        pendingJob?.cancel()
         viewModelScope.launch {
             // Проверяем кэш перед загрузкой с сервера
             val cacheKey = if (searchQuery.isEmpty()) "popular" else searchQuery
@@ -45,10 +56,12 @@ class ProductViewModel : ViewModel() {
                 val response = if (searchQuery.isEmpty()) {
                     RetrofitClient.apiService.getPopularProducts(limit = 10, useCache = true, category = "электроника")
                 } else {
+                    // Прогрессивный режим: товары из БД приходят сразу, внешние - позже
                     RetrofitClient.apiService.getProductsSuspend(
                         skip = currentPage * PAGE_SIZE,
                         limit = PAGE_SIZE,
-                        search = searchQuery
+                        search = searchQuery,
+                        progressive = true
                     )
                 }
 
@@ -63,7 +76,12 @@ class ProductViewModel : ViewModel() {
                         
                         // Сохраняем в кэш и обновляем UI на главном потоке
                         withContext(Dispatchers.Main) {
-                            ProductCache.putProducts(cacheKey, convertedProducts, 0, PAGE_SIZE)
+                            val pendingToken = productsResponse.pending_external
+                            // Неполный результат (без внешних товаров) не кэшируем
+                            if (pendingToken == null) {
+                                ProductCache.putProducts(cacheKey, convertedProducts, 0, PAGE_SIZE)
+                            }
+                            currentSearchId = productsResponse.search_id
                             
                             allProducts.clear()
                             allProducts.addAll(convertedProducts)
@@ -71,6 +89,10 @@ class ProductViewModel : ViewModel() {
                             // Для популярных товаров считаем, что это последняя страница
                             isLastPage = searchQuery.isEmpty() || convertedProducts.size < PAGE_SIZE
                             currentPage++
+                            
+                            if (pendingToken != null) {
+                                pollPendingExternal(searchQuery, pendingToken)
+                            }
                         }
                     } else {
                         _products.value = Resource.Error("Пустой ответ от сервера")
@@ -85,6 +107,47 @@ class ProductViewModel : ViewModel() {
         }
     }
 
+    /**
+     * Опрашивает сервер, пока не завершится фоновый поиск во внешнем источнике,
+     * и заменяет первую страницу полным результатом
+     */
+    private fun pollPendingExternal(searchQuery: String, token: String) {
+        pendingJob?.cancel()
+        pendingJob = viewModelScope.launch {
+            repeat(PENDING_POLL_MAX_ATTEMPTS) {
+                delay(PENDING_POLL_INTERVAL_MS)
+                try {
+                    val response = RetrofitClient.apiService.getPendingProducts(
+                        token = token,
+                        search = searchQuery,
+                        limit = PAGE_SIZE
+                    )
+                    if (!response.isSuccessful) {
+                        return@launch
+                    }
+                    val productsResponse = response.body() ?: return@launch
+                    if (productsResponse.pending_external != null) {
+                        return@repeat
+                    }
+                    
+                    val convertedProducts = withContext(Dispatchers.Default) {
+                        convertApiProductsToAppProductsParallel(productsResponse.products)
+                    }
+                    ProductCache.putProducts(searchQuery, convertedProducts, 0, PAGE_SIZE)
+                    currentSearchId = productsResponse.search_id
+                    currentPage = 1
+                    isLastPage = convertedProducts.size < PAGE_SIZE
+                    allProducts.clear()
+                    allProducts.addAll(convertedProducts)
+                    _products.value = Resource.Success(allProducts.toList())
+                    return@launch
+                } catch (t: Throwable) {
+                    android.util.Log.e("ProductViewModel", "Ошибка получения результата фонового поиска: ${t.message}")
+                }
+            }
+        }
+    }
+
     fun loadMoreProducts(searchQuery: String = "") {
         if (isLastPage) return
 
@@ -93,7 +156,8 @@ class ProductViewModel : ViewModel() {
                 val response = RetrofitClient.apiService.getProductsSuspend(
                     skip = currentPage * PAGE_SIZE,
                     limit = PAGE_SIZE,
-                    search = if (searchQuery.isNotEmpty()) searchQuery else null
+                    search = if (searchQuery.isNotEmpty()) searchQuery else null,
+                    searchId = currentSearchId
                 )
 
                 if (response.isSuccessful) {
@@ -106,6 +170,8 @@ class ProductViewModel : ViewModel() {
                         
                         // Обновляем UI на главном потоке
                         withContext(Dispatchers.Main) {
+                            // Сервер мог пересоздать снимок поиска, если старый истек
+                            productsResponse.search_id?.let { currentSearchId = it }
                             allProducts.addAll(convertedProducts)
                             _products.value = Resource.Success(allProducts.toList())
                             isLastPage = convertedProducts.size < PAGE_SIZE
@@ -131,7 +197,8 @@ class ProductViewModel : ViewModel() {
                 val response = RetrofitClient.apiService.getProductsSuspend(
                     skip = (currentPage + 1) * PAGE_SIZE,
                     limit = PAGE_SIZE,
-                    search = if (searchQuery.isNotEmpty()) searchQuery else null
+                    search = if (searchQuery.isNotEmpty()) searchQuery else null,
+                    searchId = currentSearchId
                 )
                 
                 if (response.isSuccessful) {
@@ -167,6 +234,8 @@ class ProductViewModel : ViewModel() {
     fun resetPagination() {
         currentPage = 0
         isLastPage = false
+        currentSearchId = null
+        pendingJob?.cancel()
         allProducts.clear()
     }
     
@@ -381,20 +381,18 @@ class Settings : BaseActivity() {
             try {
                 // Загружаем избранное
                 var allFavorites = mutableListOf<FavoriteResponse>()
-                var skip = 0
+                var cursor: String? = null
                 val limit = 50
                 
                 while (true) {
-                    val response = RetrofitClient.apiService.getFavorites(skip = skip, limit = limit)
+                    // Курсорная пагинация: загружаем страницы, пока сервер возвращает next_cursor
+                    val response = RetrofitClient.apiService.getFavorites(limit = limit, cursor = cursor, includeTotal = false)
                     if (response.isSuccessful) {
                         val favoritesList = response.body()
                         if (favoritesList != null) {
                             if (favoritesList.favorites.isNotEmpty()) {
                                 allFavorites.addAll(favoritesList.favorites)
-                                if (favoritesList.favorites.size < limit) {
-                                    break
-                                }
-                                skip += limit
+                                cursor = favoritesList.next_cursor ?: break
                             } else {
                                 // Нет больше товаров
                                 break
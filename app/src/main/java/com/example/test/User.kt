@@ -55,7 +55,26 @@ data class ProductWithPricesResponse(
 
 data class ProductsResponse(
     val products: List<ProductWithPricesResponse>,
-    val total: Int
+    val total: Int,
+    val search_id: String? = null,
+    val pending_external: String? = null
+)
+
+// Ссылки "Купить" для страницы товаров (один запрос на страницу)
+data class ProductUrlRequestItem(
+    val brand: String?,
+    val model: String?,
+    val title: String?,
+    val url: String? = null
+)
+
+data class ProductUrlsRequest(
+    val items: List<ProductUrlRequestItem>,
+    val partner_id: String? = null
+)
+
+data class ProductUrlsResponse(
+    val urls: List<String>
 )
 
 // История просмотров
@@ -67,7 +86,8 @@ data class ViewHistoryResponse(
 
 data class ViewHistoryListResponse(
     val views: List<ViewHistoryResponse>,
-    val total: Int
+    val total: Int?,
+    val next_cursor: String? = null
 )
 
 // Избранное
@@ -79,7 +99,8 @@ data class FavoriteResponse(
 
 data class FavoritesListResponse(
     val favorites: List<FavoriteResponse>,
-    val total: Int
+    val total: Int?,
+    val next_cursor: String? = null
 )
 
 // Отслеживание цен
@@ -98,7 +119,8 @@ data class PriceAlertResponse(
 
 data class PriceAlertsListResponse(
     val alerts: List<PriceAlertResponse>,
-    val total: Int
+    val total: Int?,
+    val next_cursor: String? = null
 )
 
 // Статистика
@@ -0,0 +1,109 @@
+"""
+Сравнение кодеков кэша: размер значения и время кодирования/декодирования
+
+Значения строятся так же, как их пишет ExternalDataService (конверт с
+результатами поиска), на синтетических товарах.
+
+Запуск:
+    python benchmark_cache_codec.py [количество_товаров] [повторов]
+"""
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from core.cache_codec import get_cache_codec
+from data_providers import ProductData
+from external_data_service import ExternalDataService
+
+BRANDS = ["Samsung", "Apple", "Xiaomi", "Huawei", "OnePlus", "Google", "Sony", "Asus"]
+
+
+def make_results(count: int) -> dict:
+    """Синтетические результаты поиска (как от парсера Яндекс.Маркет)"""
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    products = []
+    for i in range(count):
+        brand = rng.choice(BRANDS)
+        model = f"Model {rng.randint(1, 99)} Pro {rng.randint(64, 512)}GB"
+        products.append(ProductData(
+            title=f"Смартфон {brand} {model}, черный",
+            brand=brand,
+            model=model,
+            price=round(rng.uniform(5000, 150000), 2),
+            shop_name="Яндекс.Маркет",
+            url=f"https://market.yandex.ru/product--smartfon-{brand.lower()}-{i}/{rng.randint(10**8, 10**9)}",
+            image=f"https://avatars.mds.yandex.net/get-mpic/{rng.randint(10**6, 10**7)}/img_id{i}/orig",
+            description=None,
+            scraped_at=now - timedelta(seconds=rng.randint(0, 3600)),
+            product_id=None
+        ))
+    return {"Яндекс.Маркет": products}
+
+
+def legacy_value(results: dict) -> bytes:
+    """Значение в формате до кодеков: JSON с ISO-временем и всеми полями"""
+    serialized = {
+        shop_name: [
+            {
+                "title": p.title,
+                "brand": p.brand,
+                "model": p.model,
+                "price": p.price,
+                "shop_name": p.shop_name,
+                "url": p.url,
+                "image": p.image,
+                "description": p.description,
+                "scraped_at": p.scraped_at.isoformat() if p.scraped_at else None,
+                "product_id": p.product_id
+            }
+            for p in products
+        ]
+        for shop_name, products in results.items()
+    }
+    envelope = {"fetched_at": time.time(), "soft_ttl": 10800, "data": serialized}
+    return json.dumps(envelope, default=str).encode("utf-8")
+
+
+def measure(encode, decode, repeats: int):
+    """Размер значения и среднее время кодирования/декодирования (мс)"""
+    raw = encode()
+    started = time.perf_counter()
+    for _ in range(repeats):
+        encode()
+    encode_ms = (time.perf_counter() - started) / repeats * 1000
+    started = time.perf_counter()
+    for _ in range(repeats):
+        decode(raw)
+    decode_ms = (time.perf_counter() - started) / repeats * 1000
+    return len(raw), encode_ms, decode_ms
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    
+    service = ExternalDataService.__new__(ExternalDataService)
+    results = make_results(count)
+    serialized = service._serialize_products(results)
+    envelope = {"fetched_at": time.time(), "soft_ttl": 10800, "data": serialized}
+    
+    rows = [("legacy json", *measure(lambda: legacy_value(results), json.loads, repeats))]
+    for name in ("json", "zlib", "msgpack"):
+        codec = get_cache_codec(name)
+        if codec.name != name:
+            print(f"⚠️ Кодек {name} недоступен, пропущен")
+            continue
+        rows.append((name, *measure(lambda: codec.encode(envelope), codec.decode, repeats)))
+    
+    baseline = rows[0][1]
+    print(f"Товаров: {count}, повторов: {repeats}")
+    print(f"{'кодек':<12} {'байт':>8} {'доля':>7} {'encode, мс':>11} {'decode, мс':>11}")
+    for name, size, encode_ms, decode_ms in rows:
+        print(f"{name:<12} {size:>8} {size / baseline:>7.2f} {encode_ms:>11.3f} {decode_ms:>11.3f}")
+
+
+if __name__ == "__main__":
+    main()
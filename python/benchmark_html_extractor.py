@@ -0,0 +1,94 @@
+"""
+Сравнение разбора страницы поиска: BeautifulSoup и YandexMarketExtractor (lxml)
+
+По умолчанию используется синтетическая страница, похожая по структуре на
+выдачу Яндекс.Маркета (сниппеты с data-zone-name, фильтры, вложенные
+обертки). Можно передать сохраненные страницы поиска.
+
+Запуск:
+    python benchmark_html_extractor.py [страница.html ...] [--limit 30] [--repeats 5]
+"""
+import argparse
+import logging
+import random
+import time
+
+from yandex_market_parser import YandexMarketParser
+
+BRANDS = ["Samsung", "Apple", "Xiaomi", "Huawei", "OnePlus", "Google", "Sony", "Honor"]
+
+
+def make_page(snippets: int = 48, filters: int = 400, seed: int = 42) -> str:
+    """Синтетическая страница выдачи"""
+    rng = random.Random(seed)
+    parts = ['<!DOCTYPE html><html><head><meta charset="utf-8"><title>Поиск</title>']
+    parts.append('<script>window.__INITIAL_STATE__ = {"user": {"region": 213}, "experiments": []};</script>')
+    parts.append('</head><body><div class="page"><header class="header"><nav>')
+    parts.extend(f'<a href="/catalog/{i}">Категория {i}</a>' for i in range(60))
+    parts.append('</nav></header><div class="layout"><aside class="filters">')
+    for i in range(filters):
+        parts.append(
+            f'<div class="filter-row"><div class="filter-label"><span>Фильтр {i}</span></div>'
+            f'<div class="filter-values"><label><input type="checkbox"><span>Значение {i}</span></label>'
+            f'<label><input type="checkbox"><span>Еще {i}</span></label></div></div>'
+        )
+    parts.append('</aside><main><div class="serp">')
+    for i in range(snippets):
+        brand = rng.choice(BRANDS)
+        model = f"Model {rng.randint(1, 99)} Pro {rng.choice([64, 128, 256, 512])}GB"
+        price = rng.randint(5000, 150000)
+        parts.append(
+            f'<div class="serp-item"><div class="wrapper"><article data-zone-name="productSnippet" class="snippet-card">'
+            f'<div class="snippet-image"><img src="//avatars.mds.yandex.net/get-mpic/{i}/orig" alt=""></div>'
+            f'<div class="snippet-body"><div class="snippet-rating"><span>4.{rng.randint(0, 9)}</span>'
+            f'<span>{rng.randint(10, 999)} отзывов</span></div>'
+            f'<h3 data-zone-name="title"><a href="/product--smartfon-{i}/{rng.randint(10**8, 10**9)}">'
+            f'<span>Смартфон {brand} {model}, черный</span></a></h3>'
+            f'<ul class="specs">' + ''.join(f'<li>Характеристика {k}: значение</li>' for k in range(8)) + '</ul>'
+            f'<div data-zone-name="price"><span class="price-value">{price:,}'.replace(",", " ") + ' ₽</span>'
+            f'<span class="old-price">{price + 1000} ₽</span></div>'
+            f'<div class="snippet-shop"><a href="/shop/{i}">Магазин {i}</a></div></div>'
+            f'</article></div></div>'
+        )
+    parts.append('</div></main></div><footer class="footer">')
+    parts.extend(f'<div class="footer-col"><a href="/info/{i}">Ссылка {i}</a></div>' for i in range(80))
+    parts.append('</footer></div></body></html>')
+    return "".join(parts)
+
+
+def measure(extract, html: str, repeats: int):
+    """Результат и среднее время разбора (мс)"""
+    result = extract(html)
+    started = time.perf_counter()
+    for _ in range(repeats):
+        extract(html)
+    return result, (time.perf_counter() - started) / repeats * 1000
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Сравнение скорости разбора страницы поиска")
+    arg_parser.add_argument("pages", nargs="*", help="Сохраненные страницы поиска (HTML)")
+    arg_parser.add_argument("--limit", type=int, default=30)
+    arg_parser.add_argument("--repeats", type=int, default=5)
+    args = arg_parser.parse_args()
+    logging.disable(logging.CRITICAL)
+    
+    parser = YandexMarketParser()
+    if parser.extractor is None:
+        print("⚠️ lxml не установлен, сравнивать не с чем")
+        return
+    
+    pages = [(path, open(path, encoding="utf-8").read()) for path in args.pages] or [("синтетическая", make_page())]
+    print(f"{'страница':<24} {'KB':>6} {'soup, мс':>9} {'lxml, мс':>9} {'ускорение':>10} {'товаров':>8}  совпадают")
+    for name, html in pages:
+        soup_products, soup_ms = measure(lambda page: parser._extract_with_soup(page, "смартфон", args.limit), html, args.repeats)
+        fast_products, fast_ms = measure(lambda page: parser.extractor.extract(page, "смартфон", args.limit), html, args.repeats)
+        same = [(p.title, p.price, p.url) for p in fast_products] == [(p.title, p.price, p.url) for p in soup_products]
+        print(
+            f"{name[:24]:<24} {len(html.encode()) // 1024:>6} {soup_ms:>9.1f} {fast_ms:>9.1f} "
+            f"{soup_ms / fast_ms:>9.1f}x {len(fast_products):>8}  {'да' if same else 'нет'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Прогрев кэша: популярные товары по категориям и частые поисковые запросы
+
+Периодически обновляет в кэше популярные товары для каждой категории
+YandexMarketParser.POPULAR_CATEGORY_QUERIES и результаты самых частых
+поисковых запросов, не превышая бюджет обращений к внешнему источнику
+за один проход. Свежие записи не обновляются.
+
+Работает как фоновая задача asyncio в приложении (CACHE_WARMER_ENABLED=true,
+по умолчанию выключен - каждый проход обращается к Яндекс.Маркету)
+или отдельным процессом:
+    python cache_warmer.py [--once] [--interval 1800] [--budget 30] [--top 20]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import uuid
+from typing import Dict
+
+from dotenv import load_dotenv
+
+from external_data_service import ExternalDataService
+from yandex_market_parser import YandexMarketParser
+
+logger = logging.getLogger(__name__)
+
+
+class CacheWarmer:
+    """Периодический прогрев кэша внешних данных"""
+    
+    def __init__(
+        self,
+        service: ExternalDataService,
+        interval: int = 1800,
+        scrape_budget: int = 30,
+        trending_top: int = 20,
+        popular_limit: int = 10
+    ):
+        """
+        Args:
+            service: Сервис внешних данных
+            interval: Интервал между проходами в секундах
+            scrape_budget: Максимум обращений к внешнему источнику за проход
+            trending_top: Сколько частых запросов прогревать
+            popular_limit: Количество популярных товаров в категории (как запрашивает приложение)
+        """
+        self.service = service
+        self.interval = interval
+        self.scrape_budget = scrape_budget
+        self.trending_top = trending_top
+        self.popular_limit = popular_limit
+        self._instance_id = uuid.uuid4().hex
+    
+    def _acquire_run_lock(self) -> bool:
+        """Один проход на интервал для всех workers (блокировка в Redis)"""
+        if not self.service.redis_enabled:
+            return True
+        try:
+            lock_key = f"{self.service.key_builder.prefix}:warmer:lock"
+            return bool(self.service.redis_client.set(lock_key, self._instance_id, nx=True, ex=max(1, self.interval - 5)))
+        except Exception as e:
+            logger.warning(f"Не удалось взять блокировку прогрева кэша: {e}")
+            return True
+    
+    def warm_once(self, force: bool = False) -> Dict[str, int]:
+        """
+        Один проход прогрева
+        
+        Args:
+            force: Выполнить, даже если в этом интервале прогрев уже запускал другой worker
+        
+        Returns:
+            Статистика: обновлено категорий и запросов, пропущено свежих, остаток бюджета
+        """
+        stats = {"categories": 0, "queries": 0, "skipped_fresh": 0, "budget_left": self.scrape_budget}
+        if not self._acquire_run_lock() and not force:
+            logger.info("ℹ️ Прогрев кэша уже выполняется другим worker")
+            return stats
+        
+        for category in YandexMarketParser.POPULAR_CATEGORY_QUERIES:
+            if stats["budget_left"] <= 0:
+                break
+            if self.service.is_popular_cached(self.popular_limit, category):
+                stats["skipped_fresh"] += 1
+                continue
+            try:
+                self.service.get_popular_products(limit=self.popular_limit, use_cache=False, category=category)
+                stats["categories"] += 1
+            except Exception as e:
+                logger.error(f"Ошибка прогрева популярных товаров '{category}': {e}")
+            stats["budget_left"] -= 1
+        
+        for query in self.service.get_trending_queries(self.trending_top):
+            if stats["budget_left"] <= 0:
+                break
+            if self.service.is_search_cached(query):
+                stats["skipped_fresh"] += 1
+                continue
+            try:
+                self.service.aggregate_by_product(query, use_cache=False)
+                stats["queries"] += 1
+            except Exception as e:
+                logger.error(f"Ошибка прогрева запроса '{query}': {e}")
+            stats["budget_left"] -= 1
+        
+        logger.info(
+            f"🔥 Прогрев кэша: категорий {stats['categories']}, запросов {stats['queries']}, "
+            f"пропущено свежих {stats['skipped_fresh']}, остаток бюджета {stats['budget_left']}"
+        )
+        return stats
+    
+    async def run_forever(self) -> None:
+        """Проходы прогрева с интервалом interval (для фоновой задачи приложения)"""
+        while True:
+            try:
+                await asyncio.to_thread(self.warm_once)
+            except Exception as e:
+                logger.error(f"Ошибка прогрева кэша: {e}", exc_info=True)
+            await asyncio.sleep(self.interval)
+
+
+def main():
+    """Запуск прогрева отдельным процессом"""
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    
+    parser = argparse.ArgumentParser(description="Прогрев кэша популярных товаров и частых запросов")
+    parser.add_argument("--once", action="store_true", help="Один проход и выход")
+    parser.add_argument("--interval", type=int, default=int(os.getenv("CACHE_WARMER_INTERVAL", "1800")))
+    parser.add_argument("--budget", type=int, default=int(os.getenv("CACHE_WARMER_BUDGET", "30")))
+    parser.add_argument("--top", type=int, default=int(os.getenv("CACHE_WARMER_TOP_QUERIES", "20")))
+    args = parser.parse_args()
+    
+    service = ExternalDataService(
+        redis_host=os.getenv("REDIS_HOST", "localhost"),
+        redis_port=int(os.getenv("REDIS_PORT", "6379")),
+        redis_db=int(os.getenv("REDIS_DB", "0")),
+        cache_ttl=int(os.getenv("CACHE_TTL", "10800")),
+        redis_enabled=os.getenv("REDIS_ENABLED", "true").lower() in ("true", "1", "yes"),
+        cache_codec=os.getenv("CACHE_CODEC", "msgpack"),
+        cache_key_prefix=os.getenv("CACHE_KEY_PREFIX", "cache")
+    )
+    warmer = CacheWarmer(service, interval=args.interval, scrape_budget=args.budget, trending_top=args.top)
+    
+    if args.once:
+        warmer.warm_once(force=True)
+    else:
+        asyncio.run(warmer.run_forever())
+
+
+if __name__ == "__main__":
+    main()
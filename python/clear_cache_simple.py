@@ -33,24 +33,33 @@ def clear_cache():
         print("✅ Подключение к Redis успешно")
         print()
         
-        # Подсчет ключей перед очисткой
-        all_keys = redis_client.keys("*")
-        keys_count = len(all_keys)
-        print(f"📊 Найдено ключей в кэше: {keys_count}")
+        # Сброс поколений ключей: приложение сразу перестает читать старый кэш
+        import json
+        from core.cache_keys import CACHE_INVALIDATION_CHANNEL, CacheKeyBuilder, LEGACY_PATTERNS, NAMESPACES
+        key_builder = CacheKeyBuilder(
+            redis_client,
+            prefix=os.getenv("CACHE_KEY_PREFIX", "cache")
+        )
+        for namespace in NAMESPACES:
+            generation = key_builder.invalidate(namespace, purge=False)
+            print(f"✅ Кэш '{namespace}' сброшен (поколение {generation})")
+            # Запущенные workers сбрасывают кэш в памяти и запомненное поколение
+            redis_client.publish(
+                CACHE_INVALIDATION_CHANNEL,
+                json.dumps({"origin": "clear_cache_simple", "namespace": namespace})
+            )
+        
+        # Удаление старых ключей через SCAN + UNLINK пачками (без KEYS *, не блокирует Redis)
+        deleted = 0
+        for namespace in NAMESPACES:
+            deleted += key_builder.purge_stale(namespace)
+        for pattern in (*LEGACY_PATTERNS, "search_session:*"):
+            deleted += key_builder.purge(pattern)
         
-        if all_keys:
-            # Очистка всех ключей
-            deleted = redis_client.delete(*all_keys)
+        if deleted:
             print(f"✅ Удалено ключей: {deleted}")
         else:
             print("ℹ️ Кэш уже пуст")
-        
-        # Проверка
-        remaining_keys = redis_client.keys("*")
-        if remaining_keys:
-            print(f"⚠️ Осталось ключей: {len(remaining_keys)}")
-        else:
-            print("✅ Все ключи удалены")
             
     except (redis.ConnectionError, redis.TimeoutError, TimeoutError):
         print("ℹ️ Redis не доступен (не запущен или недоступен)")
@@ -23,6 +23,25 @@ class Settings:
     REDIS_PORT: int = int(os.getenv("REDIS_PORT", "6379"))
     REDIS_DB: int = int(os.getenv("REDIS_DB", "0"))
     CACHE_TTL: int = int(os.getenv("CACHE_TTL", "10800"))  # 3 часа
+    CACHE_STALE_TTL: int = int(os.getenv("CACHE_STALE_TTL", "3600"))  # stale-while-revalidate, 1 час
+    SEARCH_SESSION_TTL: int = int(os.getenv("SEARCH_SESSION_TTL", "600"))  # 10 минут
+    LOCAL_CACHE_SIZE: int = int(os.getenv("LOCAL_CACHE_SIZE", "256"))  # Записей в памяти процесса
+    LOCAL_CACHE_TTL: int = int(os.getenv("LOCAL_CACHE_TTL", "60"))  # 1 минута
+    NEGATIVE_CACHE_TTL: int = int(os.getenv("NEGATIVE_CACHE_TTL", "120"))  # 2 минуты
+    CACHE_CODEC: str = os.getenv("CACHE_CODEC", "msgpack")  # json, zlib или msgpack
+    CACHE_KEY_PREFIX: str = os.getenv("CACHE_KEY_PREFIX", "cache")
+    POPULAR_FETCH_LIMIT: int = int(os.getenv("POPULAR_FETCH_LIMIT", "50"))  # Популярных товаров категории в кэше
+    CACHE_WARMER_ENABLED: bool = os.getenv("CACHE_WARMER_ENABLED", "false").lower() in ("true", "1", "yes")  # Прогрев обращается к Яндекс.Маркету
+    CACHE_WARMER_INTERVAL: int = int(os.getenv("CACHE_WARMER_INTERVAL", "1800"))  # 30 минут
+    CACHE_WARMER_BUDGET: int = int(os.getenv("CACHE_WARMER_BUDGET", "30"))
+    CACHE_WARMER_TOP_QUERIES: int = int(os.getenv("CACHE_WARMER_TOP_QUERIES", "20"))
+    HTTP_POOL_CONNECTIONS: int = int(os.getenv("HTTP_POOL_CONNECTIONS", "10"))  # Хостов в пуле HTTP-соединений
+    HTTP_POOL_MAXSIZE: int = int(os.getenv("HTTP_POOL_MAXSIZE", "20"))  # Соединений на хост
+    HTTP_CONNECT_TIMEOUT: float = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+    HTTP_READ_TIMEOUT: float = float(os.getenv("HTTP_READ_TIMEOUT", "20"))
+    SELENIUM_POOL_SIZE: int = int(os.getenv("SELENIUM_POOL_SIZE", "2"))  # Браузеров в пуле
+    SELENIUM_MAX_PAGES: int = int(os.getenv("SELENIUM_MAX_PAGES", "50"))  # Страниц до пересоздания браузера
+    SELENIUM_CHECKOUT_TIMEOUT: float = float(os.getenv("SELENIUM_CHECKOUT_TIMEOUT", "30"))
     
     # JWT
     SECRET_KEY: str = os.getenv(
@@ -52,6 +71,9 @@ class Settings:
     # External Services
     YANDEX_MARKET_TIMEOUT: int = 60  # секунд
     YANDEX_MARKET_HEADLESS: bool = True
+    EXTERNAL_SEARCH_DEADLINE: float = float(os.getenv("EXTERNAL_SEARCH_DEADLINE", "20"))  # секунд
+    EXTERNAL_SEARCH_WORKERS: int = int(os.getenv("EXTERNAL_SEARCH_WORKERS", "8"))
+    PENDING_SEARCH_TTL: int = int(os.getenv("PENDING_SEARCH_TTL", "300"))  # 5 минут
     
     # Yandex Market OAuth API
     YANDEX_OAUTH_TOKEN: Optional[str] = os.getenv("YANDEX_OAUTH_TOKEN")
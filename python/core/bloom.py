@@ -0,0 +1,102 @@
+"""
+Фильтр Блума в памяти процесса
+
+Используется для запросов, по которым недавно ничего не нашлось: проверка
+фильтра дешевле даже обращения к Redis. Фильтр не умеет удалять элементы,
+поэтому он ротируется поколениями - элемент забывается через 1-2 интервала.
+"""
+import hashlib
+import math
+import threading
+import time
+from typing import List
+
+
+class BloomFilter:
+    """Фильтр Блума фиксированного размера"""
+    
+    def __init__(self, capacity: int = 10000, error_rate: float = 0.001):
+        """
+        Args:
+            capacity: Ожидаемое количество элементов
+            error_rate: Допустимая доля ложноположительных ответов при capacity элементах
+        """
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+    
+    def _positions(self, item: str) -> List[int]:
+        """Номера битов элемента (двойное хэширование)"""
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+    
+    def add(self, item: str) -> None:
+        """Добавление элемента"""
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+    
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RotatingBloomFilter:
+    """
+    Потокобезопасный фильтр Блума из двух поколений
+    
+    Элементы добавляются в текущее поколение, проверяются оба. Раз в
+    rotation_interval секунд (или при заполнении текущего поколения)
+    текущее поколение становится предыдущим, а старое предыдущее
+    отбрасывается.
+    """
+    
+    def __init__(self, capacity: int = 10000, error_rate: float = 0.001, rotation_interval: float = 60.0):
+        """
+        Args:
+            capacity: Ожидаемое количество элементов в одном поколении
+            error_rate: Доля ложноположительных ответов одного поколения
+            rotation_interval: Время жизни поколения в секундах
+        """
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.rotation_interval = rotation_interval
+        self._current = BloomFilter(capacity, error_rate)
+        self._previous = BloomFilter(capacity, error_rate)
+        self._rotated_at = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _rotate_if_needed_locked(self) -> None:
+        """Смена поколений по времени или при заполнении"""
+        now = time.monotonic()
+        if now - self._rotated_at >= 2 * self.rotation_interval:
+            # Оба поколения устарели
+            self._previous = BloomFilter(self.capacity, self.error_rate)
+            self._current = BloomFilter(self.capacity, self.error_rate)
+            self._rotated_at = now
+        elif now - self._rotated_at >= self.rotation_interval or self._current.count >= self.capacity:
+            self._previous = self._current
+            self._current = BloomFilter(self.capacity, self.error_rate)
+            self._rotated_at = now
+    
+    def add(self, item: str) -> None:
+        """Добавление элемента"""
+        with self._lock:
+            self._rotate_if_needed_locked()
+            self._current.add(item)
+    
+    def clear(self) -> None:
+        """Удаление всех элементов"""
+        with self._lock:
+            self._current = BloomFilter(self.capacity, self.error_rate)
+            self._previous = BloomFilter(self.capacity, self.error_rate)
+            self._rotated_at = time.monotonic()
+    
+    def __contains__(self, item: str) -> bool:
+        with self._lock:
+            self._rotate_if_needed_locked()
+            return item in self._current or item in self._previous
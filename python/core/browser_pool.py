@@ -0,0 +1,190 @@
+"""
+Пул браузеров Selenium
+
+Браузеры запускаются заранее (или при первой нужде) и переиспользуются между
+поисками вместо холодного старта Chrome на каждый запрос. Пул ограничен по
+размеру: если все браузеры заняты, запрос ждет освобождения не дольше
+checkout_timeout. Браузер проверяется перед выдачей и пересоздается после
+max_pages страниц (защита от утечек памяти Chrome).
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BrowserPoolTimeout(TimeoutError):
+    """Все браузеры пула заняты дольше checkout_timeout"""
+
+
+class _PooledBrowser:
+    """Браузер пула и количество открытых в нем страниц"""
+    
+    def __init__(self, driver: Any):
+        self.driver = driver
+        self.pages = 0
+
+
+class BrowserPool:
+    """Ограниченный пул WebDriver с выдачей/возвратом, проверкой и пересозданием"""
+    
+    def __init__(
+        self,
+        driver_factory: Callable[[], Any],
+        size: int = 2,
+        max_pages: int = 50,
+        checkout_timeout: float = 30.0
+    ):
+        """
+        Args:
+            driver_factory: Создание нового WebDriver
+            size: Максимальное количество браузеров
+            max_pages: Сколько страниц открыть в браузере до его пересоздания
+            checkout_timeout: Сколько секунд ждать свободный браузер
+        """
+        self.driver_factory = driver_factory
+        self.size = max(1, size)
+        self.max_pages = max_pages
+        self.checkout_timeout = checkout_timeout
+        self._idle: "queue.LifoQueue[_PooledBrowser]" = queue.LifoQueue()
+        self._created = 0
+        self._recycled = 0
+        self._lock = threading.Lock()
+        self._closed = False
+        atexit.register(self.close)
+    
+    def warm(self, count: int = 1) -> None:
+        """Запуск браузеров заранее (ошибка запуска пробрасывается)"""
+        for _ in range(min(count, self.size)):
+            browser = self._create()
+            if browser is None:
+                return
+            self._idle.put(browser)
+    
+    def _create(self) -> Optional[_PooledBrowser]:
+        """Запуск нового браузера, если пул не заполнен (None, если заполнен)"""
+        with self._lock:
+            if self._created >= self.size:
+                return None
+            self._created += 1
+        try:
+            started = time.perf_counter()
+            browser = _PooledBrowser(self.driver_factory())
+            logger.info(f"🌐 Запущен браузер пула за {time.perf_counter() - started:.1f} с ({self._created}/{self.size})")
+            return browser
+        except BaseException:
+            with self._lock:
+                self._created -= 1
+            raise
+    
+    def _discard(self, browser: _PooledBrowser) -> None:
+        """Закрытие браузера и освобождение места в пуле"""
+        try:
+            browser.driver.quit()
+        except Exception as e:
+            logger.debug(f"Ошибка закрытия браузера: {e}")
+        with self._lock:
+            self._created -= 1
+    
+    @staticmethod
+    def _is_alive(browser: _PooledBrowser) -> bool:
+        """Проверка, что браузер отвечает"""
+        try:
+            browser.driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+    
+    def checkout(self, timeout: Optional[float] = None) -> _PooledBrowser:
+        """
+        Выдача браузера: свободный, новый (если пул не заполнен) или ожидание
+        
+        Args:
+            timeout: Сколько ждать свободный браузер (по умолчанию checkout_timeout)
+        
+        Returns:
+            Браузер пула (вернуть через checkin)
+        
+        Raises:
+            BrowserPoolTimeout: Свободный браузер не появился за timeout
+        """
+        if self._closed:
+            raise RuntimeError("Пул браузеров закрыт")
+        deadline = time.monotonic() + (self.checkout_timeout if timeout is None else timeout)
+        
+        while True:
+            try:
+                browser = self._idle.get_nowait()
+            except queue.Empty:
+                browser = self._create()
+                if browser is None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise BrowserPoolTimeout(f"Нет свободного браузера за {self.checkout_timeout} с")
+                    # Ожидание короткими интервалами: место в пуле может освободиться
+                    # и без возврата браузера в очередь (закрытие неисправного)
+                    try:
+                        browser = self._idle.get(timeout=min(remaining, 0.5))
+                    except queue.Empty:
+                        continue
+            
+            if self._is_alive(browser):
+                return browser
+            logger.warning("⚠️ Браузер пула не отвечает, пересоздаю")
+            self._discard(browser)
+    
+    def checkin(self, browser: _PooledBrowser, healthy: bool = True) -> None:
+        """
+        Возврат браузера в пул
+        
+        Args:
+            browser: Браузер, полученный через checkout
+            healthy: False - браузер закрывается (например, после ошибки WebDriver)
+        """
+        browser.pages += 1
+        if self._closed or not healthy or browser.pages >= self.max_pages:
+            if healthy and not self._closed:
+                with self._lock:
+                    self._recycled += 1
+                logger.info(f"♻️ Браузер пула пересоздается после {browser.pages} страниц")
+            self._discard(browser)
+            return
+        self._idle.put(browser)
+    
+    @contextmanager
+    def browser(self, timeout: Optional[float] = None) -> Iterator[Any]:
+        """
+        Браузер на время блока with (возвращается в пул и при ошибке)
+        
+        Yields:
+            WebDriver
+        """
+        browser = self.checkout(timeout)
+        healthy = True
+        try:
+            yield browser.driver
+        except Exception:
+            healthy = self._is_alive(browser)
+            raise
+        finally:
+            self.checkin(browser, healthy=healthy)
+    
+    def stats(self) -> Dict[str, int]:
+        """Размер пула: запущено, свободно, пересоздано по max_pages"""
+        with self._lock:
+            return {"size": self.size, "created": self._created, "idle": self._idle.qsize(), "recycled": self._recycled}
+    
+    def close(self) -> None:
+        """Закрытие свободных браузеров; занятые закрываются при возврате"""
+        self._closed = True
+        while True:
+            try:
+                browser = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(browser)
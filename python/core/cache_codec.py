@@ -0,0 +1,113 @@
+"""
+Кодеки значений кэша в Redis
+
+Формат значения определяется первым байтом, поэтому любой кодек читает
+записи, сделанные любым другим (и старые записи в JSON без заголовка):
+- "{" / "[" - JSON без сжатия (старый формат);
+- 0x01 - JSON, сжатый zlib;
+- 0x02 - msgpack, сжатый zlib.
+
+Кодек для записи выбирается переменной окружения CACHE_CODEC
+(json, zlib или msgpack). Если msgpack не установлен, используется zlib.
+"""
+import json
+import logging
+import zlib
+from typing import Any, Union
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+VERSION_ZLIB_JSON = b"\x01"
+VERSION_ZLIB_MSGPACK = b"\x02"
+
+# Уровень сжатия: выше 6 почти не уменьшает размер, но заметно медленнее
+ZLIB_LEVEL = 6
+
+
+class JsonCodec:
+    """JSON без сжатия (формат, который использовался до кодеков)"""
+    
+    name = "json"
+    
+    def encode(self, value: Any) -> bytes:
+        return json.dumps(value, default=str, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    
+    def decode(self, raw: Union[bytes, str]) -> Any:
+        return decode_cache_value(raw)
+
+
+class ZlibJsonCodec(JsonCodec):
+    """JSON, сжатый zlib (не требует дополнительных зависимостей)"""
+    
+    name = "zlib"
+    
+    def encode(self, value: Any) -> bytes:
+        return VERSION_ZLIB_JSON + zlib.compress(super().encode(value), ZLIB_LEVEL)
+
+
+class MsgpackCodec(JsonCodec):
+    """msgpack, сжатый zlib"""
+    
+    name = "msgpack"
+    
+    def encode(self, value: Any) -> bytes:
+        packed = msgpack.packb(value, default=str, use_bin_type=True)
+        return VERSION_ZLIB_MSGPACK + zlib.compress(packed, ZLIB_LEVEL)
+
+
+def decode_cache_value(raw: Union[bytes, str]) -> Any:
+    """
+    Декодирование значения кэша в любом из поддерживаемых форматов
+    
+    Args:
+        raw: Значение из Redis
+    
+    Returns:
+        Декодированное значение
+    
+    Raises:
+        ValueError: Если формат неизвестен или msgpack не установлен
+    """
+    if isinstance(raw, str):
+        return json.loads(raw)
+    
+    version = raw[:1]
+    if version == VERSION_ZLIB_JSON:
+        return json.loads(zlib.decompress(raw[1:]))
+    if version == VERSION_ZLIB_MSGPACK:
+        if msgpack is None:
+            raise ValueError("Запись кэша в формате msgpack, но msgpack не установлен")
+        return msgpack.unpackb(zlib.decompress(raw[1:]), raw=False)
+    return json.loads(raw)
+
+
+_CODECS = {
+    "json": JsonCodec,
+    "zlib": ZlibJsonCodec,
+    "msgpack": MsgpackCodec,
+}
+
+
+def get_cache_codec(name: str = "msgpack") -> JsonCodec:
+    """
+    Кодек по имени
+    
+    Args:
+        name: json, zlib или msgpack
+    
+    Returns:
+        Экземпляр кодека (zlib вместо msgpack, если msgpack не установлен)
+    """
+    name = (name or "msgpack").lower()
+    if name not in _CODECS:
+        logger.warning(f"⚠️ Неизвестный кодек кэша '{name}', используется json")
+        name = "json"
+    if name == "msgpack" and msgpack is None:
+        logger.warning("⚠️ msgpack не установлен, кэш сжимается zlib (JSON)")
+        name = "zlib"
+    return _CODECS[name]()
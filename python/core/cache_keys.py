@@ -0,0 +1,221 @@
+"""
+Ключи кэша с пространствами имен и поколениями
+
+Ключ имеет вид {prefix}:{namespace}:v{generation}:{...}. Сброс пространства
+имен - это INCR счетчика поколения (O(1)): старые ключи сразу перестают
+читаться, а физически удаляются в фоне через SCAN + UNLINK пачками, не
+блокируя Redis, как KEYS *.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import redis
+from redis import asyncio as aioredis
+
+logger = logging.getLogger(__name__)
+
+# Пространства имен кэша внешних данных
+NAMESPACES = ("search", "search_aggregated", "popular_products", "product", "url")
+
+# Производные пространства имен: сбрасываются вместе с исходным
+DERIVED_NAMESPACES = {"search": ("search_aggregated",)}
+
+# Ключи старого формата (без префикса и поколения)
+LEGACY_PATTERNS = ("search:*", "popular_products:*", "product:*", "url:*")
+
+# Канал Redis pub/sub для сброса кэша в памяти workers
+CACHE_INVALIDATION_CHANNEL = "cache:invalidate"
+
+
+class CacheKeyBuilder:
+    """Построение ключей кэша и их сброс по пространствам имен"""
+    
+    def __init__(
+        self,
+        redis_client: Optional[redis.Redis] = None,
+        prefix: str = "cache",
+        generation_cache_ttl: float = 5.0,
+        batch_size: int = 500
+    ):
+        """
+        Args:
+            redis_client: Клиент Redis (если None, поколения хранятся в памяти процесса)
+            prefix: Общий префикс ключей
+            generation_cache_ttl: Сколько секунд номер поколения берется из памяти, без GET
+            batch_size: Размер пачки SCAN/UNLINK при фоновой очистке
+        """
+        self.redis_client = redis_client
+        self.prefix = prefix
+        self.generation_cache_ttl = generation_cache_ttl
+        self.batch_size = batch_size
+        self._generations: Dict[str, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+        self._purge_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-purge")
+    
+    def _generation_key(self, namespace: str) -> str:
+        return f"{self.prefix}:gen:{namespace}"
+    
+    def _cached_generation(self, namespace: str) -> Optional[int]:
+        """Запомненное поколение (None, если его нужно перечитать из Redis)"""
+        with self._lock:
+            cached = self._generations.get(namespace)
+            if cached is not None and (self.redis_client is None or cached[1] > time.monotonic()):
+                return cached[0]
+        return None
+    
+    def _remember_generation(self, namespace: str, generation: int) -> int:
+        with self._lock:
+            self._generations[namespace] = (generation, time.monotonic() + self.generation_cache_ttl)
+        return generation
+    
+    def generation(self, namespace: str) -> int:
+        """Текущее поколение пространства имен"""
+        cached = self._cached_generation(namespace)
+        if cached is not None:
+            return cached
+        
+        generation = 0
+        if self.redis_client is not None:
+            try:
+                generation = int(self.redis_client.get(self._generation_key(namespace)) or 0)
+            except Exception as e:
+                logger.warning(f"Не удалось прочитать поколение кэша {namespace}: {e}")
+        return self._remember_generation(namespace, generation)
+    
+    async def generation_async(self, namespace: str, async_client: Optional[aioredis.Redis]) -> int:
+        """Текущее поколение пространства имен через асинхронный клиент Redis"""
+        cached = self._cached_generation(namespace)
+        if cached is not None:
+            return cached
+        if self.redis_client is None or async_client is None:
+            return self.generation(namespace)
+        
+        generation = 0
+        try:
+            generation = int(await async_client.get(self._generation_key(namespace)) or 0)
+        except Exception as e:
+            logger.warning(f"Не удалось прочитать поколение кэша {namespace}: {e}")
+        return self._remember_generation(namespace, generation)
+    
+    def key(self, namespace: str, *parts: str) -> str:
+        """
+        Ключ кэша
+        
+        Args:
+            namespace: Пространство имен (search, popular_products, ...)
+            parts: Части ключа внутри пространства имен
+        
+        Returns:
+            Ключ вида {prefix}:{namespace}:v{generation}:{parts}
+        """
+        return ":".join([self.prefix, namespace, f"v{self.generation(namespace)}", *parts])
+    
+    async def key_async(self, namespace: str, *parts: str, async_client: Optional[aioredis.Redis] = None) -> str:
+        """Ключ кэша (как key), поколение читается через асинхронный клиент Redis"""
+        generation = await self.generation_async(namespace, async_client)
+        return ":".join([self.prefix, namespace, f"v{generation}", *parts])
+    
+    def namespace_pattern(self, namespace: str) -> str:
+        """Паттерн всех ключей пространства имен (всех поколений)"""
+        return f"{self.prefix}:{namespace}:*"
+    
+    def forget(self, namespace: Optional[str] = None) -> None:
+        """Сброс запомненного поколения (после сброса пространства имен другим процессом)"""
+        if self.redis_client is None:
+            # Без Redis поколения есть только в памяти процесса - забывать их нельзя
+            return
+        with self._lock:
+            if namespace is None:
+                self._generations.clear()
+            else:
+                self._generations.pop(namespace, None)
+    
+    def invalidate(self, namespace: str, purge: bool = True) -> int:
+        """
+        Сброс пространства имен: новое поколение и фоновая очистка старых ключей
+        
+        Args:
+            namespace: Пространство имен
+            purge: Запустить ли фоновое удаление ключей старых поколений
+        
+        Returns:
+            Номер нового поколения
+        """
+        if self.redis_client is not None:
+            generation = int(self.redis_client.incr(self._generation_key(namespace)))
+        else:
+            with self._lock:
+                generation = self._generations.get(namespace, (0, 0.0))[0] + 1
+        with self._lock:
+            self._generations[namespace] = (generation, time.monotonic() + self.generation_cache_ttl)
+        
+        logger.info(f"✅ Кэш '{namespace}' сброшен (поколение {generation})")
+        if purge and self.redis_client is not None:
+            self._purge_executor.submit(self.purge_stale, namespace, generation)
+        return generation
+    
+    def purge_stale(self, namespace: str, current_generation: Optional[int] = None) -> int:
+        """
+        Удаление ключей старых поколений пространства имен
+        
+        Returns:
+            Количество удаленных ключей
+        """
+        if current_generation is None:
+            current_generation = self.generation(namespace)
+        
+        def is_stale(key: str) -> bool:
+            version = key.split(":", 3)[2]
+            return version[1:].isdigit() and int(version[1:]) < current_generation
+        
+        return self.purge(f"{self.prefix}:{namespace}:v*", key_filter=is_stale)
+    
+    def purge(self, pattern: str, key_filter=None) -> int:
+        """
+        Удаление ключей по паттерну: SCAN + UNLINK пачками через pipeline
+        
+        Args:
+            pattern: Паттерн ключей (MATCH для SCAN)
+            key_filter: Дополнительный отбор ключей (True - удалить)
+        
+        Returns:
+            Количество удаленных ключей
+        """
+        if self.redis_client is None:
+            return 0
+        
+        deleted = 0
+        batch: List[str] = []
+        try:
+            for key in self.redis_client.scan_iter(match=pattern, count=self.batch_size):
+                if isinstance(key, bytes):
+                    key = key.decode()
+                if key_filter is not None and not key_filter(key):
+                    continue
+                batch.append(key)
+                if len(batch) >= self.batch_size:
+                    deleted += self._unlink(batch)
+                    batch = []
+            if batch:
+                deleted += self._unlink(batch)
+        except Exception as e:
+            logger.error(f"❌ Ошибка очистки ключей {pattern}: {e}")
+        
+        if deleted:
+            logger.info(f"🧹 Удалено {deleted} ключей кэша ({pattern})")
+        return deleted
+    
+    def purge_in_background(self, patterns: Iterable[str]) -> Future:
+        """Фоновое удаление ключей по нескольким паттернам"""
+        patterns = list(patterns)
+        return self._purge_executor.submit(lambda: sum(self.purge(pattern) for pattern in patterns))
+    
+    def _unlink(self, keys: List[str]) -> int:
+        """Удаление пачки ключей без блокировки Redis (UNLINK освобождает память в фоне)"""
+        pipe = self.redis_client.pipeline(transaction=False)
+        for key in keys:
+            pipe.unlink(key)
+        return sum(pipe.execute())
@@ -0,0 +1,202 @@
+"""
+Общая HTTP-сессия процесса для обращений к Яндекс.Маркету
+
+Парсер и клиент API ходят через одну requests.Session с пулом соединений
+(keep-alive): повторные запросы к тому же хосту не тратят время на DNS и
+TCP+TLS рукопожатие. Для каждого хоста собирается статистика задержек и
+количество открытых соединений - по ней видно переиспользование.
+
+Для асинхронных загрузок есть общий httpx.AsyncClient (по одному на event loop)
+с теми же лимитами и таймаутами: ожидание сети не занимает потоки.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+import weakref
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - асинхронные загрузки необязательны
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+# Доступен ли асинхронный HTTP-клиент (пакет httpx)
+ASYNC_HTTP_AVAILABLE = httpx is not None
+
+_session: Optional[requests.Session] = None
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+_stats: Dict[str, Dict[str, float]] = {}
+_lock = threading.Lock()
+
+
+def get_http_timeout(read_timeout: Optional[float] = None) -> Tuple[float, float]:
+    """
+    Таймауты (подключение, чтение) для запросов через общую сессию
+    
+    Args:
+        read_timeout: Таймаут чтения в секундах (по умолчанию HTTP_READ_TIMEOUT)
+    
+    Returns:
+        Кортеж (connect, read) для параметра timeout
+    """
+    connect_timeout = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+    if read_timeout is None:
+        read_timeout = float(os.getenv("HTTP_READ_TIMEOUT", "20"))
+    return connect_timeout, read_timeout
+
+
+def _add_latency(host: str, method: str, status_code: int, elapsed_ms: float) -> None:
+    """Учет задержки запроса в статистике хоста"""
+    with _lock:
+        stats = _stats.setdefault(host, {"requests": 0, "total_ms": 0.0, "max_ms": 0.0})
+        stats["requests"] += 1
+        stats["total_ms"] += elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+    logger.debug(f"HTTP {method} {host} -> {status_code} за {elapsed_ms:.0f} мс")
+
+
+def _record_latency(response: requests.Response, *args, **kwargs) -> None:
+    """Hook ответа: задержка до получения заголовков по хосту"""
+    _add_latency(
+        urlsplit(response.url).netloc,
+        response.request.method,
+        response.status_code,
+        response.elapsed.total_seconds() * 1000
+    )
+
+
+def get_http_session() -> requests.Session:
+    """
+    Общая сессия с пулом соединений (одна на процесс)
+    
+    Размер пула задается переменными окружения: HTTP_POOL_CONNECTIONS - сколько
+    хостов держать в пуле, HTTP_POOL_MAXSIZE - соединений на хост.
+    
+    Returns:
+        Сессия requests
+    """
+    global _session
+    with _lock:
+        if _session is None:
+            adapter = HTTPAdapter(
+                pool_connections=int(os.getenv("HTTP_POOL_CONNECTIONS", "10")),
+                pool_maxsize=int(os.getenv("HTTP_POOL_MAXSIZE", "20"))
+            )
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            # br - только если установлен brotli (иначе urllib3 не распакует ответ)
+            session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+            session.hooks["response"].append(_record_latency)
+            _session = session
+        return _session
+
+
+def get_async_http_timeout(read_timeout: Optional[float] = None) -> "httpx.Timeout":
+    """Таймауты для асинхронного клиента (как get_http_timeout)"""
+    connect_timeout, read_timeout = get_http_timeout(read_timeout)
+    return httpx.Timeout(read_timeout, connect=connect_timeout)
+
+
+async def _mark_request_start(request: "httpx.Request") -> None:
+    request.extensions["started_at"] = time.perf_counter()
+
+
+async def _record_async_latency(response: "httpx.Response") -> None:
+    """Hook ответа httpx: задержка до получения заголовков по хосту"""
+    started_at = response.request.extensions.get("started_at")
+    if started_at is None:
+        return
+    _add_latency(
+        response.request.url.netloc.decode("ascii"),
+        response.request.method,
+        response.status_code,
+        (time.perf_counter() - started_at) * 1000
+    )
+
+
+def get_async_http_client() -> "httpx.AsyncClient":
+    """
+    Общий асинхронный клиент с пулом соединений (один на event loop)
+    
+    Лимиты - те же переменные окружения, что и у get_http_session:
+    HTTP_POOL_MAXSIZE соединений на хост держится открытыми (keep-alive),
+    всего не больше HTTP_POOL_CONNECTIONS * HTTP_POOL_MAXSIZE.
+    
+    Returns:
+        Клиент httpx
+    
+    Raises:
+        RuntimeError: Если httpx не установлен
+    """
+    if httpx is None:
+        raise RuntimeError("Для асинхронных загрузок установите httpx: pip install httpx")
+    
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _async_clients.get(loop)
+        if client is None or client.is_closed:
+            pool_connections = int(os.getenv("HTTP_POOL_CONNECTIONS", "10"))
+            pool_maxsize = int(os.getenv("HTTP_POOL_MAXSIZE", "20"))
+            client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=pool_connections * pool_maxsize,
+                    max_keepalive_connections=pool_maxsize
+                ),
+                timeout=get_async_http_timeout(),
+                follow_redirects=True,
+                event_hooks={"request": [_mark_request_start], "response": [_record_async_latency]}
+            )
+            _async_clients[loop] = client
+        return client
+
+
+async def close_async_http_client() -> None:
+    """Закрытие асинхронного клиента текущего event loop (при остановке приложения)"""
+    with _lock:
+        client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def get_http_stats() -> Dict[str, Dict[str, float]]:
+    """
+    Статистика запросов по хостам
+    
+    Returns:
+        {хост: {"requests", "avg_ms", "max_ms", "connections"}}, где connections -
+        сколько соединений было открыто синхронной сессией (меньше requests -
+        соединения переиспользуются)
+    """
+    connections: Dict[str, int] = {}
+    if _session is not None:
+        for adapter in set(_session.adapters.values()):
+            pools = getattr(getattr(adapter, "poolmanager", None), "pools", None)
+            if pools is None:
+                continue
+            for pool_key in pools.keys():
+                pool = pools.get(pool_key)
+                if pool is None:
+                    continue
+                host = pool.host if pool.port in (None, 80, 443) else f"{pool.host}:{pool.port}"
+                connections[host] = connections.get(host, 0) + pool.num_connections
+    
+    with _lock:
+        return {
+            host: {
+                "requests": int(stats["requests"]),
+                "avg_ms": round(stats["total_ms"] / stats["requests"], 1) if stats["requests"] else 0.0,
+                "max_ms": round(stats["max_ms"], 1),
+                "connections": connections.get(host, 0)
+            }
+            for host, stats in _stats.items()
+        }
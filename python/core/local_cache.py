@@ -0,0 +1,83 @@
+"""
+Кэш в памяти процесса (LRU + TTL)
+
+Хранит уже десериализованные значения, поэтому попадание не требует
+ни обращения к Redis, ни разбора JSON.
+"""
+import fnmatch
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+class LocalCache:
+    """Потокобезопасный LRU-кэш с ограничением размера и временем жизни записей"""
+    
+    def __init__(self, max_size: int = 256, ttl: float = 60.0):
+        """
+        Args:
+            max_size: Максимальное количество записей
+            ttl: Время жизни записи в секундах
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Значение по ключу (None при промахе или истекшей записи)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+    
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Сохранение значения (вытесняет самые давно использованные записи)"""
+        expires_at = time.monotonic() + (ttl if ttl is not None else self.ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def delete(self, key: str) -> None:
+        """Удаление записи"""
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def delete_matching(self, pattern: str = "*") -> int:
+        """
+        Удаление записей по glob-паттерну (как KEYS в Redis)
+        
+        Returns:
+            Количество удаленных записей
+        """
+        with self._lock:
+            keys = [key for key in self._entries if fnmatch.fnmatchcase(key, pattern)]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+    
+    def stats(self) -> Dict:
+        """Статистика попаданий"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
@@ -0,0 +1,97 @@
+"""
+Курсорная (keyset) пагинация списков пользователя
+
+Вместо OFFSET следующая страница выбирается условием по паре
+(дата, id) последнего элемента предыдущей страницы, поэтому глубокая
+страница стоит столько же, сколько первая (при индексе (user_id, дата, id)).
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Query
+
+from core.exceptions import ValidationError
+
+
+def encode_cursor(sort_value: datetime, row_id: int) -> str:
+    """
+    Кодирование курсора в непрозрачную строку
+    
+    Args:
+        sort_value: Значение поля сортировки последнего элемента
+        row_id: ID последнего элемента
+    
+    Returns:
+        Курсор (base64 без паддинга)
+    """
+    payload = json.dumps({"t": sort_value.isoformat(), "id": row_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Декодирование курсора
+    
+    Args:
+        cursor: Курсор из ответа предыдущей страницы
+    
+    Returns:
+        Кортеж (значение поля сортировки, ID)
+    
+    Raises:
+        ValidationError: Если курсор поврежден
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(payload["t"]), int(payload["id"])
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise ValidationError("Некорректный курсор пагинации")
+
+
+def paginate_keyset(
+    query: Query,
+    sort_column,
+    id_column,
+    limit: int,
+    cursor: Optional[str] = None,
+    skip: int = 0
+) -> Tuple[List, Optional[str]]:
+    """
+    Страница запроса в порядке (sort_column DESC, id_column DESC)
+    
+    Args:
+        query: Запрос с фильтрами (без сортировки и лимита)
+        sort_column: Колонка сортировки (дата)
+        id_column: Первичный ключ (разрешает равные даты)
+        limit: Размер страницы
+        cursor: Курсор предыдущей страницы (если передан, skip игнорируется)
+        skip: Смещение для клиентов без курсора
+    
+    Returns:
+        Кортеж (элементы страницы, курсор следующей страницы или None)
+    """
+    query = query.order_by(sort_column.desc(), id_column.desc())
+    
+    if cursor:
+        sort_value, row_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            sort_column < sort_value,
+            and_(sort_column == sort_value, id_column < row_id)
+        ))
+    elif skip:
+        query = query.offset(skip)
+    
+    # Берем на один элемент больше, чтобы узнать, есть ли следующая страница
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    
+    rows = rows[:limit]
+    last = rows[-1]
+    next_cursor = encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
+    return rows, next_cursor
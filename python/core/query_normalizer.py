@@ -0,0 +1,83 @@
+"""
+Нормализация поисковых запросов
+
+Варианты одного запроса ("Смартфон Samsung", "samsung  смартфон",
+"купить смартфон самсунг") приводятся к одной форме, поэтому у них общая запись кэша и
+один запрос к внешнему источнику. Нормализованная форма используется только
+для ключей и поиска в БД - во внешний источник уходит исходный запрос.
+"""
+import re
+from typing import List
+
+_NON_WORD = re.compile(r'[^\w]+', re.UNICODE)
+
+# Служебные слова, которые не меняют, что именно ищется. Слова-категории
+# ("смартфон", "ноутбук") сюда не входят: "ноутбук samsung" и "смартфон
+# samsung" - разные запросы с разной выдачей
+STOP_WORDS = frozenset({
+    "купить", "куплю", "цена", "цены", "стоимость",
+})
+
+# Распространенные написания брендов и линеек кириллицей -> латиница
+TRANSLITERATIONS = {
+    "самсунг": "samsung",
+    "галакси": "galaxy",
+    "эпл": "apple",
+    "эппл": "apple",
+    "айфон": "iphone",
+    "айпад": "ipad",
+    "макбук": "macbook",
+    "аирподс": "airpods",
+    "эйрподс": "airpods",
+    "сяоми": "xiaomi",
+    "ксиаоми": "xiaomi",
+    "шаоми": "xiaomi",
+    "редми": "redmi",
+    "поко": "poco",
+    "хуавей": "huawei",
+    "хуавэй": "huawei",
+    "хонор": "honor",
+    "реалми": "realme",
+    "ванплюс": "oneplus",
+    "нокиа": "nokia",
+    "сони": "sony",
+    "асус": "asus",
+    "леново": "lenovo",
+    "делл": "dell",
+    "асер": "acer",
+    "дайсон": "dyson",
+    "гугл": "google",
+    "пиксель": "pixel",
+}
+
+
+def query_tokens(query: str) -> List[str]:
+    """
+    Токены запроса в исходном порядке: нижний регистр, ё -> е, без знаков
+    препинания и служебных слов, написания брендов кириллицей заменены
+    латиницей
+    
+    Args:
+        query: Поисковый запрос
+    
+    Returns:
+        Список токенов (если запрос состоит только из служебных слов, они сохраняются)
+    """
+    value = (query or "").lower().replace("ё", "е")
+    tokens = [TRANSLITERATIONS.get(token, token) for token in _NON_WORD.sub(" ", value).split()]
+    meaningful = [token for token in tokens if token not in STOP_WORDS]
+    return meaningful or tokens
+
+
+def normalize_query(query: str) -> str:
+    """
+    Нормализованная форма запроса для ключей кэша: уникальные токены
+    query_tokens в алфавитном порядке через пробел
+    
+    Args:
+        query: Поисковый запрос
+    
+    Returns:
+        Нормализованный запрос (пустая строка для пустого запроса)
+    """
+    return " ".join(sorted(set(query_tokens(query))))
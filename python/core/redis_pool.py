@@ -0,0 +1,118 @@
+"""
+Общие пулы соединений Redis процесса
+
+Все клиенты Redis (кэш внешних данных, кэш URL, снимки поиска, эндпоинты
+кэша) берут соединения из одного пула на (хост, порт, БД, режим декодирования),
+а не открывают свои.
+
+Асинхронные клиенты (redis.asyncio) привязаны к event loop, поэтому создаются
+по одному на loop для каждого набора параметров.
+"""
+import asyncio
+import os
+import threading
+import weakref
+from typing import Dict, Optional, Tuple
+
+import redis
+from redis import asyncio as aioredis
+
+_pools: Dict[Tuple[str, int, int, bool], redis.ConnectionPool] = {}
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[str, int, int, bool], aioredis.Redis]]" = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def _pool_key(host: Optional[str], port: Optional[int], db: Optional[int], decode_responses: bool) -> Tuple[str, int, int, bool]:
+    """Параметры подключения с подстановкой значений из окружения"""
+    host = host or os.getenv("REDIS_HOST", "localhost")
+    port = port if port is not None else int(os.getenv("REDIS_PORT", "6379"))
+    db = db if db is not None else int(os.getenv("REDIS_DB", "0"))
+    return host, port, db, decode_responses
+
+
+def get_redis_pool(
+    host: Optional[str] = None,
+    port: Optional[int] = None,
+    db: Optional[int] = None,
+    decode_responses: bool = True
+) -> redis.ConnectionPool:
+    """
+    Пул соединений Redis (один на процесс для каждого набора параметров)
+    
+    Args:
+        host: Хост Redis (по умолчанию REDIS_HOST)
+        port: Порт Redis (по умолчанию REDIS_PORT)
+        db: Номер БД Redis (по умолчанию REDIS_DB)
+        decode_responses: Декодировать ли ответы в str (False - для бинарных значений кэша)
+    
+    Returns:
+        Пул соединений
+    """
+    pool_key = _pool_key(host, port, db, decode_responses)
+    host, port, db, decode_responses = pool_key
+    
+    with _lock:
+        pool = _pools.get(pool_key)
+        if pool is None:
+            pool = redis.ConnectionPool(
+                host=host,
+                port=port,
+                db=db,
+                decode_responses=decode_responses,
+                socket_connect_timeout=5,
+                max_connections=int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+            )
+            _pools[pool_key] = pool
+        return pool
+
+
+def get_redis_client(
+    host: Optional[str] = None,
+    port: Optional[int] = None,
+    db: Optional[int] = None,
+    decode_responses: bool = True
+) -> redis.Redis:
+    """Клиент Redis поверх общего пула (параметры - как у get_redis_pool)"""
+    return redis.Redis(connection_pool=get_redis_pool(host, port, db, decode_responses))
+
+
+def get_async_redis_client(
+    host: Optional[str] = None,
+    port: Optional[int] = None,
+    db: Optional[int] = None,
+    decode_responses: bool = True
+) -> aioredis.Redis:
+    """
+    Асинхронный клиент Redis текущего event loop (параметры - как у get_redis_pool)
+    
+    Клиент со своим пулом соединений создается один раз на loop и набор
+    параметров; вызывать только из корутины.
+    
+    Returns:
+        Клиент redis.asyncio
+    """
+    pool_key = _pool_key(host, port, db, decode_responses)
+    loop = asyncio.get_running_loop()
+    with _lock:
+        clients = _async_clients.setdefault(loop, {})
+        client = clients.get(pool_key)
+        if client is None:
+            host, port, db, decode_responses = pool_key
+            client = aioredis.Redis(
+                host=host,
+                port=port,
+                db=db,
+                decode_responses=decode_responses,
+                socket_connect_timeout=5,
+                max_connections=int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+            )
+            clients[pool_key] = client
+        return client
+
+
+async def close_async_redis_clients() -> None:
+    """Закрытие асинхронных клиентов текущего event loop (при остановке приложения)"""
+    with _lock:
+        clients = _async_clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        await client.aclose()
@@ -0,0 +1,265 @@
+"""
+Объединение одинаковых конкурентных запросов (single-flight)
+
+Пока выполняется загрузка по ключу, остальные вызовы с тем же ключом
+не запускают свою загрузку, а получают результат первой:
+- внутри процесса - ожидание общего результата;
+- между процессами (workers uvicorn) - блокировка в Redis (SET NX PX):
+  загружает только владелец блокировки, остальные ждут появления
+  результата в кэше.
+
+do_async - то же для корутин: ожидание и обращения к Redis (через
+redis.asyncio) не занимают поток и не блокируют event loop.
+"""
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+import redis
+from redis import asyncio as aioredis
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Снятие блокировки только ее владельцем
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class _Call:
+    """Загрузка, выполняемая в процессе"""
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Single-flight по ключу: локально в процессе и (при наличии Redis) между процессами"""
+    
+    def __init__(
+        self,
+        redis_client: Optional[redis.Redis] = None,
+        async_redis_factory: Optional[Callable[[], aioredis.Redis]] = None,
+        lock_ttl: float = 90.0,
+        wait_timeout: float = 90.0,
+        poll_interval: float = 0.25
+    ):
+        """
+        Args:
+            redis_client: Клиент Redis (если None, объединение только внутри процесса)
+            async_redis_factory: Асинхронный клиент Redis текущего event loop для do_async
+                (если None, do_async объединяет вызовы только внутри процесса)
+            lock_ttl: Время жизни блокировки в секундах (защита от упавшего владельца)
+            wait_timeout: Сколько ждать результат другого процесса, прежде чем загружать самим
+            poll_interval: Интервал проверки кэша при ожидании другого процесса
+        """
+        self.redis_client = redis_client
+        self.async_redis_factory = async_redis_factory
+        self.lock_ttl = lock_ttl
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self._calls: Dict[str, _Call] = {}
+        self._async_calls: Dict[Tuple[int, str], asyncio.Future] = {}
+        self._lock = threading.Lock()
+    
+    def do(
+        self,
+        key: str,
+        fetch: Callable[[], T],
+        read_cached: Optional[Callable[[], Optional[T]]] = None
+    ) -> T:
+        """
+        Выполнение загрузки с объединением одинаковых вызовов
+        
+        Args:
+            key: Ключ (нормализованный запрос)
+            fetch: Загрузка; должна сама сохранять результат в кэш
+            read_cached: Чтение результата из кэша (для ожидания другого процесса)
+        
+        Returns:
+            Результат загрузки (своей или чужой)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+        
+        if not leader:
+            logger.info(f"⏳ Ожидание уже выполняемой загрузки: {key}")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        
+        try:
+            call.result = self._do_distributed(key, fetch, read_cached)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+    
+    def _do_distributed(
+        self,
+        key: str,
+        fetch: Callable[[], T],
+        read_cached: Optional[Callable[[], Optional[T]]]
+    ) -> T:
+        """Загрузка под блокировкой Redis (или просто загрузка, если Redis нет)"""
+        if not self.redis_client or read_cached is None:
+            return fetch()
+        
+        lock_key = f"lock:{key}"
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.wait_timeout
+        
+        while True:
+            try:
+                acquired = self.redis_client.set(lock_key, token, nx=True, px=int(self.lock_ttl * 1000))
+            except Exception as e:
+                logger.warning(f"Не удалось взять блокировку {lock_key}: {e}")
+                return fetch()
+            
+            if acquired:
+                try:
+                    return fetch()
+                finally:
+                    self._release(lock_key, token)
+            
+            # Загрузку выполняет другой процесс: ждем результат в кэше,
+            # пока блокировка не снята (после снятия без результата - пробуем взять ее сами)
+            logger.info(f"⏳ Загрузка {key} выполняется другим процессом, ожидаем результат в кэше")
+            while time.monotonic() < deadline:
+                time.sleep(self.poll_interval)
+                cached = read_cached()
+                if cached is not None:
+                    return cached
+                try:
+                    if not self.redis_client.exists(lock_key):
+                        break
+                except Exception:
+                    break
+            
+            if time.monotonic() >= deadline:
+                logger.warning(f"⚠️ Не дождались результата {key} от другого процесса, загружаем сами")
+                return fetch()
+    
+    async def do_async(
+        self,
+        key: str,
+        fetch: Callable[[], Awaitable[T]],
+        read_cached: Optional[Callable[[], Awaitable[Optional[T]]]] = None
+    ) -> T:
+        """
+        Асинхронный вариант do: fetch - корутина, ожидание - без блокировки event loop
+        
+        Args:
+            key: Ключ (нормализованный запрос)
+            fetch: Асинхронная загрузка; должна сама сохранять результат в кэш
+            read_cached: Асинхронное чтение результата из кэша (для ожидания другого процесса)
+        
+        Returns:
+            Результат загрузки (своей или чужой)
+        """
+        # Future привязан к event loop, поэтому вызовы объединяются в пределах loop
+        call_key = (id(asyncio.get_running_loop()), key)
+        with self._lock:
+            future = self._async_calls.get(call_key)
+            leader = future is None
+            if leader:
+                future = asyncio.get_running_loop().create_future()
+                self._async_calls[call_key] = future
+        
+        if not leader:
+            logger.info(f"⏳ Ожидание уже выполняемой загрузки: {key}")
+            return await asyncio.shield(future)
+        
+        try:
+            result = await self._do_distributed_async(key, fetch, read_cached)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Ошибку получают ожидающие; если их нет, не выводим "exception was never retrieved"
+            future.exception()
+            raise
+        finally:
+            with self._lock:
+                self._async_calls.pop(call_key, None)
+    
+    async def _do_distributed_async(
+        self,
+        key: str,
+        fetch: Callable[[], Awaitable[T]],
+        read_cached: Optional[Callable[[], Awaitable[Optional[T]]]]
+    ) -> T:
+        """Асинхронная загрузка под блокировкой Redis (как _do_distributed)"""
+        if not self.async_redis_factory or read_cached is None:
+            return await fetch()
+        
+        client = self.async_redis_factory()
+        lock_key = f"lock:{key}"
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.wait_timeout
+        
+        while True:
+            try:
+                acquired = await client.set(lock_key, token, nx=True, px=int(self.lock_ttl * 1000))
+            except Exception as e:
+                logger.warning(f"Не удалось взять блокировку {lock_key}: {e}")
+                return await fetch()
+            
+            if acquired:
+                try:
+                    return await fetch()
+                finally:
+                    await self._release_async(client, lock_key, token)
+            
+            logger.info(f"⏳ Загрузка {key} выполняется другим процессом, ожидаем результат в кэше")
+            while time.monotonic() < deadline:
+                await asyncio.sleep(self.poll_interval)
+                cached = await read_cached()
+                if cached is not None:
+                    return cached
+                try:
+                    if not await client.exists(lock_key):
+                        break
+                except Exception:
+                    break
+            
+            if time.monotonic() >= deadline:
+                logger.warning(f"⚠️ Не дождались результата {key} от другого процесса, загружаем сами")
+                return await fetch()
+    
+    def _release(self, lock_key: str, token: str) -> None:
+        """Снятие блокировки (только своей)"""
+        try:
+            self.redis_client.eval(_RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+        except Exception as e:
+            logger.warning(f"Не удалось снять блокировку {lock_key}: {e}")
+    
+    @staticmethod
+    async def _release_async(client: aioredis.Redis, lock_key: str, token: str) -> None:
+        """Снятие блокировки (только своей) через асинхронный клиент"""
+        try:
+            await client.eval(_RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+        except Exception as e:
+            logger.warning(f"Не удалось снять блокировку {lock_key}: {e}")
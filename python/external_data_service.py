@@ -1,17 +1,33 @@
 """
 Сервис для работы с внешними источниками данных с кэшированием
 """
-import redis
+import asyncio
 import json
 import logging
 import os
-from typing import List, Dict, Optional
-from datetime import datetime
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Dict, Optional, Tuple
+from datetime import datetime, timedelta
 
 from data_providers import ProductData
+from core.single_flight import SingleFlight
+from core.local_cache import LocalCache
+from core.bloom import RotatingBloomFilter
+from core.cache_codec import get_cache_codec
+from core.cache_keys import CACHE_INVALIDATION_CHANNEL, CacheKeyBuilder, DERIVED_NAMESPACES, LEGACY_PATTERNS, NAMESPACES
+from core.query_normalizer import normalize_query
+from core.redis_pool import get_async_redis_client, get_redis_client
+from url_cache_service import URLCacheService
 
 logger = logging.getLogger(__name__)
 
+# Максимальное количество популярных товаров (как в /products/popular):
+# в кэш категории загружается столько, меньшие limit получают срез
+POPULAR_PRODUCTS_MAX_LIMIT = 50
+
 
 class ExternalDataService:
     """Сервис для работы с внешними источниками данных (магазины одежды)"""
@@ -22,7 +38,14 @@ class ExternalDataService:
         redis_port: int = 6379,
         redis_db: int = 0,
         cache_ttl: int = 10800,  # 3 часа по умолчанию
-        redis_enabled: bool = True
+        redis_enabled: bool = True,
+        stale_ttl: int = 3600,  # 1 час по умолчанию
+        local_cache_size: int = 256,
+        local_cache_ttl: int = 60,
+        negative_cache_ttl: int = 120,  # 2 минуты по умолчанию
+        cache_codec: str = "msgpack",
+        cache_key_prefix: str = "cache",
+        popular_fetch_limit: int = POPULAR_PRODUCTS_MAX_LIMIT
     ):
         """
         Инициализация сервиса
@@ -33,22 +56,29 @@ class ExternalDataService:
             redis_db: Номер БД Redis
             cache_ttl: Время жизни кэша в секундах (по умолчанию 3 часа = 10800 сек)
             redis_enabled: Включить ли Redis (по умолчанию True)
+            stale_ttl: Сколько секунд после cache_ttl запись еще отдается (устаревшей),
+                пока в фоне загружается свежая (stale-while-revalidate)
+            local_cache_size: Количество записей в кэше в памяти процесса
+            local_cache_ttl: Время жизни записи в кэше в памяти процесса (секунд)
+            negative_cache_ttl: Время жизни пустого результата поиска в кэше (секунд)
+            cache_codec: Формат значений кэша: json, zlib или msgpack (см. core/cache_codec.py)
+            cache_key_prefix: Префикс ключей кэша (см. core/cache_keys.py)
+            popular_fetch_limit: Сколько популярных товаров категории загружать в кэш за раз
         """
         # Инициализация Redis
         self.redis_enabled = False
         self.redis_client = None
+        # Клиент без декодирования ответов: значения кэша хранятся в бинарном формате
+        self.cache_client = None
+        self.codec = get_cache_codec(cache_codec)
+        self._redis_params = (redis_host, redis_port, redis_db)
         
         if redis_enabled:
             try:
-                self.redis_client = redis.Redis(
-                    host=redis_host,
-                    port=redis_port,
-                    db=redis_db,
-                    decode_responses=True,
-                    socket_connect_timeout=5
-                )
+                self.redis_client = get_redis_client(redis_host, redis_port, redis_db)
                 self.redis_client.ping()
-                logger.info("Подключение к Redis установлено")
+                self.cache_client = get_redis_client(redis_host, redis_port, redis_db, decode_responses=False)
+                logger.info(f"Подключение к Redis установлено (кодек кэша: {self.codec.name})")
                 self.redis_enabled = True
             except Exception as e:
                 logger.info(f"Redis недоступен ({redis_host}:{redis_port}). Кэширование отключено. Приложение работает без кэша.")
@@ -58,6 +88,55 @@ class ExternalDataService:
             logger.info("Redis отключен. Кэширование не используется.")
         
         self.cache_ttl = cache_ttl
+        self.stale_ttl = stale_ttl
+        self.negative_cache_ttl = negative_cache_ttl
+        self.popular_fetch_limit = min(popular_fetch_limit, POPULAR_PRODUCTS_MAX_LIMIT)
+        
+        # Запросы, по которым недавно ничего не нашлось. Это только подсказка:
+        # при попадании проверяется негативная запись кэша (ложное срабатывание
+        # фильтра или результат, загруженный с тех пор другим worker, не дают
+        # пустого ответа), зато агрегированный кэш для таких запросов не читается.
+        # Поколение фильтра живет половину negative_cache_ttl
+        self.empty_queries = RotatingBloomFilter(
+            capacity=10000,
+            error_rate=0.001,
+            rotation_interval=max(1.0, negative_cache_ttl / 2)
+        )
+        
+        # Ключи с пространствами имен и поколениями: сброс кэша - INCR поколения
+        self.key_builder = CacheKeyBuilder(
+            redis_client=self.redis_client if self.redis_enabled else None,
+            prefix=cache_key_prefix
+        )
+        
+        # Кэш URL товаров (один на процесс, на общем пуле соединений)
+        self.url_cache = URLCacheService(
+            redis_client=self.redis_client if self.redis_enabled else None,
+            key_builder=self.key_builder,
+            redis_enabled=self.redis_enabled
+        )
+        
+        # Первый уровень кэша: десериализованные результаты в памяти процесса.
+        # Изменения в Redis рассылаются другим workers через pub/sub
+        self.local_cache = LocalCache(max_size=local_cache_size, ttl=local_cache_ttl)
+        self.redis_hits = 0
+        self.redis_misses = 0
+        self._instance_id = uuid.uuid4().hex
+        self._invalidation_thread = None
+        if self.redis_enabled:
+            self._subscribe_invalidation()
+        
+        # Фоновое обновление устаревших записей кэша (не более одного на ключ)
+        self._refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cache-refresh")
+        self._refreshing = set()
+        self._refreshing_lock = threading.Lock()
+        
+        # Одновременные одинаковые запросы к внешним источникам выполняются один раз
+        # (между workers - через блокировку в Redis)
+        self.single_flight = SingleFlight(
+            redis_client=self.redis_client if self.redis_enabled else None,
+            async_redis_factory=self._async_redis_client if self.redis_enabled else None
+        )
         
         # Инициализация Яндекс.Маркет OAuth API
         self.yandex_api = None
@@ -100,7 +179,8 @@ class ExternalDataService:
         self,
         query: str,
         use_cache: bool = True,
-        shops: Optional[List[str]] = None
+        shops: Optional[List[str]] = None,
+        cache_only: bool = False
     ) -> Dict[str, List[ProductData]]:
         """
         Поиск товаров
@@ -109,23 +189,382 @@ class ExternalDataService:
             query: Поисковый запрос
             use_cache: Использовать ли кэш
             shops: Список магазинов (игнорируется)
+            cache_only: Только чтение из кэша, без обращения к API и парсеру
         
         Returns:
             Словарь {название_магазина: список_товаров}
         """
-        cache_key = f"search:{query.lower().strip()}"
+        cache_key = self.key_builder.key("search", normalize_query(query))
         
-        # Проверка кэша
-        if use_cache and self.redis_enabled:
+        # Проверка кэша (устаревшая запись отдается сразу и обновляется в фоне)
+        if use_cache:
+            cached_entry = self._read_search_cache_entry(cache_key)
+            if cached_entry is not None:
+                cached_results, fresh = cached_entry
+                if not cached_results:
+                    self.empty_queries.add(cache_key)
+                    logger.info(f"ℹ️ По запросу '{query}' недавно ничего не найдено, поиск пропущен")
+                    return cached_results
+                logger.info(f"Данные найдены в кэше для запроса: {query}" + ("" if fresh else " (устарели, обновляем в фоне)"))
+                if not fresh:
+                    self._schedule_refresh(
+                        cache_key,
+                        lambda: self._fetch_search_results(query, cache_key),
+                        read_cached=lambda: self._read_search_cache(cache_key)
+                    )
+                return cached_results
+        
+        if cache_only:
+            return {}
+        
+        # Одинаковые запросы, пришедшие одновременно, ждут результат первого
+        return self.single_flight.do(
+            cache_key,
+            lambda: self._fetch_search_results(query, cache_key),
+            read_cached=lambda: self._read_search_cache(cache_key)
+        )
+    
+    async def search_products_async(
+        self,
+        query: str,
+        use_cache: bool = True,
+        shops: Optional[List[str]] = None,
+        cache_only: bool = False
+    ) -> Dict[str, List[ProductData]]:
+        """
+        Асинхронный поиск товаров (как search_products)
+        
+        Кэш читается через асинхронный клиент Redis, загрузка из внешних
+        источников идет через асинхронный HTTP-клиент: ни то, ни другое не
+        занимает поток и не блокирует event loop. Одинаковые конкурентные
+        запросы объединяются (single-flight).
+        
+        Args:
+            query: Поисковый запрос
+            use_cache: Использовать ли кэш
+            shops: Список магазинов (игнорируется)
+            cache_only: Только чтение из кэша, без обращения к API и парсеру
+        
+        Returns:
+            Словарь {название_магазина: список_товаров}
+        """
+        cache_key = await self._async_key("search", normalize_query(query))
+        
+        if use_cache:
+            cached_entry = await self._read_cache_entry_async(cache_key, deserialize=self._deserialize_products)
+            if cached_entry is not None:
+                cached_results, fresh = cached_entry
+                if not cached_results:
+                    self.empty_queries.add(cache_key)
+                    logger.info(f"ℹ️ По запросу '{query}' недавно ничего не найдено, поиск пропущен")
+                    return cached_results
+                logger.info(f"Данные найдены в кэше для запроса: {query}" + ("" if fresh else " (устарели, обновляем в фоне)"))
+                if not fresh:
+                    self._schedule_refresh(
+                        cache_key,
+                        lambda: self._fetch_search_results(query, cache_key),
+                        read_cached=lambda: self._read_search_cache(cache_key)
+                    )
+                return cached_results
+        
+        if cache_only:
+            return {}
+        
+        return await self.single_flight.do_async(
+            cache_key,
+            lambda: self._fetch_search_results_async(query, cache_key),
+            read_cached=lambda: self._read_search_cache_async(cache_key)
+        )
+    
+    def is_search_cached(self, query: str) -> bool:
+        """Есть ли свежий результат поиска в кэше"""
+        cached_entry = self._read_search_cache_entry(self.key_builder.key("search", normalize_query(query)))
+        return cached_entry is not None and cached_entry[1]
+    
+    def is_popular_cached(self, limit: int, category: str) -> bool:
+        """Есть ли в кэше свежие популярные товары категории (не меньше limit или все, что есть)"""
+        cached_entry = self._read_cache_entry(self.key_builder.key("popular_products", category))
+        return cached_entry is not None and cached_entry[1] and self._popular_entry_covers(cached_entry[0], limit)
+    
+    @staticmethod
+    def _popular_entry_covers(cached: Dict, limit: int) -> bool:
+        """
+        Достаточно ли записи кэша популярных товаров для limit
+        
+        Запись {"items", "requested"} покрывает limit, если в ней не меньше limit
+        товаров или источник вернул меньше, чем у него запрашивали (больше нет).
+        """
+        items = cached["items"]
+        return len(items) >= limit or len(items) < cached["requested"]
+    
+    def _trending_key(self, day: datetime) -> str:
+        return f"{self.key_builder.prefix}:trending:{day.strftime('%Y%m%d')}"
+    
+    def record_search_query(self, query: str) -> None:
+        """
+        Учет поискового запроса в статистике частых запросов (по дням, хранится 2 дня)
+        
+        Частота считается по нормализованной форме, а для каждой формы
+        запоминается первый введенный пользователем текст: его, а не
+        нормализованную форму, прогрев кэша отправляет во внешний источник.
+        """
+        query = (query or "").strip()
+        normalized = normalize_query(query)
+        if not self.redis_enabled or not normalized:
+            return
+        try:
+            trending_key = self._trending_key(datetime.utcnow())
+            texts_key = f"{trending_key}:text"
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.zincrby(trending_key, 1, normalized)
+            pipe.hsetnx(texts_key, normalized, query)
+            pipe.expire(trending_key, 2 * 24 * 3600)
+            pipe.expire(texts_key, 2 * 24 * 3600)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Не удалось учесть поисковый запрос: {e}")
+    
+    def get_trending_queries(self, limit: int = 20) -> List[str]:
+        """
+        Самые частые поисковые запросы за сегодня и вчера
+        
+        Args:
+            limit: Количество запросов
+        
+        Returns:
+            Запросы по убыванию частоты - в том виде, как их ввел пользователь
+            (по одному тексту на нормализованную форму)
+        """
+        if not self.redis_enabled:
+            return []
+        try:
+            now = datetime.utcnow()
+            days = [self._trending_key(day) for day in (now, now - timedelta(days=1))]
+            pipe = self.redis_client.pipeline(transaction=False)
+            for trending_key in days:
+                pipe.zrevrange(trending_key, 0, limit - 1, withscores=True)
+            scores: Dict[str, float] = {}
+            for ranked in pipe.execute():
+                for normalized, score in ranked:
+                    scores[normalized] = scores.get(normalized, 0) + score
+            top = sorted(scores, key=scores.get, reverse=True)[:limit]
+            if not top:
+                return []
+            
+            pipe = self.redis_client.pipeline(transaction=False)
+            for trending_key in days:
+                pipe.hmget(f"{trending_key}:text", top)
+            texts = pipe.execute()
+            queries = []
+            for position, normalized in enumerate(top):
+                # Текст за сегодня, иначе за вчера; для записей без текста
+                # (учтенных до хранения текстов) - нормализованная форма
+                queries.append(next((day_texts[position] for day_texts in texts if day_texts[position]), normalized))
+            return queries
+        except Exception as e:
+            logger.warning(f"Не удалось получить частые запросы: {e}")
+            return []
+    
+    def _read_search_cache(self, cache_key: str) -> Optional[Dict[str, List[ProductData]]]:
+        """Чтение результатов поиска из кэша (None, если их нет)"""
+        cached_entry = self._read_search_cache_entry(cache_key)
+        return cached_entry[0] if cached_entry is not None else None
+    
+    def _read_search_cache_entry(self, cache_key: str) -> Optional[Tuple[Dict[str, List[ProductData]], bool]]:
+        """Чтение результатов поиска из кэша: (товары, свежая ли запись) или None"""
+        return self._read_cache_entry(cache_key, deserialize=self._deserialize_products)
+    
+    def _read_cache(self, cache_key: str):
+        """Чтение данных из кэша, в том числе устаревших (None при промахе, ошибке или отключенном Redis)"""
+        cached_entry = self._read_cache_entry(cache_key)
+        return cached_entry[0] if cached_entry is not None else None
+    
+    def _read_cache_entry(
+        self,
+        cache_key: str,
+        deserialize: Optional[Callable] = None
+    ) -> Optional[Tuple[object, bool]]:
+        """
+        Чтение записи кэша: сначала из памяти процесса, затем из Redis
+        
+        Args:
+            cache_key: Ключ кэша
+            deserialize: Преобразование данных из JSON (результат сохраняется в памяти процесса)
+        
+        Returns:
+            Кортеж (данные, свежая ли запись) или None при промахе
+        """
+        local_entry = self.local_cache.get(cache_key)
+        if local_entry is not None:
+            data, fetched_at, soft_ttl = local_entry
+            return data, fetched_at is None or time.time() - fetched_at < soft_ttl
+        
+        if not self.redis_enabled:
+            return None
+        try:
+            return self._decode_cache_entry(cache_key, self.cache_client.get(cache_key), deserialize)
+        except Exception as e:
+            logger.error(f"Ошибка чтения из кэша: {e}")
+        return None
+    
+    async def _read_cache_entry_async(
+        self,
+        cache_key: str,
+        deserialize: Optional[Callable] = None
+    ) -> Optional[Tuple[object, bool]]:
+        """Чтение записи кэша через асинхронный клиент Redis (как _read_cache_entry)"""
+        local_entry = self.local_cache.get(cache_key)
+        if local_entry is not None:
+            data, fetched_at, soft_ttl = local_entry
+            return data, fetched_at is None or time.time() - fetched_at < soft_ttl
+        
+        if not self.redis_enabled:
+            return None
+        try:
+            return self._decode_cache_entry(cache_key, await self._async_cache_client().get(cache_key), deserialize)
+        except Exception as e:
+            logger.error(f"Ошибка чтения из кэша: {e}")
+        return None
+    
+    async def _read_search_cache_async(self, cache_key: str) -> Optional[Dict[str, List[ProductData]]]:
+        """Чтение результатов поиска из кэша через асинхронный клиент (None при промахе)"""
+        cached_entry = await self._read_cache_entry_async(cache_key, deserialize=self._deserialize_products)
+        return cached_entry[0] if cached_entry is not None else None
+    
+    def _decode_cache_entry(
+        self,
+        cache_key: str,
+        cached_data: Optional[bytes],
+        deserialize: Optional[Callable]
+    ) -> Optional[Tuple[object, bool]]:
+        """Разбор значения из Redis с сохранением в кэш в памяти: (данные, свежая ли запись) или None"""
+        if not cached_data:
+            self.redis_misses += 1
+            return None
+        self.redis_hits += 1
+        entry = self.codec.decode(cached_data)
+        # Записи старого формата (без fetched_at) считаем свежими: они истекут по TTL Redis
+        if isinstance(entry, dict) and entry.keys() == {"fetched_at", "data", "soft_ttl"}:
+            data, fetched_at, soft_ttl = entry["data"], entry["fetched_at"], entry["soft_ttl"]
+        else:
+            data, fetched_at, soft_ttl = entry, None, None
+        if deserialize:
+            data = deserialize(data)
+        self.local_cache.set(cache_key, (data, fetched_at, soft_ttl))
+        return data, fetched_at is None or time.time() - fetched_at < soft_ttl
+    
+    def _async_redis_client(self):
+        """Асинхронный клиент Redis текущего event loop (ответы декодируются в str)"""
+        return get_async_redis_client(*self._redis_params)
+    
+    def _async_cache_client(self):
+        """Асинхронный клиент Redis текущего event loop для бинарных значений кэша"""
+        return get_async_redis_client(*self._redis_params, decode_responses=False)
+    
+    async def _async_key(self, namespace: str, *parts: str) -> str:
+        """Ключ кэша без синхронного обращения к Redis (для корутин)"""
+        async_client = self._async_redis_client() if self.redis_enabled else None
+        return await self.key_builder.key_async(namespace, *parts, async_client=async_client)
+    
+    def _write_cache(
+        self,
+        cache_key: str,
+        data,
+        soft_ttl: int,
+        value=None,
+        stale_ttl: Optional[int] = None
+    ) -> None:
+        """
+        Запись в кэш с мягким и жестким TTL
+        
+        Запись свежая soft_ttl секунд, затем еще stale_ttl секунд отдается
+        как устаревшая (с фоновым обновлением), после чего удаляется Redis.
+        
+        Args:
+            cache_key: Ключ кэша
+            data: Данные для JSON
+            soft_ttl: Время, в течение которого запись свежая (секунд)
+            value: Десериализованное значение для кэша в памяти (по умолчанию data)
+            stale_ttl: Период устаревания (по умолчанию self.stale_ttl)
+        """
+        fetched_at = time.time()
+        hard_ttl = soft_ttl + (self.stale_ttl if stale_ttl is None else stale_ttl)
+        envelope = {"fetched_at": fetched_at, "soft_ttl": soft_ttl, "data": data}
+        self.cache_client.setex(cache_key, hard_ttl, self.codec.encode(envelope))
+        self.local_cache.set(
+            cache_key,
+            (data if value is None else value, fetched_at, soft_ttl),
+            ttl=min(self.local_cache.ttl, hard_ttl)
+        )
+        self._publish_invalidation(key=cache_key)
+    
+    def _publish_invalidation(self, key: Optional[str] = None, namespace: Optional[str] = None) -> None:
+        """Рассылка сброса записи (key) или пространства имен (namespace) другим workers"""
+        if not self.redis_enabled:
+            return
+        try:
+            message = {"origin": self._instance_id, "key": key, "namespace": namespace}
+            self.redis_client.publish(CACHE_INVALIDATION_CHANNEL, json.dumps(message))
+        except Exception as e:
+            logger.warning(f"Не удалось отправить сброс кэша в памяти: {e}")
+    
+    def _subscribe_invalidation(self) -> None:
+        """Подписка на сброс кэша в памяти (изменения, сделанные другими workers)"""
+        def on_message(message):
             try:
-                cached_data = self.redis_client.get(cache_key)
-                if cached_data:
-                    logger.info(f"Данные найдены в кэше для запроса: {query}")
-                    return self._deserialize_products(json.loads(cached_data))
+                payload = json.loads(message["data"])
+                if payload.get("origin") == self._instance_id:
+                    return
+                if payload.get("key"):
+                    self.local_cache.delete(payload["key"])
+                if payload.get("namespace"):
+                    self.key_builder.forget(payload["namespace"])
+                    self.local_cache.delete_matching(self.key_builder.namespace_pattern(payload["namespace"]))
+                    self.empty_queries.clear()
             except Exception as e:
-                logger.error(f"Ошибка чтения из кэша: {e}")
+                logger.warning(f"Некорректное сообщение сброса кэша: {e}")
+        
+        try:
+            pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{CACHE_INVALIDATION_CHANNEL: on_message})
+            self._invalidation_thread = pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+        except Exception as e:
+            logger.warning(f"Не удалось подписаться на сброс кэша в памяти: {e}")
+    
+    def _schedule_refresh(
+        self,
+        cache_key: str,
+        fetch: Callable[[], object],
+        read_cached: Callable[[], object]
+    ) -> None:
+        """
+        Фоновое обновление устаревшей записи кэша
+        
+        В процессе выполняется не более одного обновления на ключ, между
+        workers обновления объединяются через single-flight (блокировка в Redis).
+        """
+        with self._refreshing_lock:
+            if cache_key in self._refreshing:
+                return
+            self._refreshing.add(cache_key)
+        
+        def refresh():
+            try:
+                self.single_flight.do(f"refresh:{cache_key}", fetch, read_cached=read_cached)
+                logger.info(f"🔄 Кэш обновлен в фоне: {cache_key}")
+            except Exception as e:
+                logger.error(f"Ошибка фонового обновления кэша {cache_key}: {e}")
+            finally:
+                with self._refreshing_lock:
+                    self._refreshing.discard(cache_key)
         
+        self._refresh_executor.submit(refresh)
+    
+    def _fetch_search_results(self, query: str, cache_key: str) -> Dict[str, List[ProductData]]:
+        """Поиск через API/парсер с сохранением результата в кэш"""
         results = {}
+        # Пустой результат кэшируется, только если источники ответили без ошибок
+        source_failed = False
         
         logger.info(f"🔍 Начинаю поиск товаров по запросу: '{query}'")
         logger.info(f"   Доступные источники: API={self.yandex_api is not None}, Парсер={self.yandex_parser is not None}")
@@ -143,6 +582,7 @@ class ExternalDataService:
                 else:
                     logger.warning("⚠️ API вернул пустой список товаров")
             except Exception as e:
+                source_failed = True
                 logger.warning(f"⚠️ Ошибка API: {e}, пробую парсер")
         
         # Если API не сработал, используем парсер
@@ -159,10 +599,71 @@ class ExternalDataService:
                     else:
                         logger.warning("⚠️ Парсер вернул пустой список товаров")
                 except Exception as e:
+                    source_failed = True
+                    logger.error(f"❌ Ошибка парсера: {e}", exc_info=True)
+            else:
+                source_failed = True
+                logger.error("❌ Парсер недоступен! Поиск невозможен.")
+        
+        return self._store_search_results(query, cache_key, results, source_failed)
+    
+    async def _fetch_search_results_async(self, query: str, cache_key: str) -> Dict[str, List[ProductData]]:
+        """Асинхронный поиск через API/парсер с сохранением результата в кэш (как _fetch_search_results)"""
+        results = {}
+        source_failed = False
+        
+        logger.info(f"🔍 Начинаю поиск товаров по запросу (async): '{query}'")
+        
+        if self.yandex_api:
+            try:
+                products = await self.yandex_api.search_products_async(query=query, limit=30)
+                if products:
+                    results["Яндекс.Маркет"] = products
+                    logger.info(f"✅ Найдено {len(products)} товаров через API")
+                else:
+                    logger.warning("⚠️ API вернул пустой список товаров")
+            except Exception as e:
+                source_failed = True
+                logger.warning(f"⚠️ Ошибка API: {e}, пробую парсер")
+        
+        if not results.get("Яндекс.Маркет"):
+            if self.yandex_parser:
+                try:
+                    products = await self.yandex_parser.search_products_async(query=query, limit=30)
+                    if products:
+                        results["Яндекс.Маркет"] = products
+                        logger.info(f"✅ Найдено {len(products)} товаров через парсер")
+                    else:
+                        logger.warning("⚠️ Парсер вернул пустой список товаров")
+                except Exception as e:
+                    source_failed = True
                     logger.error(f"❌ Ошибка парсера: {e}", exc_info=True)
             else:
+                source_failed = True
                 logger.error("❌ Парсер недоступен! Поиск невозможен.")
         
+        # Запись в кэш (Redis, кэш URL, рассылка сброса) - синхронная, поэтому в пуле потоков
+        return await asyncio.to_thread(self._store_search_results, query, cache_key, results, source_failed)
+    
+    def _store_search_results(
+        self,
+        query: str,
+        cache_key: str,
+        results: Dict[str, List[ProductData]],
+        source_failed: bool
+    ) -> Dict[str, List[ProductData]]:
+        """
+        Сохранение результата поиска в кэш (пустой - в негативный кэш)
+        
+        Args:
+            query: Поисковый запрос
+            cache_key: Ключ кэша результатов поиска
+            results: Результаты {название_магазина: список_товаров}
+            source_failed: Была ли ошибка источника (тогда пустой результат не кэшируется)
+        
+        Returns:
+            results
+        """
         # Итоговый результат
         total_found = sum(len(products) for products in results.values())
         if total_found > 0:
@@ -174,14 +675,24 @@ class ExternalDataService:
         if self.redis_enabled and results:
             try:
                 serialized = self._serialize_products(results)
-                self.redis_client.setex(
-                    cache_key,
-                    self.cache_ttl,
-                    json.dumps(serialized, default=str)
-                )
+                self._write_cache(cache_key, serialized, self.cache_ttl, value=results)
+                # Агрегированный результат пересчитается из новых данных при следующем запросе
+                self._delete_cache(self._aggregated_cache_key(query))
                 logger.info(f"Данные сохранены в кэш для запроса: {query}")
             except Exception as e:
                 logger.error(f"Ошибка записи в кэш: {e}")
+        elif not results and not source_failed:
+            # Негативный кэш: короткий TTL и без периода устаревания
+            self.empty_queries.add(cache_key)
+            if self.redis_enabled:
+                try:
+                    self._write_cache(cache_key, {}, self.negative_cache_ttl, stale_ttl=0)
+                    logger.info(f"Пустой результат сохранен в кэш на {self.negative_cache_ttl} сек для запроса: {query}")
+                except Exception as e:
+                    logger.error(f"Ошибка записи в кэш: {e}")
+            else:
+                # Без Redis негативная запись хранится только в памяти процесса
+                self.local_cache.set(cache_key, ({}, time.time(), self.negative_cache_ttl), ttl=self.negative_cache_ttl)
         
         return results
     
@@ -189,7 +700,8 @@ class ExternalDataService:
         self,
         query: str,
         use_cache: bool = True,
-        shops: Optional[List[str]] = None
+        shops: Optional[List[str]] = None,
+        cache_only: bool = False
     ) -> List[Dict]:
         """
         Агрегация товаров по названию (группировка одинаковых товаров)
@@ -198,12 +710,121 @@ class ExternalDataService:
             query: Поисковый запрос
             use_cache: Использовать ли кэш
             shops: Список магазинов (игнорируется)
+            cache_only: Только чтение из кэша (пустой список при промахе)
+        
+        Returns:
+            Список агрегированных товаров с ценами
+        """
+        # Готовый агрегированный результат (отсортированный) хранится в кэше отдельно:
+        # попадание - одно чтение без группировки
+        aggregated_key = self._aggregated_cache_key(query)
+        if use_cache:
+            search_key = self.key_builder.key("search", normalize_query(query))
+            if search_key in self.empty_queries and self._is_known_empty(self._read_search_cache_entry(search_key)):
+                return []
+            cached_entry = self._read_cache_entry(aggregated_key)
+            if cached_entry is not None:
+                aggregated, fresh = cached_entry
+                logger.info(f"Агрегированные товары найдены в кэше для запроса: {query}" + ("" if fresh else " (устарели, обновляем в фоне)"))
+                if not fresh:
+                    self._schedule_refresh(
+                        search_key,
+                        lambda: self._fetch_search_results(query, search_key),
+                        read_cached=lambda: self._read_search_cache(search_key)
+                    )
+                return aggregated
+        
+        all_results = self.search_products(query, use_cache=use_cache, shops=shops, cache_only=cache_only)
+        return self._aggregate_and_cache(aggregated_key, all_results)
+    
+    async def aggregate_by_product_async(
+        self,
+        query: str,
+        use_cache: bool = True,
+        shops: Optional[List[str]] = None,
+        cache_only: bool = False
+    ) -> List[Dict]:
+        """
+        Асинхронная агрегация товаров по названию (как aggregate_by_product)
+        
+        Чтение кэша и загрузка из внешних источников не блокируют event loop;
+        группировка и запись результата (синхронный Redis) выполняются в пуле потоков.
+        
+        Args:
+            query: Поисковый запрос
+            use_cache: Использовать ли кэш
+            shops: Список магазинов (игнорируется)
+            cache_only: Только чтение из кэша (пустой список при промахе)
         
         Returns:
             Список агрегированных товаров с ценами
         """
-        all_results = self.search_products(query, use_cache=use_cache, shops=shops)
+        aggregated_key = await self._async_key("search_aggregated", normalize_query(query))
+        if use_cache:
+            search_key = await self._async_key("search", normalize_query(query))
+            if search_key in self.empty_queries and self._is_known_empty(
+                await self._read_cache_entry_async(search_key, deserialize=self._deserialize_products)
+            ):
+                return []
+            cached_entry = await self._read_cache_entry_async(aggregated_key)
+            if cached_entry is not None:
+                aggregated, fresh = cached_entry
+                logger.info(f"Агрегированные товары найдены в кэше для запроса: {query}" + ("" if fresh else " (устарели, обновляем в фоне)"))
+                if not fresh:
+                    self._schedule_refresh(
+                        search_key,
+                        lambda: self._fetch_search_results(query, search_key),
+                        read_cached=lambda: self._read_search_cache(search_key)
+                    )
+                return aggregated
+        
+        all_results = await self.search_products_async(query, use_cache=use_cache, shops=shops, cache_only=cache_only)
+        if not all_results:
+            return []
+        return await asyncio.to_thread(self._aggregate_and_cache, aggregated_key, all_results)
+    
+    def _aggregate_and_cache(self, aggregated_key: str, all_results: Dict[str, List[ProductData]]) -> List[Dict]:
+        """Группировка результатов поиска и сохранение агрегированного результата в кэш"""
+        aggregated = self._aggregate_products(all_results)
         
+        if self.redis_enabled and aggregated:
+            try:
+                self._write_cache(aggregated_key, aggregated, self.cache_ttl)
+            except Exception as e:
+                logger.error(f"Ошибка записи в кэш: {e}")
+        
+        return aggregated
+    
+    @staticmethod
+    def _is_known_empty(cached_entry: Optional[Tuple[Dict, bool]]) -> bool:
+        """Подтверждает ли запись кэша результатов поиска подсказку фильтра пустых запросов"""
+        return cached_entry is not None and not cached_entry[0]
+    
+    def _aggregated_cache_key(self, query: str) -> str:
+        """Ключ кэша агрегированного результата поиска"""
+        return self.key_builder.key("search_aggregated", normalize_query(query))
+    
+    def _delete_cache(self, cache_key: str) -> None:
+        """Удаление записи кэша (в Redis и в памяти всех workers)"""
+        self.local_cache.delete(cache_key)
+        if not self.redis_enabled:
+            return
+        try:
+            self.cache_client.delete(cache_key)
+            self._publish_invalidation(key=cache_key)
+        except Exception as e:
+            logger.error(f"Ошибка удаления из кэша: {e}")
+    
+    def _aggregate_products(self, all_results: Dict[str, List[ProductData]]) -> List[Dict]:
+        """
+        Группировка товаров разных магазинов по бренду и модели
+        
+        Args:
+            all_results: Словарь {название_магазина: список_товаров}
+        
+        Returns:
+            Агрегированные товары, отсортированные по минимальной цене
+        """
         # Логируем результаты из каждого источника
         total_products = 0
         for shop_name, products in all_results.items():
@@ -213,6 +834,8 @@ class ExternalDataService:
         
         # Группировка товаров по бренду и модели
         product_groups = {}
+        # URL для кэша собираются и сохраняются одним pipeline после группировки
+        urls_to_cache = []
         
         for shop_name, products in all_results.items():
             logger.info(f"Обработка {len(products)} товаров из {shop_name}")
@@ -247,29 +870,16 @@ class ExternalDataService:
                         "model": product.model,
                         "image": product.image,
                         "description": product.description,
-                        "prices": []
+                        "prices": [],
+                        "shops": set()
                     }
                 
                 # Добавляем цену, если её еще нет от этого магазина
-                shop_exists = any(
-                    p["shop_name"] == product.shop_name
-                    for p in product_groups[key]["prices"]
-                )
-                
-                if not shop_exists:
+                if product.shop_name not in product_groups[key]["shops"]:
+                    product_groups[key]["shops"].add(product.shop_name)
                     # Сохраняем URL в кэш для быстрого доступа
                     if product.url and product.url.strip():
-                        try:
-                            from url_cache_service import URLCacheService
-                            url_cache = URLCacheService(redis_client=self.redis_client if self.redis_enabled else None)
-                            url_cache.save_product_url(
-                                url=product.url,
-                                brand=product.brand,
-                                model=product.model,
-                                title=product.title
-                            )
-                        except Exception as e:
-                            logger.debug(f"Не удалось сохранить URL в кэш: {e}")
+                        urls_to_cache.append((product.url, product.brand, product.model, product.title))
                     
                     product_groups[key]["prices"].append({
                         "shop_name": product.shop_name,
@@ -281,6 +891,9 @@ class ExternalDataService:
                 else:
                     logger.debug(f"Цена от {product.shop_name} уже существует для товара: {product.title[:50]}...")
         
+        if urls_to_cache:
+            self.url_cache.save_product_urls(urls_to_cache)
+        
         # Преобразование в список и сортировка по минимальной цене
         aggregated = []
         for key, data in product_groups.items():
@@ -335,18 +948,59 @@ class ExternalDataService:
         Returns:
             Список популярных товаров с ценами
         """
-        cache_key = f"popular_products:{limit}"
+        # Одна запись кэша на категорию: загружается сразу popular_fetch_limit товаров,
+        # запросы с меньшим limit получают срез
+        cache_key = self.key_builder.key("popular_products", category)
+        fetch_limit = max(limit, self.popular_fetch_limit)
+        cached_items = None
         
-        # Проверка кэша
-        if use_cache and self.redis_enabled:
-            try:
-                cached_data = self.redis_client.get(cache_key)
-                if cached_data:
-                    logger.info(f"✅ Популярные товары найдены в кэше")
-                    return json.loads(cached_data)
-            except Exception as e:
-                logger.error(f"Ошибка чтения из кэша: {e}")
+        # Проверка кэша (устаревшая запись отдается сразу и обновляется в фоне)
+        if use_cache:
+            cached_entry = self._read_cache_entry(cache_key)
+            if cached_entry is not None:
+                cached, fresh = cached_entry
+                if self._popular_entry_covers(cached, limit):
+                    logger.info(f"✅ Популярные товары найдены в кэше" + ("" if fresh else " (устарели, обновляем в фоне)"))
+                    if not fresh:
+                        refresh_limit = max(cached["requested"], self.popular_fetch_limit)
+                        self._schedule_refresh(
+                            cache_key,
+                            lambda: self._fetch_popular_products(refresh_limit, category, cache_key),
+                            read_cached=lambda: self._read_cache(cache_key)
+                        )
+                    return cached["items"][:limit]
+                
+                # В кэше меньше товаров, чем нужно: догружаем только недостающий хвост
+                cached_items = cached["items"]
+                logger.info(f"ℹ️ В кэше {len(cached_items)} популярных товаров из {limit}, догружаем недостающие")
         
+        # Одинаковые запросы, пришедшие одновременно, ждут результат первого
+        result = self.single_flight.do(
+            f"{cache_key}:{fetch_limit}",
+            lambda: self._fetch_popular_products(fetch_limit, category, cache_key, cached_items),
+            read_cached=lambda: self._read_cache(cache_key)
+        )
+        return result["items"][:limit]
+    
+    def _fetch_popular_products(
+        self,
+        limit: int,
+        category: str,
+        cache_key: str,
+        cached_items: Optional[List[Dict]] = None
+    ) -> Dict:
+        """
+        Получение популярных товаров через API/парсер с сохранением в кэш
+        
+        Args:
+            limit: Сколько товаров запросить у источника
+            category: Категория товаров
+            cache_key: Ключ кэша категории
+            cached_items: Товары, уже лежащие в кэше (к ним добавляются только новые)
+        
+        Returns:
+            Запись кэша {"items": товары, "requested": сколько запрашивали}
+        """
         # Получаем товары из Яндекс.Маркет
         products = []
         
@@ -415,41 +1069,69 @@ class ExternalDataService:
                 "shops_count": 1
             })
         
-        # Сохранение в кэш
-        if self.redis_enabled and result:
+        # Догрузка: товары из кэша остаются в начале, из новых берется только хвост
+        if cached_items:
+            seen = {(item["title"], item["prices"][0]["url"]) for item in cached_items}
+            result = cached_items + [
+                item for item in result
+                if (item["title"], item["prices"][0]["url"]) not in seen
+            ]
+        entry = {"items": result[:limit], "requested": limit}
+        
+        # Сохранение в кэш (если источник ничего не вернул, запись в кэше не меняется)
+        if self.redis_enabled and products:
             try:
-                self.redis_client.setex(
+                self._write_cache(
                     cache_key,
-                    min(self.cache_ttl, 3600),  # Максимум 1 час для популярных товаров
-                    json.dumps(result, default=str)
+                    entry,
+                    min(self.cache_ttl, 3600)  # Максимум 1 час для популярных товаров
                 )
-                logger.info(f"Популярные товары сохранены в кэш")
+                logger.info(f"Популярные товары сохранены в кэш ({len(entry['items'])} шт.)")
             except Exception as e:
                 logger.error(f"Ошибка записи в кэш: {e}")
         
-        return result
+        return entry
     
     def _serialize_products(self, results: Dict[str, List[ProductData]]) -> Dict:
-        """Сериализация продуктов для кэша"""
+        """
+        Сериализация продуктов для кэша
+        
+        Пустые поля и название магазина, совпадающее с ключом группы, не
+        сохраняются; время сохраняется как unix timestamp.
+        """
         serialized = {}
         for shop_name, products in results.items():
-            serialized[shop_name] = [
-                {
+            serialized[shop_name] = []
+            for p in products:
+                item = {
                     "title": p.title,
                     "brand": p.brand,
                     "model": p.model,
                     "price": p.price,
-                    "shop_name": p.shop_name,
                     "url": p.url,
-                    "image": p.image,
-                    "description": p.description,
-                    "scraped_at": p.scraped_at.isoformat() if p.scraped_at else None,
-                    "product_id": p.product_id
                 }
-                for p in products
-            ]
+                if p.shop_name != shop_name:
+                    item["shop_name"] = p.shop_name
+                if p.image:
+                    item["image"] = p.image
+                if p.description:
+                    item["description"] = p.description
+                if p.scraped_at:
+                    item["scraped_at"] = p.scraped_at.timestamp()
+                if p.product_id is not None:
+                    item["product_id"] = p.product_id
+                serialized[shop_name].append(item)
         return serialized
     
+    @staticmethod
+    def _deserialize_datetime(value) -> Optional[datetime]:
+        """Время из кэша: unix timestamp или (в старых записях) ISO-строка"""
+        if not value:
+            return None
+        if isinstance(value, str):
+            return datetime.fromisoformat(value)
+        return datetime.fromtimestamp(value)
+    
     def _deserialize_products(self, data: Dict) -> Dict[str, List[ProductData]]:
         """Десериализация продуктов из кэша"""
         results = {}
@@ -460,11 +1142,11 @@ class ExternalDataService:
                     brand=p["brand"],
                     model=p["model"],
                     price=p["price"],
-                    shop_name=p["shop_name"],
+                    shop_name=p.get("shop_name", shop_name),
                     url=p["url"],
                     image=p.get("image"),
                     description=p.get("description"),
-                    scraped_at=datetime.fromisoformat(p["scraped_at"]) if p.get("scraped_at") else None,
+                    scraped_at=self._deserialize_datetime(p.get("scraped_at")),
                     product_id=p.get("product_id")
                 )
                 for p in products_data
@@ -489,15 +1171,15 @@ class ExternalDataService:
             Список цен из разных магазинов
         """
         query = f"{brand} {model}"
-        cache_key = f"product:{brand.lower()}:{model.lower()}"
+        cache_key = self.key_builder.key("product", brand.lower(), model.lower())
         
         # Проверка кэша
         if use_cache and self.redis_enabled:
             try:
-                cached_data = self.redis_client.get(cache_key)
+                cached_data = self.cache_client.get(cache_key)
                 if cached_data:
                     logger.info(f"Цены найдены в кэше для {brand} {model}")
-                    return json.loads(cached_data)
+                    return self.codec.decode(cached_data)
             except Exception as e:
                 logger.error(f"Ошибка чтения из кэша: {e}")
         
@@ -521,47 +1203,58 @@ class ExternalDataService:
         # Сохранение в кэш
         if self.redis_enabled and prices:
             try:
-                self.redis_client.setex(
-                    cache_key,
-                    self.cache_ttl,
-                    json.dumps(prices, default=str)
-                )
+                self.cache_client.setex(cache_key, self.cache_ttl, self.codec.encode(prices))
             except Exception as e:
                 logger.error(f"Ошибка записи в кэш: {e}")
         
         return prices
     
-    def clear_cache(self, pattern: str = "*") -> int:
+    def clear_cache(self, namespace: Optional[str] = None) -> int:
         """
         Очистка кэша
         
+        Сброс - это смена поколения пространства имен (O(1)); ключи старого
+        поколения удаляются в фоне (SCAN + UNLINK пачками).
+        
         Args:
-            pattern: Паттерн для поиска ключей (по умолчанию "*" - все ключи)
+            namespace: Пространство имен (search, popular_products, product, url);
+                по умолчанию - все, включая ключи старого формата без префикса
         
         Returns:
-            Количество удаленных ключей
+            Количество сброшенных пространств имен
         """
-        if not self.redis_enabled:
-            logger.warning("Redis не доступен, очистка кэша невозможна")
-            return 0
+        namespaces = [namespace, *DERIVED_NAMESPACES.get(namespace, ())] if namespace else list(NAMESPACES)
+        cleared = 0
+        for name in namespaces:
+            try:
+                self.key_builder.invalidate(name)
+                cleared += 1
+            except Exception as e:
+                logger.error(f"❌ Ошибка очистки кэша '{name}': {e}")
+                continue
+            self.local_cache.delete_matching(self.key_builder.namespace_pattern(name))
+            self._publish_invalidation(namespace=name)
+        self.empty_queries.clear()
         
-        try:
-            keys = self.redis_client.keys(pattern)
-            if keys:
-                deleted = self.redis_client.delete(*keys)
-                logger.info(f"✅ Очищено {deleted} ключей из кэша (паттерн: {pattern})")
-                return deleted
-            else:
-                logger.info(f"ℹ️ Ключи не найдены (паттерн: {pattern})")
-                return 0
-        except Exception as e:
-            logger.error(f"❌ Ошибка очистки кэша: {e}")
-            return 0
+        if not self.redis_enabled:
+            logger.warning("Redis не доступен, очищен только кэш в памяти процесса")
+        elif namespace is None:
+            self.key_builder.purge_in_background(LEGACY_PATTERNS)
+        return cleared
     
     def get_cache_stats(self) -> Dict:
-        """Получение статистики кэша"""
+        """Получение статистики кэша (в том числе доли попаданий по уровням: память процесса и Redis)"""
+        redis_lookups = self.redis_hits + self.redis_misses
+        tiers = {
+            "local": self.local_cache.stats(),
+            "redis": {
+                "hits": self.redis_hits,
+                "misses": self.redis_misses,
+                "hit_ratio": round(self.redis_hits / redis_lookups, 4) if redis_lookups else 0.0
+            }
+        }
         if not self.redis_enabled:
-            return {"status": "disabled"}
+            return {"status": "disabled", "tiers": tiers}
         
         try:
             info = self.redis_client.info()
@@ -571,7 +1264,8 @@ class ExternalDataService:
                 "used_memory_human": info.get("used_memory_human", "0B"),
                 "keyspace_hits": info.get("keyspace_hits", 0),
                 "keyspace_misses": info.get("keyspace_misses", 0),
+                "tiers": tiers,
             }
         except Exception as e:
             logger.error(f"Ошибка получения статистики кэша: {e}")
-            return {"status": "error", "error": str(e)}
+            return {"status": "error", "error": str(e), "tiers": tiers}
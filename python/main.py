@@ -1,20 +1,25 @@
 from fastapi import FastAPI, Depends, HTTPException, status, Query
 from fastapi.security import OAuth2PasswordBearer
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from sqlalchemy.orm import joinedload
 import uvicorn
-from typing import List, Optional
+from typing import Callable, List, Optional, Tuple
 from passlib.context import CryptContext
 import bcrypt
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 import os
+import json
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 import logging
 
 import models
 from models import (
-    User, Product, Shop, Listing, Price,
+    User, Product, Shop,
     ViewHistory, Favorite, PriceAlert,
     ShoppingList, ShoppingListItem,
     Comparison, ComparisonProduct,
@@ -25,7 +30,17 @@ from database import *
 
 # Импорт сервиса внешних данных
 from external_data_service import ExternalDataService
-from product_merger import merge_products_alternating
+from cache_warmer import CacheWarmer
+from product_merger import LazySequence, merge_products_page, count_merged_products, iter_products_alternating
+from services.product_service import ProductService
+from repositories.product_repository import ProductRepository
+from services.trigram_index import build_product_title_index, rebuild_product_title_index_forever
+from services.search_session_service import SearchSessionService
+from services.pending_search_service import PENDING_DONE, PENDING_RUNNING, PendingSearchRegistry
+from core.pagination import paginate_keyset
+from core.exceptions import ValidationError
+from core.http_session import close_async_http_client, get_http_stats
+from core.redis_pool import close_async_redis_clients
 
 # Загружаем переменные окружения
 load_dotenv()
@@ -47,6 +62,14 @@ try:
 except Exception as e:
     logging.warning(f"Не удалось подключиться к БД: {e}. Приложение будет работать, но функции, требующие БД, будут недоступны.")
 
+# Триграммный индекс названий товаров для нечеткого поиска (дальше обновляется инкрементально
+# после commit и периодически перестраивается - см. PRODUCT_INDEX_REBUILD_INTERVAL)
+try:
+    with SessionLocal() as index_db:
+        build_product_title_index(index_db)
+except Exception as e:
+    logging.warning(f"Не удалось построить индекс нечеткого поиска: {e}. Поиск будет работать без него.")
+
 app = FastAPI(title="Mobil Api", version="0.10.4")
 
 # Инициализация сервиса внешних данных
@@ -57,8 +80,88 @@ external_data_service = ExternalDataService(
     redis_port=int(os.getenv("REDIS_PORT", "6379")),
     redis_db=int(os.getenv("REDIS_DB", "0")),
     cache_ttl=int(os.getenv("CACHE_TTL", "10800")),  # 3 часа (10800 секунд)
-    redis_enabled=redis_enabled
+    redis_enabled=redis_enabled,
+    stale_ttl=int(os.getenv("CACHE_STALE_TTL", "3600")),  # Устаревшие данные отдаются еще 1 час, обновляясь в фоне
+    local_cache_size=int(os.getenv("LOCAL_CACHE_SIZE", "256")),  # Кэш в памяти процесса перед Redis
+    local_cache_ttl=int(os.getenv("LOCAL_CACHE_TTL", "60")),
+    negative_cache_ttl=int(os.getenv("NEGATIVE_CACHE_TTL", "120")),  # Пустые результаты поиска - 2 минуты
+    cache_codec=os.getenv("CACHE_CODEC", "msgpack"),  # json, zlib или msgpack
+    cache_key_prefix=os.getenv("CACHE_KEY_PREFIX", "cache"),
+    popular_fetch_limit=int(os.getenv("POPULAR_FETCH_LIMIT", "50"))  # Популярных товаров категории в кэше
+)
+
+# Пул потоков для фоновых внешних поисков прогрессивного режима
+external_search_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("EXTERNAL_SEARCH_WORKERS", "8")),
+    thread_name_prefix="external-search"
+)
+# Сколько секунд ждать внешний источник; после этого отдаем то, что есть (БД),
+# а внешний поиск дорабатывает в фоне и попадает в кэш
+EXTERNAL_SEARCH_DEADLINE = float(os.getenv("EXTERNAL_SEARCH_DEADLINE", "20"))
+# Внешние поиски /products, не успевшие к EXTERNAL_SEARCH_DEADLINE (ссылки, чтобы задачи не собрал GC)
+background_external_searches = set()
+
+# Прогрессивный поиск: токены pending_external для фоновых внешних поисков
+pending_search_registry = PendingSearchRegistry(
+    executor=external_search_executor,
+    ttl=int(os.getenv("PENDING_SEARCH_TTL", "300")),  # 5 минут
+    redis_client=external_data_service.redis_client if external_data_service.redis_enabled else None
 )
+# Интервал keep-alive в SSE-потоке прогрессивного поиска (секунд)
+PENDING_STREAM_KEEPALIVE = 15
+
+# Снимки поиска: следующие страницы /products читаются из снимка без повторного поиска
+search_session_service = SearchSessionService(
+    redis_client=external_data_service.redis_client if external_data_service.redis_enabled else None,
+    ttl=int(os.getenv("SEARCH_SESSION_TTL", "600"))  # 10 минут
+)
+
+# Прогрев кэша: популярные товары по категориям и частые поисковые запросы обновляются
+# в фоне, чтобы главный экран не ждал внешний источник. Прогрев обращается к Яндекс.Маркету,
+# поэтому включается явно (CACHE_WARMER_ENABLED=true); без Redis он не нужен
+CACHE_WARMER_ENABLED = redis_enabled and os.getenv("CACHE_WARMER_ENABLED", "false").lower() in ("true", "1", "yes")
+cache_warmer = CacheWarmer(
+    external_data_service,
+    interval=int(os.getenv("CACHE_WARMER_INTERVAL", "1800")),  # 30 минут
+    scrape_budget=int(os.getenv("CACHE_WARMER_BUDGET", "30")),  # Обращений к внешнему источнику за проход
+    trending_top=int(os.getenv("CACHE_WARMER_TOP_QUERIES", "20"))
+)
+
+
+@app.on_event("startup")
+async def start_cache_warmer():
+    """Запуск фонового прогрева кэша"""
+    if CACHE_WARMER_ENABLED and external_data_service.redis_enabled:
+        app.state.cache_warmer_task = asyncio.create_task(cache_warmer.run_forever())
+
+
+# Перестройка индекса нечеткого поиска: подхватывает товары, измененные другими
+# workers, load_from_sql.py и SQL-миграциями (0 - не перестраивать)
+PRODUCT_INDEX_REBUILD_INTERVAL = int(os.getenv("PRODUCT_INDEX_REBUILD_INTERVAL", "600"))  # 10 минут
+
+
+@app.on_event("startup")
+async def start_product_index_rebuild():
+    """Запуск периодической перестройки индекса нечеткого поиска"""
+    if PRODUCT_INDEX_REBUILD_INTERVAL > 0:
+        app.state.product_index_task = asyncio.create_task(
+            rebuild_product_title_index_forever(SessionLocal, PRODUCT_INDEX_REBUILD_INTERVAL)
+        )
+
+
+@app.on_event("shutdown")
+async def stop_product_index_rebuild():
+    """Остановка периодической перестройки индекса нечеткого поиска"""
+    product_index_task = getattr(app.state, "product_index_task", None)
+    if product_index_task is not None:
+        product_index_task.cancel()
+
+
+@app.on_event("shutdown")
+async def close_http_clients():
+    """Закрытие соединений асинхронных клиентов HTTP и Redis"""
+    await close_async_http_client()
+    await close_async_redis_clients()
 
 # JWT настройки
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-this-in-production-min-32-chars")
@@ -337,17 +440,399 @@ def come_in(user: schemas.UserLogin, db: Session = Depends(get_db)):
 
 
 # Эндпоинты для продуктов (только внешние источники - API и парсинг)
+def external_item_to_merge_dict(item: dict) -> dict:
+    """Преобразование агрегированного товара из внешнего источника в формат для merger"""
+    return {
+        "id_product": abs(hash(f"{item['brand']}_{item['model']}")) % 1000000,
+        "title": item['title'],
+        "brand": item['brand'],
+        "model": item['model'],
+        "description": item.get('description'),
+        "image": item.get('image'),
+        "prices": item['prices'],
+        "min_price": item.get('min_price'),
+        "max_price": item.get('max_price')
+    }
+
+
+def build_db_search_products(db: Session, products: List[Product]) -> List[dict]:
+    """
+    Преобразование товаров из БД в формат для merger (для поиска)
+    
+    Listings (с магазинами) и последние цены загружаются пачкой для всех товаров,
+    чтобы число запросов не зависело от количества товаров.
+    
+    Args:
+        db: Сессия БД
+        products: Товары из БД
+    
+    Returns:
+        Список товаров в формате для merger (в том же порядке)
+    """
+    product_service = ProductService(db)
+    listings_by_product = product_service.get_listings_by_product_ids(
+        [product.id_product for product in products]
+    )
+    latest_prices = product_service.price_service.get_latest_prices(
+        listing.id_listing
+        for product_listings in listings_by_product.values()
+        for listing in product_listings
+    )
+    default_shop_name = None
+    
+    db_products = []
+    for product in products:
+        listings = listings_by_product.get(product.id_product, [])
+        prices = []
+        prices_values = []
+        product_url = None  # URL товара из listings
+        
+        # Получаем URL из первого listing, если есть
+        if listings:
+            product_url = listings[0].url
+        
+        for listing in listings:
+            latest_price = latest_prices.get(listing.id_listing)
+            
+            if latest_price and listing.shop:
+                prices.append({
+                    "price": float(latest_price.price),
+                    "shop_name": listing.shop.name,
+                    "url": listing.url,  # URL из таблицы listings
+                    "scraped_at": latest_price.scraped_at.isoformat()
+                })
+                prices_values.append(float(latest_price.price))
+            elif listing.shop and listing.url:
+                # Если нет цены в prices, но есть listing с URL, добавляем его
+                # Это важно для товаров из БД, у которых может не быть записей в prices
+                prices.append({
+                    "price": float(product.price) if product.price else 0.0,
+                    "shop_name": listing.shop.name,
+                    "url": listing.url,  # URL из таблицы listings
+                    "scraped_at": datetime.now().isoformat()
+                })
+                if product.price:
+                    prices_values.append(float(product.price))
+        
+        # Добавляем товар даже если нет цен в prices, используем price из products
+        # Если есть цены в prices, используем их, иначе используем price из products
+        if prices_values:
+            # Есть цены в таблице prices
+            product_price = min(prices_values)
+            min_price = min(prices_values)
+            max_price = max(prices_values)
+        elif product.price:
+            # Нет цен в prices, но есть price в products
+            product_price = float(product.price)
+            min_price = product_price
+            max_price = product_price
+            # Создаем фиктивную цену для отображения, если еще не создана
+            if not prices:
+                # Используем магазин из listings, если есть
+                shop_name = None
+                if listings and listings[0].shop:
+                    shop_name = listings[0].shop.name
+                else:
+                    # Если нет listings, ищем первый доступный магазин в БД (один раз на запрос)
+                    if default_shop_name is None:
+                        first_shop = db.query(Shop).first()
+                        default_shop_name = first_shop.name if first_shop else "Магазин"  # Дефолтное значение
+                    shop_name = default_shop_name
+                
+                prices.append({
+                    "price": product_price,
+                    "shop_name": shop_name,
+                    "url": product_url if product_url else None,  # URL из listings
+                    "scraped_at": datetime.now().isoformat()
+                })
+        else:
+            # Нет ни цен в prices, ни price в products
+            product_price = None
+            min_price = None
+            max_price = None
+        
+        # Добавляем товар в любом случае (даже без цен)
+        db_products.append({
+            "id_product": product.id_product,
+            "title": product.title,
+            "brand": None,  # Поле удалено из БД
+            "model": None,  # Поле удалено из БД
+            "description": None,  # Поле удалено из БД
+            "image": product.image,
+            "price": product_price,
+            "prices": prices,
+            "min_price": min_price,
+            "max_price": max_price
+        })
+    
+    return db_products
+
+
+def hydrate_search_entries(db: Session, entries: List[dict]) -> List[dict]:
+    """
+    Восстановление товаров страницы из элементов снимка поиска
+    
+    Товары из внешнего источника хранятся в снимке целиком, для товаров из БД
+    хранится только ID: цены загружаются пачкой только для товаров страницы.
+    Удаленные из БД товары пропускаются.
+    
+    Args:
+        db: Сессия БД
+        entries: Элементы снимка
+    
+    Returns:
+        Список товаров в формате для merger (в порядке снимка)
+    """
+    db_ids = [entry["id"] for entry in entries if entry["source"] == "db"]
+    db_items = {}
+    if db_ids:
+        products = db.query(Product).filter(Product.id_product.in_(db_ids)).all()
+        db_items = {item["id_product"]: item for item in build_db_search_products(db, products)}
+    
+    items = []
+    for entry in entries:
+        if entry["source"] == "db":
+            item = db_items.get(entry["id"])
+            if item is not None:
+                items.append(item)
+        else:
+            items.append(entry["item"])
+    return items
+
+
+def search_db_products(db: Session, search: str) -> Tuple[List[Product], LazySequence]:
+    """
+    Поиск товаров в БД для чередования с внешним источником
+    
+    Args:
+        db: Сессия БД
+        search: Поисковый запрос
+    
+    Returns:
+        Кортеж (найденные товары, они же в формате для merger - строятся лениво)
+    """
+    # Цены и listings загружаются только для товаров, попавших на страницу
+    def load_page_products(rows: List[Product]) -> List[dict]:
+        # Загрузка выполняется при построении страницы (в build_search_page), поэтому
+        # ошибка БД обрабатывается здесь: страница строится без товаров из БД
+        try:
+            return build_db_search_products(db, rows)
+        except Exception as e:
+            logging.error(f"Ошибка при получении товаров из БД: {e}")
+            return []
+    
+    try:
+        # Полнотекстовый поиск (по релевантности) или ILIKE, если FULLTEXT индекса нет
+        products = ProductRepository(db).search(search, limit=100)  # Берем больше для чередования
+        return products, LazySequence(products, load_page_products)
+    except Exception as e:
+        logging.error(f"Ошибка при получении товаров из БД: {e}")
+        return [], LazySequence([], lambda rows: [])
+
+
+def build_search_page(
+    db: Session,
+    search: str,
+    skip: int,
+    limit: int,
+    db_found: Tuple[List[Product], LazySequence],
+    external_raw: Optional[List[dict]]
+) -> Tuple[List[dict], int, Optional[str]]:
+    """
+    Чередование товаров БД и внешнего источника и создание снимка поиска
+    
+    Args:
+        db: Сессия БД
+        search: Поисковый запрос
+        skip: Пропустить товаров
+        limit: Размер страницы
+        db_found: Результат search_db_products
+        external_raw: Агрегированные товары внешнего источника или None, если
+            они еще не готовы (тогда снимок поиска не создается)
+    
+    Returns:
+        Кортеж (товары страницы в формате для merger, всего товаров, search_id или None)
+    """
+    products, db_products = db_found
+    
+    # Товары внешнего источника
+    # В формат для merger преобразуются только товары, попавшие на страницу
+    external_complete = external_raw is not None
+    external_raw = external_raw or []
+    external_products = LazySequence(
+        external_raw,
+        lambda items: [external_item_to_merge_dict(item) for item in items]
+    )
+    
+    # Логируем количество товаров перед чередованием
+    logging.info(f"📦 Перед чередованием (поиск '{search}'): внешний источник={len(external_products)}, БД={len(db_products)}")
+    
+    # Объединяем товары с чередованием: строим только запрошенную страницу,
+    # общее количество считаем по длинам источников (после построения страницы:
+    # если загрузить товары из БД не удалось, источник БД становится пустым)
+    paginated_products = merge_products_page(
+        external_products=external_products,
+        db_products=db_products,
+        static_products=[],  # Статические товары уже в БД
+        skip=skip,
+        limit=limit
+    )
+    total = count_merged_products(external_products, db_products)
+    if db_products.failed:
+        products = []
+    
+    logging.info(f"🔄 После чередования: {total} товаров, на странице {len(paginated_products)}")
+    
+    # Сохраняем порядок товаров в снимок поиска для следующих страниц
+    # (если внешний источник не успел, снимок не создаем: следующая страница
+    # выполнит поиск заново и получит внешние товары из кэша)
+    search_id = None
+    if total and external_complete:
+        snapshot_entries = iter_products_alternating(
+            [{"source": "external", "item": external_item_to_merge_dict(item)} for item in external_raw],
+            [{"source": "db", "id": product.id_product} for product in products]
+        )
+        search_id = search_session_service.create(search, list(snapshot_entries))
+        logging.info(f"📸 Создан снимок поиска {search_id} ({total} товаров)")
+    
+    return paginated_products, total, search_id
+
+
+def run_product_search(
+    db: Session,
+    search: str,
+    skip: int,
+    limit: int,
+    wait_external: Callable[[], Optional[List[dict]]]
+) -> Tuple[List[dict], int, Optional[str]]:
+    """
+    Поиск товаров в БД и внешнем источнике с чередованием и созданием снимка поиска
+    
+    Args:
+        db: Сессия БД
+        search: Поисковый запрос
+        skip: Пропустить товаров
+        limit: Размер страницы
+        wait_external: Вызывается после поиска по БД и возвращает агрегированные
+            товары внешнего источника или None, если они еще не готовы
+            (тогда снимок поиска не создается)
+    
+    Returns:
+        Кортеж (товары страницы в формате для merger, всего товаров, search_id или None)
+    """
+    db_found = search_db_products(db, search)
+    return build_search_page(db, search, skip, limit, db_found, wait_external())
+
+
+def build_products_response(
+    items: List[dict],
+    total: int,
+    search_id: Optional[str] = None,
+    pending_external: Optional[str] = None
+) -> schemas.ProductsResponse:
+    """Преобразование товаров в формате для merger в ответ API"""
+    products_with_prices = []
+    for item in items:
+        # Получаем URL из первой цены, если есть (для товаров из Яндекс.Маркет)
+        product_url = None
+        if item.get('prices') and len(item['prices']) > 0:
+            product_url = item['prices'][0].get('url')
+        
+        product_response = schemas.ProductResponse(
+            id_product=item['id_product'],
+            title=item['title'],
+            brand=item.get('brand'),
+            model=item.get('model'),
+            image=item.get('image'),
+            description=item.get('description'),
+            price=item.get('price'),
+            url=product_url  # URL товара для кнопки "Купить"
+        )
+        
+        # Преобразование цен
+        price_responses = []
+        for price_data in item['prices']:
+            price_response = schemas.PriceResponse(
+                price=price_data['price'],
+                scraped_at=datetime.fromisoformat(price_data['scraped_at']) if isinstance(price_data['scraped_at'], str) else price_data['scraped_at'],
+                shop_name=price_data['shop_name'],
+                shop_id=abs(hash(price_data['shop_name'])) % 10000,
+                url=price_data.get('url')
+            )
+            price_responses.append(price_response)
+        
+        product_with_prices = schemas.ProductWithPrices(
+            product=product_response,
+            prices=price_responses,
+            min_price=item.get('min_price'),
+            max_price=item.get('max_price')
+        )
+        products_with_prices.append(product_with_prices)
+    
+    return schemas.ProductsResponse(
+        products=products_with_prices,
+        total=total,
+        search_id=search_id,
+        pending_external=pending_external
+    )
+
+
+async def wait_external_search(task: "asyncio.Task", started_at: float) -> Optional[List[dict]]:
+    """
+    Ожидание внешнего поиска не дольше EXTERNAL_SEARCH_DEADLINE с начала поиска
+    
+    Args:
+        task: Задача aggregate_by_product_async
+        started_at: Время начала поиска (time.monotonic)
+    
+    Returns:
+        Агрегированные товары, None по таймауту (поиск продолжается в фоне и
+        попадет в кэш) или пустой список при ошибке
+    """
+    remaining = max(0.0, EXTERNAL_SEARCH_DEADLINE - (time.monotonic() - started_at))
+    done, _ = await asyncio.wait({task}, timeout=remaining)
+    if not done:
+        logging.warning(f"⏱️ Внешний источник не ответил за {EXTERNAL_SEARCH_DEADLINE} сек, "
+                        f"возвращаем результаты из БД (поиск продолжится в фоне и попадет в кэш)")
+        background_external_searches.add(task)
+        task.add_done_callback(background_external_searches.discard)
+        task.add_done_callback(lambda finished: finished.cancelled() or finished.exception())
+        return None
+    try:
+        external_raw = task.result()
+        logging.info(f"✅ Получено {len(external_raw)} товаров из внешнего источника")
+        return external_raw
+    except Exception as e:
+        logging.error(f"Ошибка при получении товаров из внешнего источника: {e}")
+        return []
+
+
 @app.get("/products", response_model=schemas.ProductsResponse)
-def get_products(
+async def get_products(
         skip: int = Query(0, ge=0),
         limit: int = Query(50, ge=1, le=100),
         search: Optional[str] = Query(None, description="Поисковый запрос"),
         use_cache: bool = Query(True, description="Использовать кэш"),
+        search_id: Optional[str] = Query(None, description="ID снимка поиска из ответа на первую страницу"),
+        progressive: bool = Query(False, description="Сразу вернуть товары из БД и кэша, внешний поиск - в фоне"),
         db: Session = Depends(get_db)
 ):
     """
     Поиск товаров с чередованием
     Если search не указан, возвращает пустой результат
+    
+    Ответ содержит search_id снимка поиска: при передаче его вместе с тем же
+    search следующие страницы читаются из снимка (тот же порядок товаров,
+    без повторного поиска). Если снимок истек, поиск выполняется заново
+    и возвращается новый search_id.
+    
+    Поиск во внешнем источнике идет в event loop (асинхронные HTTP и Redis) и
+    не занимает поток; в пуле потоков выполняются только запросы к БД.
+    
+    В режиме progressive=true, если внешних товаров нет в кэше, ответ
+    содержит только товары из БД и токен pending_external: полный результат
+    можно получить через /products/pending/{token} (опрос) или
+    /products/pending/{token}/stream (SSE).
     """
     try:
         if not search:
@@ -355,202 +840,180 @@ def get_products(
         
         logging.info("=" * 80)
         logging.info(f"🔍 ПОИСК ТОВАРОВ ПО ЗАПРОСУ: '{search}'")
-        logging.info(f"   Параметры: skip={skip}, limit={limit}, use_cache={use_cache}")
+        logging.info(f"   Параметры: skip={skip}, limit={limit}, use_cache={use_cache}, progressive={progressive}")
         logging.info("=" * 80)
         
-        # Получаем товары из внешнего источника
-        external_products = []
-        try:
-            logging.info(f"📡 Запрос к внешнему источнику данных (Яндекс.Маркет)...")
-            external_raw = external_data_service.aggregate_by_product(
+        # Следующие страницы читаются из снимка поиска, если он еще не истек
+        if search_id:
+            snapshot_page = await run_in_threadpool(search_session_service.get_page, search_id, search, skip, limit)
+            if snapshot_page is not None:
+                snapshot_entries, total = snapshot_page
+                paginated_products = await run_in_threadpool(hydrate_search_entries, db, snapshot_entries)
+                logging.info(f"📸 Страница из снимка поиска {search_id}: {len(paginated_products)} товаров (всего {total})")
+                return build_products_response(paginated_products, total, search_id=search_id)
+            logging.info(f"Снимок поиска {search_id} не найден или истек, выполняем поиск заново")
+        
+        # Частые запросы прогреваются в фоне (cache_warmer.py)
+        if skip == 0:
+            await run_in_threadpool(external_data_service.record_search_query, search)
+        
+        pending_external = None
+        if progressive:
+            # Первая фаза: внешние товары только из кэша, на промахе - поиск в фоне
+            external_raw = await external_data_service.aggregate_by_product_async(
                 query=search,
-                use_cache=use_cache
+                use_cache=True,
+                cache_only=True
+            ) if use_cache else []
+            if external_raw:
+                logging.info(f"✅ Получено {len(external_raw)} товаров внешнего источника из кэша")
+            else:
+                pending_external = await run_in_threadpool(
+                    pending_search_registry.start,
+                    search,
+                    lambda: external_data_service.aggregate_by_product(query=search, use_cache=use_cache)
+                )
+                external_raw = None
+            db_found = await run_in_threadpool(search_db_products, db, search)
+        else:
+            # Поиск во внешнем источнике идет в event loop, пока в пуле потоков
+            # выполняется поиск по БД (сессия БД не потокобезопасна - один поток)
+            started_at = time.monotonic()
+            logging.info(f"📡 Запрос к внешнему источнику данных (Яндекс.Маркет)...")
+            external_task = asyncio.create_task(
+                external_data_service.aggregate_by_product_async(query=search, use_cache=use_cache)
             )
-            logging.info(f"✅ Получено {len(external_raw)} товаров из внешнего источника")
-            # Преобразуем в формат для merger
-            for item in external_raw:
-                external_products.append({
-                    "id_product": abs(hash(f"{item['brand']}_{item['model']}")) % 1000000,
-                    "title": item['title'],
-                    "brand": item['brand'],
-                    "model": item['model'],
-                    "description": item.get('description'),
-                    "image": item.get('image'),
-                    "prices": item['prices'],
-                    "min_price": item.get('min_price'),
-                    "max_price": item.get('max_price')
-                })
-        except Exception as e:
-            logging.error(f"Ошибка при получении товаров из внешнего источника: {e}")
+            try:
+                db_found = await run_in_threadpool(search_db_products, db, search)
+            except BaseException:
+                external_task.cancel()
+                raise
+            external_raw = await wait_external_search(external_task, started_at)
+        
+        paginated_products, total, search_id = await run_in_threadpool(
+            build_search_page, db, search, skip, limit, db_found, external_raw
+        )
         
-        # Получаем товары из БД
-        db_products = []
+        logging.info(f"Возвращено {len(paginated_products)} товаров (всего: {total})")
+        return build_products_response(paginated_products, total, search_id=search_id, pending_external=pending_external)
+    except Exception as e:
+        logging.error(f"Ошибка при получении продуктов: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Ошибка при получении продуктов: {str(e)}"
+        )
+
+
+def get_pending_external_result(token: str, search: str) -> Optional[List[dict]]:
+    """
+    Результат фонового поиска во внешнем источнике
+    
+    Поиск, запущенный другим worker, отслеживается по состоянию токена в
+    Redis, а его результат читается из кэша внешнего источника.
+    
+    Args:
+        token: Токен pending_external
+        search: Поисковый запрос
+    
+    Returns:
+        Агрегированные товары (пустой список, если поиск ничего не нашел или
+        завершился ошибкой) или None, если поиск еще идет
+    
+    Raises:
+        HTTPException: 404, если токен неизвестен и в кэше результата нет
+    """
+    pending = pending_search_registry.get(token)
+    if pending is not None:
+        if not pending.future.done():
+            return None
         try:
-            query = db.query(Product)
-            if search:
-                search_term = f"%{search.lower()}%"
-                query = query.filter(Product.title.ilike(search_term))
-            
-            products = query.limit(100).all()  # Берем больше для чередования
-            
-            for product in products:
-                listings = db.query(Listing).filter(Listing.product_id == product.id_product).all()
-                prices = []
-                prices_values = []
-                product_url = None  # URL товара из listings
-                
-                # Получаем URL из первого listing, если есть
-                if listings:
-                    product_url = listings[0].url
-                
-                for listing in listings:
-                    latest_price = db.query(Price).filter(
-                        Price.listing_id == listing.id_listing
-                    ).order_by(Price.scraped_at.desc()).first()
-                    
-                    if latest_price and listing.shop:
-                        prices.append({
-                            "price": float(latest_price.price),
-                            "shop_name": listing.shop.name,
-                            "url": listing.url,  # URL из таблицы listings
-                            "scraped_at": latest_price.scraped_at.isoformat()
-                        })
-                        prices_values.append(float(latest_price.price))
-                    elif listing.shop and listing.url:
-                        # Если нет цены в prices, но есть listing с URL, добавляем его
-                        # Это важно для товаров из БД, у которых может не быть записей в prices
-                        prices.append({
-                            "price": float(product.price) if product.price else 0.0,
-                            "shop_name": listing.shop.name,
-                            "url": listing.url,  # URL из таблицы listings
-                            "scraped_at": datetime.now().isoformat()
-                        })
-                        if product.price:
-                            prices_values.append(float(product.price))
-                
-                # Добавляем товар даже если нет цен в prices, используем price из products
-                # Если есть цены в prices, используем их, иначе используем price из products
-                if prices_values:
-                    # Есть цены в таблице prices
-                    product_price = min(prices_values)
-                    min_price = min(prices_values)
-                    max_price = max(prices_values)
-                elif product.price:
-                    # Нет цен в prices, но есть price в products
-                    product_price = float(product.price)
-                    min_price = product_price
-                    max_price = product_price
-                    # Создаем фиктивную цену для отображения, если еще не создана
-                    if not prices:
-                        # Используем магазин из listings, если есть
-                        shop_name = None
-                        if listings and listings[0].shop:
-                            shop_name = listings[0].shop.name
-                        else:
-                            # Если нет listings, ищем первый доступный магазин в БД
-                            first_shop = db.query(Shop).first()
-                            if first_shop:
-                                shop_name = first_shop.name
-                            else:
-                                shop_name = "Магазин"  # Дефолтное значение
-                        
-                        prices.append({
-                            "price": product_price,
-                            "shop_name": shop_name,
-                            "url": product_url if product_url else None,  # URL из listings
-                            "scraped_at": datetime.now().isoformat()
-                        })
-                else:
-                    # Нет ни цен в prices, ни price в products
-                    product_price = None
-                    min_price = None
-                    max_price = None
-                
-                # Добавляем товар в любом случае (даже без цен)
-                db_products.append({
-                    "id_product": product.id_product,
-                    "title": product.title,
-                    "brand": None,  # Поле удалено из БД
-                    "model": None,  # Поле удалено из БД
-                    "description": None,  # Поле удалено из БД
-                    "image": product.image,
-                    "price": product_price,
-                    "prices": prices,
-                    "min_price": min_price,
-                    "max_price": max_price
-                })
+            return pending.future.result()
         except Exception as e:
-            logging.error(f"Ошибка при получении товаров из БД: {e}")
-        
-        # Логируем количество товаров перед чередованием
-        logging.info(f"📦 Перед чередованием (поиск '{search}'): внешний источник={len(external_products)}, БД={len(db_products)}")
-        
-        # Объединяем товары с чередованием
-        merged_products = merge_products_alternating(
-            external_products=external_products,
-            db_products=db_products,
-            static_products=[]  # Статические товары уже в БД
+            logging.error(f"Ошибка фонового поиска во внешнем источнике: {e}")
+            return []
+    
+    state = pending_search_registry.state(token)
+    if state == PENDING_RUNNING:
+        return None
+    if state == PENDING_DONE or state is None:
+        cached_external = external_data_service.aggregate_by_product(query=search, cache_only=True)
+        if cached_external:
+            return cached_external
+    if state is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Фоновый поиск не найден или истек"
         )
+    # Поиск завершен, но ничего не нашел, упал или результат уже вытеснен из кэша:
+    # отдаем результат без внешнего источника
+    return []
+
+
+@app.get("/products/pending/{token}", response_model=schemas.ProductsResponse)
+def get_pending_products(
+        token: str,
+        search: str = Query(..., description="Поисковый запрос (тот же, что в /products)"),
+        skip: int = Query(0, ge=0),
+        limit: int = Query(50, ge=1, le=100),
+        db: Session = Depends(get_db)
+):
+    """
+    Опрос прогрессивного поиска
+    
+    Пока внешний поиск идет, возвращает пустой список с тем же pending_external.
+    Когда он завершен - полную страницу результата (БД + внешний источник) и search_id.
+    """
+    try:
+        external_raw = get_pending_external_result(token, search)
+        if external_raw is None:
+            return schemas.ProductsResponse(products=[], total=0, pending_external=token)
         
-        logging.info(f"🔄 После чередования: {len(merged_products)} товаров")
-        
-        # Применяем пагинацию
-        total = len(merged_products)
-        paginated_products = merged_products[skip:skip + limit]
-        
-        
-        # Преобразование в формат API
-        products_with_prices = []
-        for item in paginated_products:
-            # Получаем URL из первой цены, если есть (для товаров из Яндекс.Маркет)
-            product_url = None
-            if item.get('prices') and len(item['prices']) > 0:
-                product_url = item['prices'][0].get('url')
-            
-            product_response = schemas.ProductResponse(
-                id_product=item['id_product'],
-                title=item['title'],
-                brand=item.get('brand'),
-                model=item.get('model'),
-                image=item.get('image'),
-                description=item.get('description'),
-                price=item.get('price'),
-                url=product_url  # URL товара для кнопки "Купить"
-            )
-            
-            # Преобразование цен
-            price_responses = []
-            for price_data in item['prices']:
-                price_response = schemas.PriceResponse(
-                    price=price_data['price'],
-                    scraped_at=datetime.fromisoformat(price_data['scraped_at']) if isinstance(price_data['scraped_at'], str) else price_data['scraped_at'],
-                    shop_name=price_data['shop_name'],
-                    shop_id=abs(hash(price_data['shop_name'])) % 10000,
-                    url=price_data.get('url')
-                )
-                price_responses.append(price_response)
-            
-            product_with_prices = schemas.ProductWithPrices(
-                product=product_response,
-                prices=price_responses,
-                min_price=item.get('min_price'),
-                max_price=item.get('max_price')
-            )
-            products_with_prices.append(product_with_prices)
-        
-        logging.info(f"Возвращено {len(products_with_prices)} товаров (внешний источник: {len(external_products)}, БД: {len(db_products)}, всего: {total})")
-        return schemas.ProductsResponse(
-            products=products_with_prices,
-            total=total
-        )
+        paginated_products, total, search_id = run_product_search(db, search, skip, limit, lambda: external_raw)
+        return build_products_response(paginated_products, total, search_id=search_id)
+    except HTTPException:
+        raise
     except Exception as e:
-        logging.error(f"Ошибка при получении продуктов: {e}", exc_info=True)
+        logging.error(f"Ошибка при получении результата фонового поиска: {e}", exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Ошибка при получении продуктов: {str(e)}"
+            detail=f"Ошибка при получении результата фонового поиска: {str(e)}"
         )
 
 
+@app.get("/products/pending/{token}/stream")
+def stream_pending_products(
+        token: str,
+        search: str = Query(..., description="Поисковый запрос (тот же, что в /products)"),
+        limit: int = Query(50, ge=1, le=100)
+):
+    """
+    SSE-поток прогрессивного поиска
+    
+    Пока внешний поиск идет, раз в PENDING_STREAM_KEEPALIVE секунд отправляется
+    комментарий keep-alive; по завершении - событие result с первой страницей
+    полного результата (как в /products), после чего поток закрывается.
+    """
+    # Проверяем токен до начала потока, чтобы вернуть 404 обычным ответом
+    get_pending_external_result(token, search)
+    
+    def events():
+        while not pending_search_registry.wait(token, PENDING_STREAM_KEEPALIVE):
+            yield ": keep-alive\n\n"
+        
+        try:
+            external_raw = get_pending_external_result(token, search) or []
+        except HTTPException as e:
+            yield f"event: error\ndata: {json.dumps({'detail': e.detail}, ensure_ascii=False)}\n\n"
+            return
+        
+        with SessionLocal() as stream_db:
+            paginated_products, total, search_id = run_product_search(stream_db, search, 0, limit, lambda: external_raw)
+            response = build_products_response(paginated_products, total, search_id=search_id)
+        yield f"event: result\ndata: {response.model_dump_json()}\n\n"
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
 @app.get("/products/popular", response_model=schemas.ProductsResponse)
 def get_popular_products(
     limit: int = Query(10, ge=1, le=50, description="Количество популярных товаров"),
@@ -673,8 +1136,20 @@ def get_popular_products(
             products = db.query(Product).limit(db_limit).all()
             logging.info(f"Загружено {len(products)} товаров из таблицы products для обработки")
             
+            # Listings и последние цены загружаем пачкой для всех товаров
+            product_service = ProductService(db)
+            listings_by_product = product_service.get_listings_by_product_ids(
+                [product.id_product for product in products]
+            )
+            latest_prices = product_service.price_service.get_latest_prices(
+                listing.id_listing
+                for product_listings in listings_by_product.values()
+                for listing in product_listings
+            )
+            default_shop_name = None
+            
             for product in products:
-                listings = db.query(Listing).filter(Listing.product_id == product.id_product).all()
+                listings = listings_by_product.get(product.id_product, [])
                 prices = []
                 prices_values = []
                 product_url = None  # URL товара из listings
@@ -684,9 +1159,7 @@ def get_popular_products(
                     product_url = listings[0].url
                 
                 for listing in listings:
-                    latest_price = db.query(Price).filter(
-                        Price.listing_id == listing.id_listing
-                    ).order_by(Price.scraped_at.desc()).first()
+                    latest_price = latest_prices.get(listing.id_listing)
                     
                     if latest_price and listing.shop:
                         prices.append({
@@ -716,12 +1189,11 @@ def get_popular_products(
                         if listings and listings[0].shop:
                             shop_name = listings[0].shop.name
                         else:
-                            # Если нет listings, ищем первый доступный магазин в БД
-                            first_shop = db.query(Shop).first()
-                            if first_shop:
-                                shop_name = first_shop.name
-                            else:
-                                shop_name = "Магазин"  # Дефолтное значение, если нет магазинов
+                            # Если нет listings, ищем первый доступный магазин в БД (один раз на запрос)
+                            if default_shop_name is None:
+                                first_shop = db.query(Shop).first()
+                                default_shop_name = first_shop.name if first_shop else "Магазин"  # Дефолтное значение, если нет магазинов
+                            shop_name = default_shop_name
                         
                         prices.append({
                             "price": product_price,
@@ -741,12 +1213,11 @@ def get_popular_products(
                         if listings and listings[0].shop:
                             shop_name = listings[0].shop.name
                         else:
-                            # Если нет listings, ищем первый доступный магазин в БД
-                            first_shop = db.query(Shop).first()
-                            if first_shop:
-                                shop_name = first_shop.name
-                            else:
-                                shop_name = "Магазин"  # Дефолтное значение
+                            # Если нет listings, ищем первый доступный магазин в БД (один раз на запрос)
+                            if default_shop_name is None:
+                                first_shop = db.query(Shop).first()
+                                default_shop_name = first_shop.name if first_shop else "Магазин"  # Дефолтное значение
+                            shop_name = default_shop_name
                         
                         prices.append({
                             "price": 0.0,  # Цена неизвестна
@@ -788,17 +1259,17 @@ def get_popular_products(
         if db_products:
             logging.info(f"   ✅ Примеры товаров из БД: {', '.join([p.get('title', 'Unknown')[:30] for p in db_products[:3]])}")
         
-        # Объединяем товары с чередованием
-        merged_products = merge_products_alternating(
+        # Объединяем товары с чередованием (строим только первые limit товаров)
+        total = count_merged_products(external_products, db_products)
+        final_products = merge_products_page(
             external_products=external_products,
             db_products=db_products,
-            static_products=[]  # Статические товары уже в БД
+            static_products=[],  # Статические товары уже в БД
+            skip=0,
+            limit=limit
         )
         
-        logging.info(f"🔄 После чередования: {len(merged_products)} товаров")
-        
-        # Ограничиваем количество до limit
-        final_products = merged_products[:limit]
+        logging.info(f"🔄 После чередования: {total} товаров")
         
         # Логируем источники товаров в финальном списке
         external_count = sum(1 for p in final_products if p.get('brand') is not None and p.get('brand') != "Не указан")
@@ -860,7 +1331,7 @@ def get_popular_products(
         logging.info(f"✅ Возвращаем {len(products_with_prices)} товаров клиенту (внешний источник: {external_final}, БД: {db_final})")
         return schemas.ProductsResponse(
             products=products_with_prices,
-            total=len(merged_products)
+            total=total
         )
     except Exception as e:
         logging.error(f"Ошибка при получении популярных товаров: {e}", exc_info=True)
@@ -871,6 +1342,21 @@ def get_popular_products(
         )
 
 
+@app.post("/products/urls", response_model=schemas.ProductUrlsResponse)
+def resolve_product_urls(request: schemas.ProductUrlsRequest):
+    """
+    Ссылки "Купить" для всех товаров страницы за один запрос
+    
+    Для каждого товара: переданный URL, затем URL из кэша (все товары - одним
+    MGET), затем поисковый URL Яндекс.Маркета.
+    """
+    urls = external_data_service.url_cache.get_or_build_urls(
+        [(item.brand, item.model, item.title, item.url) for item in request.items],
+        partner_id=request.partner_id
+    )
+    return schemas.ProductUrlsResponse(urls=urls)
+
+
 # ==================== ИСТОРИЯ ПРОСМОТРОВ ====================
 
 @app.post("/user/view-history", response_model=schemas.ViewHistoryResponse)
@@ -893,97 +1379,29 @@ def add_view_history(
         ).order_by(ViewHistory.viewed_at.desc()).first()
         
         # Если есть недавняя запись (менее часа назад), обновляем время
-        if existing_view:
-            from datetime import timedelta
-            if existing_view.viewed_at > datetime.utcnow() - timedelta(hours=1):
-                existing_view.viewed_at = datetime.utcnow()
-                db.commit()
-                db.refresh(existing_view)
-                # Получаем продукт с ценами для ответа
-                product = db.query(Product).options(
-                    joinedload(Product.listings).joinedload(Listing.prices),
-                    joinedload(Product.listings).joinedload(Listing.shop)
-                ).filter(Product.id_product == product_id).first()
-                
-                if product:
-                    latest_prices = []
-                    shop_prices = {}
-                    for listing in product.listings:
-                        if listing.prices:
-                            latest_price = max(listing.prices, key=lambda x: x.scraped_at)
-                            if listing.shop_id not in shop_prices:
-                                latest_prices.append(schemas.PriceResponse(
-                                    price=float(latest_price.price),
-                                    scraped_at=latest_price.scraped_at,
-                                    shop_name=listing.shop.name,
-                                    shop_id=listing.shop_id,
-                                    url=listing.url
-                                ))
-                                shop_prices[listing.shop_id] = latest_price
-                    
-                    prices_values = [p.price for p in latest_prices]
-                    min_price = min(prices_values) if prices_values else None
-                    max_price = max(prices_values) if prices_values else None
-                    
-                    product_with_prices = schemas.ProductWithPrices(
-                        product=schemas.ProductResponse.model_validate(product),
-                        prices=latest_prices,
-                        min_price=min_price,
-                        max_price=max_price
-                    )
-                    
-                    return schemas.ViewHistoryResponse(
-                        id_view=existing_view.id_view,
-                        product=product_with_prices,
-                        viewed_at=existing_view.viewed_at
-                    )
-        
-        # Создаем новую запись
-        new_view = ViewHistory(
-            user_id=current_user.id_user,
-            product_id=product_id
-        )
-        db.add(new_view)
-        db.commit()
-        db.refresh(new_view)
+        if existing_view and existing_view.viewed_at > datetime.utcnow() - timedelta(hours=1):
+            existing_view.viewed_at = datetime.utcnow()
+            db.commit()
+            db.refresh(existing_view)
+            view = existing_view
+        else:
+            # Создаем новую запись
+            view = ViewHistory(
+                user_id=current_user.id_user,
+                product_id=product_id
+            )
+            db.add(view)
+            db.commit()
+            db.refresh(view)
         
         # Получаем продукт с ценами для ответа
-        product = db.query(Product).options(
-            joinedload(Product.listings).joinedload(Listing.prices),
-            joinedload(Product.listings).joinedload(Listing.shop)
-        ).filter(Product.id_product == product_id).first()
-        
-        if product:
-            latest_prices = []
-            shop_prices = {}
-            for listing in product.listings:
-                if listing.prices:
-                    latest_price = max(listing.prices, key=lambda x: x.scraped_at)
-                    if listing.shop_id not in shop_prices:
-                        latest_prices.append(schemas.PriceResponse(
-                            price=float(latest_price.price),
-                            scraped_at=latest_price.scraped_at,
-                            shop_name=listing.shop.name,
-                            shop_id=listing.shop_id,
-                            url=listing.url
-                        ))
-                        shop_prices[listing.shop_id] = latest_price
-            
-            prices_values = [p.price for p in latest_prices]
-            min_price = min(prices_values) if prices_values else None
-            max_price = max(prices_values) if prices_values else None
-            
-            product_with_prices = schemas.ProductWithPrices(
-                product=schemas.ProductResponse.model_validate(product),
-                prices=latest_prices,
-                min_price=min_price,
-                max_price=max_price
-            )
-            
+        product_with_prices = ProductService(db).get_products_with_prices([product_id]).get(product_id)
+        
+        if product_with_prices:
             return schemas.ViewHistoryResponse(
-                id_view=new_view.id_view,
+                id_view=view.id_view,
                 product=product_with_prices,
-                viewed_at=new_view.viewed_at
+                viewed_at=view.viewed_at
             )
     except HTTPException:
         raise
@@ -999,62 +1417,41 @@ def add_view_history(
 def get_view_history(
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы (next_cursor из предыдущего ответа)"),
+    include_total: bool = Query(True, description="Считать ли общее количество"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Получить историю просмотров пользователя"""
     try:
-        views = db.query(ViewHistory).filter(
+        views_query = db.query(ViewHistory).filter(
             ViewHistory.user_id == current_user.id_user
-        ).order_by(ViewHistory.viewed_at.desc()).offset(skip).limit(limit).all()
+        )
+        views, next_cursor = paginate_keyset(
+            views_query, ViewHistory.viewed_at, ViewHistory.id_view,
+            limit=limit, cursor=cursor, skip=skip
+        )
         
-        total = db.query(ViewHistory).filter(
-            ViewHistory.user_id == current_user.id_user
-        ).count()
+        total = views_query.count() if include_total else None
+        
+        # Получаем продукты с ценами одной пачкой
+        products_with_prices = ProductService(db).get_products_with_prices(
+            [view.product_id for view in views]
+        )
         
         views_response = []
         for view in views:
-            # Получаем продукт с ценами
-            product = db.query(Product).options(
-                joinedload(Product.listings).joinedload(Listing.prices),
-                joinedload(Product.listings).joinedload(Listing.shop)
-            ).filter(Product.id_product == view.product_id).first()
-            
-            if product:
-                # Формируем цены
-                latest_prices = []
-                shop_prices = {}
-                for listing in product.listings:
-                    if listing.prices:
-                        latest_price = max(listing.prices, key=lambda x: x.scraped_at)
-                        if listing.shop_id not in shop_prices:
-                            latest_prices.append(schemas.PriceResponse(
-                                price=float(latest_price.price),
-                                scraped_at=latest_price.scraped_at,
-                                shop_name=listing.shop.name,
-                                shop_id=listing.shop_id,
-                                url=listing.url
-                            ))
-                            shop_prices[listing.shop_id] = latest_price
-                
-                prices_values = [p.price for p in latest_prices]
-                min_price = min(prices_values) if prices_values else None
-                max_price = max(prices_values) if prices_values else None
-                
-                product_with_prices = schemas.ProductWithPrices(
-                    product=schemas.ProductResponse.model_validate(product),
-                    prices=latest_prices,
-                    min_price=min_price,
-                    max_price=max_price
-                )
-                
+            product_with_prices = products_with_prices.get(view.product_id)
+            if product_with_prices:
                 views_response.append(schemas.ViewHistoryResponse(
                     id_view=view.id_view,
                     product=product_with_prices,
                     viewed_at=view.viewed_at
                 ))
         
-        return schemas.ViewHistoryListResponse(views=views_response, total=total)
+        return schemas.ViewHistoryListResponse(views=views_response, total=total, next_cursor=next_cursor)
+    except ValidationError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1116,36 +1513,7 @@ def add_to_favorites(
         db.refresh(new_favorite)
         
         # Получаем продукт с ценами
-        product = db.query(Product).options(
-            joinedload(Product.listings).joinedload(Listing.prices),
-            joinedload(Product.listings).joinedload(Listing.shop)
-        ).filter(Product.id_product == product_id).first()
-        
-        latest_prices = []
-        shop_prices = {}
-        for listing in product.listings:
-            if listing.prices:
-                latest_price = max(listing.prices, key=lambda x: x.scraped_at)
-                if listing.shop_id not in shop_prices:
-                    latest_prices.append(schemas.PriceResponse(
-                        price=float(latest_price.price),
-                        scraped_at=latest_price.scraped_at,
-                        shop_name=listing.shop.name,
-                        shop_id=listing.shop_id,
-                        url=listing.url
-                    ))
-                    shop_prices[listing.shop_id] = latest_price
-        
-        prices_values = [p.price for p in latest_prices]
-        min_price = min(prices_values) if prices_values else None
-        max_price = max(prices_values) if prices_values else None
-        
-        product_with_prices = schemas.ProductWithPrices(
-            product=schemas.ProductResponse.model_validate(product),
-            prices=latest_prices,
-            min_price=min_price,
-            max_price=max_price
-        )
+        product_with_prices = ProductService(db).get_products_with_prices([product_id])[product_id]
         
         return schemas.FavoriteResponse(
             id_favorite=new_favorite.id_favorite,
@@ -1166,60 +1534,41 @@ def add_to_favorites(
 def get_favorites(
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы (next_cursor из предыдущего ответа)"),
+    include_total: bool = Query(True, description="Считать ли общее количество"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Получить избранное пользователя"""
     try:
-        favorites = db.query(Favorite).filter(
+        favorites_query = db.query(Favorite).filter(
             Favorite.user_id == current_user.id_user
-        ).order_by(Favorite.added_at.desc()).offset(skip).limit(limit).all()
+        )
+        favorites, next_cursor = paginate_keyset(
+            favorites_query, Favorite.added_at, Favorite.id_favorite,
+            limit=limit, cursor=cursor, skip=skip
+        )
         
-        total = db.query(Favorite).filter(
-            Favorite.user_id == current_user.id_user
-        ).count()
+        total = favorites_query.count() if include_total else None
+        
+        # Получаем продукты с ценами одной пачкой
+        products_with_prices = ProductService(db).get_products_with_prices(
+            [favorite.product_id for favorite in favorites]
+        )
         
         favorites_response = []
         for favorite in favorites:
-            product = db.query(Product).options(
-                joinedload(Product.listings).joinedload(Listing.prices),
-                joinedload(Product.listings).joinedload(Listing.shop)
-            ).filter(Product.id_product == favorite.product_id).first()
-            
-            if product:
-                latest_prices = []
-                shop_prices = {}
-                for listing in product.listings:
-                    if listing.prices:
-                        latest_price = max(listing.prices, key=lambda x: x.scraped_at)
-                        if listing.shop_id not in shop_prices:
-                            latest_prices.append(schemas.PriceResponse(
-                                price=float(latest_price.price),
-                                scraped_at=latest_price.scraped_at,
-                                shop_name=listing.shop.name,
-                                shop_id=listing.shop_id,
-                                url=listing.url
-                            ))
-                            shop_prices[listing.shop_id] = latest_price
-                
-                prices_values = [p.price for p in latest_prices]
-                min_price = min(prices_values) if prices_values else None
-                max_price = max(prices_values) if prices_values else None
-                
-                product_with_prices = schemas.ProductWithPrices(
-                    product=schemas.ProductResponse.model_validate(product),
-                    prices=latest_prices,
-                    min_price=min_price,
-                    max_price=max_price
-                )
-                
+            product_with_prices = products_with_prices.get(favorite.product_id)
+            if product_with_prices:
                 favorites_response.append(schemas.FavoriteResponse(
                     id_favorite=favorite.id_favorite,
                     product=product_with_prices,
                     added_at=favorite.added_at
                 ))
         
-        return schemas.FavoritesListResponse(favorites=favorites_response, total=total)
+        return schemas.FavoritesListResponse(favorites=favorites_response, total=total, next_cursor=next_cursor)
+    except ValidationError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1297,36 +1646,7 @@ def create_price_alert(
             existing = new_alert
         
         # Получаем продукт с ценами
-        product = db.query(Product).options(
-            joinedload(Product.listings).joinedload(Listing.prices),
-            joinedload(Product.listings).joinedload(Listing.shop)
-        ).filter(Product.id_product == alert.product_id).first()
-        
-        latest_prices = []
-        shop_prices = {}
-        for listing in product.listings:
-            if listing.prices:
-                latest_price = max(listing.prices, key=lambda x: x.scraped_at)
-                if listing.shop_id not in shop_prices:
-                    latest_prices.append(schemas.PriceResponse(
-                        price=float(latest_price.price),
-                        scraped_at=latest_price.scraped_at,
-                        shop_name=listing.shop.name,
-                        shop_id=listing.shop_id,
-                        url=listing.url
-                    ))
-                    shop_prices[listing.shop_id] = latest_price
-        
-        prices_values = [p.price for p in latest_prices]
-        min_price = min(prices_values) if prices_values else None
-        max_price = max(prices_values) if prices_values else None
-        
-        product_with_prices = schemas.ProductWithPrices(
-            product=schemas.ProductResponse.model_validate(product),
-            prices=latest_prices,
-            min_price=min_price,
-            max_price=max_price
-        )
+        product_with_prices = ProductService(db).get_products_with_prices([alert.product_id])[alert.product_id]
         
         return schemas.PriceAlertResponse(
             id_alert=existing.id_alert,
@@ -1349,55 +1669,33 @@ def create_price_alert(
 def get_price_alerts(
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы (next_cursor из предыдущего ответа)"),
+    include_total: bool = Query(True, description="Считать ли общее количество"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Получить отслеживания цен пользователя"""
     try:
-        alerts = db.query(PriceAlert).filter(
+        alerts_query = db.query(PriceAlert).filter(
             PriceAlert.user_id == current_user.id_user,
             PriceAlert.is_active == 1
-        ).order_by(PriceAlert.created_at.desc()).offset(skip).limit(limit).all()
+        )
+        alerts, next_cursor = paginate_keyset(
+            alerts_query, PriceAlert.created_at, PriceAlert.id_alert,
+            limit=limit, cursor=cursor, skip=skip
+        )
         
-        total = db.query(PriceAlert).filter(
-            PriceAlert.user_id == current_user.id_user,
-            PriceAlert.is_active == 1
-        ).count()
+        total = alerts_query.count() if include_total else None
+        
+        # Получаем продукты с ценами одной пачкой
+        products_with_prices = ProductService(db).get_products_with_prices(
+            [alert.product_id for alert in alerts]
+        )
         
         alerts_response = []
         for alert in alerts:
-            product = db.query(Product).options(
-                joinedload(Product.listings).joinedload(Listing.prices),
-                joinedload(Product.listings).joinedload(Listing.shop)
-            ).filter(Product.id_product == alert.product_id).first()
-            
-            if product:
-                latest_prices = []
-                shop_prices = {}
-                for listing in product.listings:
-                    if listing.prices:
-                        latest_price = max(listing.prices, key=lambda x: x.scraped_at)
-                        if listing.shop_id not in shop_prices:
-                            latest_prices.append(schemas.PriceResponse(
-                                price=float(latest_price.price),
-                                scraped_at=latest_price.scraped_at,
-                                shop_name=listing.shop.name,
-                                shop_id=listing.shop_id,
-                                url=listing.url
-                            ))
-                            shop_prices[listing.shop_id] = latest_price
-                
-                prices_values = [p.price for p in latest_prices]
-                min_price = min(prices_values) if prices_values else None
-                max_price = max(prices_values) if prices_values else None
-                
-                product_with_prices = schemas.ProductWithPrices(
-                    product=schemas.ProductResponse.model_validate(product),
-                    prices=latest_prices,
-                    min_price=min_price,
-                    max_price=max_price
-                )
-                
+            product_with_prices = products_with_prices.get(alert.product_id)
+            if product_with_prices:
                 alerts_response.append(schemas.PriceAlertResponse(
                     id_alert=alert.id_alert,
                     product=product_with_prices,
@@ -1406,7 +1704,9 @@ def get_price_alerts(
                     created_at=alert.created_at
                 ))
         
-        return schemas.PriceAlertsListResponse(alerts=alerts_response, total=total)
+        return schemas.PriceAlertsListResponse(alerts=alerts_response, total=total, next_cursor=next_cursor)
+    except ValidationError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1495,57 +1795,58 @@ def get_user_stats(
 # ==================== УПРАВЛЕНИЕ КЭШЕМ ====================
 
 
+@app.get("/cache/stats")
+def get_cache_stats():
+    """
+    Статистика кэша внешних данных
+    
+    Включает долю попаданий по уровням: память этого процесса (local) и Redis (redis)
+    """
+    return external_data_service.get_cache_stats()
+
+
+@app.get("/http/stats")
+def get_http_client_stats():
+    """
+    Статистика исходящих HTTP-запросов к внешним источникам по хостам
+    
+    Задержка до получения заголовков и количество открытых соединений
+    (если соединений меньше, чем запросов, keep-alive работает)
+    """
+    return get_http_stats()
+
+
 @app.delete("/cache/clear-all")
 def clear_all_cache():
     """
     Полная очистка всего кэша приложения
     
     Очищает:
-    - Redis кэш (все ключи)
-    - Кэш товаров
+    - Кэш товаров (поиск, популярные, цены)
     - Кэш URL
+    - Снимки поиска
+    - Кэш в памяти всех workers
+    
+    Кэш сбрасывается сменой поколения ключей (без KEYS и без блокировки Redis),
+    старые ключи удаляются в фоне через SCAN + UNLINK.
     """
     try:
-        import redis
-        
-        # Подключение к Redis
-        redis_client = None
-        if external_data_service.redis_enabled:
-            redis_client = external_data_service.redis_client
+        cleared_namespaces = external_data_service.clear_cache()
         
-        if not redis_client:
+        if not external_data_service.redis_enabled:
             return {
-                "message": "Redis не доступен",
-                "cleared_keys": 0
+                "message": "Redis не доступен, очищен кэш в памяти",
+                "cleared_namespaces": cleared_namespaces
             }
         
-        # Подсчет ключей перед очисткой
-        all_keys = redis_client.keys("*")
-        keys_count = len(all_keys)
-        
-        # Очистка всех ключей
-        if all_keys:
-            deleted = 0
-            for key in all_keys:
-                try:
-                    redis_client.delete(key)
-                    deleted += 1
-                except Exception as e:
-                    logging.error(f"Ошибка при удалении ключа {key}: {e}")
-            
-            logging.info(f"✅ Полная очистка кэша: удалено {deleted} ключей")
-            return {
-                "message": "Весь кэш очищен",
-                "cleared_keys": deleted,
-                "total_keys_before": keys_count
-            }
-        else:
-            return {
-                "message": "Кэш уже пуст",
-                "cleared_keys": 0,
-                "total_keys_before": 0
-            }
-            
+        external_data_service.key_builder.purge_in_background(["search_session:*"])
+        logging.info(f"✅ Полная очистка кэша: сброшено {cleared_namespaces} пространств имен, старые ключи удаляются в фоне")
+        return {
+            "message": "Весь кэш очищен",
+            "cleared_namespaces": cleared_namespaces,
+            "cleanup": "background"
+        }
+    
     except Exception as e:
         logging.error(f"Ошибка при полной очистке кэша: {e}", exc_info=True)
         raise HTTPException(
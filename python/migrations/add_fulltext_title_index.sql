@@ -0,0 +1,16 @@
+-- Миграция: полнотекстовый индекс по названию товара
+-- Заменяет поиск через LIKE '%запрос%' (полный проход по таблице) на MATCH ... AGAINST
+-- Парсер ngram разбивает текст на n-граммы, поэтому поиск работает по частям слов
+-- и для кириллицы (требуется MySQL 5.7.6+ / InnoDB)
+-- Выполните: python run_migration.py add_fulltext_title_index.sql
+
+-- Если индекс уже существует, будет ошибка, но она будет обработана скриптом
+ALTER TABLE products
+ADD FULLTEXT INDEX ft_products_title (title) WITH PARSER ngram;
+
+-- Проверка
+SELECT INDEX_NAME, COLUMN_NAME, INDEX_TYPE
+FROM INFORMATION_SCHEMA.STATISTICS
+WHERE TABLE_NAME = 'products'
+  AND TABLE_SCHEMA = DATABASE()
+  AND INDEX_TYPE = 'FULLTEXT';
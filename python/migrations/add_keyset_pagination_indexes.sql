@@ -0,0 +1,26 @@
+-- Миграция: составные индексы для курсорной (keyset) пагинации списков пользователя
+-- Страницы выбираются условием (дата, id) < (дата, id последнего элемента)
+-- с сортировкой по убыванию, поэтому глубокая страница читается по индексу
+-- так же быстро, как первая
+-- Выполните: python run_migration.py add_keyset_pagination_indexes.sql
+
+-- Если индекс уже существует, будет ошибка, но она будет обработана скриптом
+ALTER TABLE view_history
+ADD INDEX idx_view_history_user_viewed (user_id, viewed_at, id_view);
+
+ALTER TABLE favorites
+ADD INDEX idx_favorites_user_added (user_id, added_at, id_favorite);
+
+ALTER TABLE price_alerts
+ADD INDEX idx_price_alerts_user_created (user_id, is_active, created_at, id_alert);
+
+-- Проверка
+SELECT TABLE_NAME, INDEX_NAME, COLUMN_NAME, SEQ_IN_INDEX
+FROM INFORMATION_SCHEMA.STATISTICS
+WHERE TABLE_SCHEMA = DATABASE()
+  AND INDEX_NAME IN (
+      'idx_view_history_user_viewed',
+      'idx_favorites_user_added',
+      'idx_price_alerts_user_created'
+  )
+ORDER BY TABLE_NAME, SEQ_IN_INDEX;
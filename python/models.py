@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DECIMAL, TIMESTAMP, ForeignKey, text
+from sqlalchemy import Column, Integer, String, Text, DECIMAL, TIMESTAMP, ForeignKey, Index, text
 from sqlalchemy.orm import relationship
 from database import Base
 
@@ -22,6 +22,11 @@ class Product(Base):
 
     listings = relationship("Listing", back_populates="product", cascade="all, delete-orphan")
 
+    # Полнотекстовый индекс для поиска по названию (MySQL, см. migrations/add_fulltext_title_index.sql)
+    __table_args__ = (
+        Index("ft_products_title", "title", mysql_prefix="FULLTEXT", mysql_with_parser="ngram"),
+    )
+
 
 class Shop(Base):
     __tablename__ = "shops"
@@ -59,6 +64,10 @@ class Price(Base):
 # История просмотров
 class ViewHistory(Base):
     __tablename__ = "view_history"
+    __table_args__ = (
+        # Курсорная пагинация списка пользователя
+        Index("idx_view_history_user_viewed", "user_id", "viewed_at", "id_view"),
+    )
 
     id_view = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey('User.id_user', ondelete='CASCADE'))
@@ -72,6 +81,10 @@ class ViewHistory(Base):
 # Избранное
 class Favorite(Base):
     __tablename__ = "favorites"
+    __table_args__ = (
+        # Курсорная пагинация списка пользователя
+        Index("idx_favorites_user_added", "user_id", "added_at", "id_favorite"),
+    )
 
     id_favorite = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey('User.id_user', ondelete='CASCADE'))
@@ -85,6 +98,10 @@ class Favorite(Base):
 # Отслеживание цен
 class PriceAlert(Base):
     __tablename__ = "price_alerts"
+    __table_args__ = (
+        # Курсорная пагинация списка пользователя
+        Index("idx_price_alerts_user_created", "user_id", "is_active", "created_at", "id_alert"),
+    )
 
     id_alert = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey('User.id_user', ondelete='CASCADE'))
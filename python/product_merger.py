@@ -1,7 +1,164 @@
 """
 Модуль для объединения товаров из разных источников с чередованием
 """
-from typing import List, Dict
+from itertools import islice
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+
+class LazySequence(Sequence):
+    """
+    Ленивая последовательность: элементы строятся из исходных только при обращении
+    
+    Загрузчик получает пачку исходных элементов и возвращает список готовых
+    элементов той же длины и в том же порядке. merge_products_page вызывает его
+    один раз для всех элементов источника, попавших на страницу.
+    
+    Если загрузчик вернул меньше элементов (например, пустой список при ошибке
+    БД), источник считается недоступным: его длина становится 0, и
+    merge_products_page строит страницу без него.
+    """
+    
+    def __init__(self, source: Sequence, loader: Callable[[List], List]):
+        """
+        Args:
+            source: Исходные элементы (например, строки из БД)
+            loader: Функция преобразования пачки исходных элементов
+        """
+        self.source = source
+        self.loader = loader
+        self.failed = False
+    
+    def __len__(self) -> int:
+        return 0 if self.failed else len(self.source)
+    
+    def __getitem__(self, index: int):
+        return self.get_many([index])[0]
+    
+    def get_many(self, indices: List[int]) -> List:
+        """Построение элементов с указанными индексами одной пачкой"""
+        if not indices:
+            return []
+        items = self.loader([self.source[i] for i in indices])
+        if len(items) < len(indices):
+            self.failed = True
+        return items
+
+
+def _iter_positions(lengths: List[int], skip: int = 0) -> Iterator[Tuple[int, int]]:
+    """
+    Позиции (номер_источника, индекс_в_источнике) в порядке чередования
+    
+    Начальная позиция вычисляется арифметически по длинам источников,
+    поэтому пропуск skip элементов не требует их перебора.
+    """
+    if not lengths:
+        return
+    
+    # Находим раунд и смещение внутри раунда для позиции skip.
+    # В раунде r участвуют только источники длиннее r.
+    round_idx = 0
+    offset = 0
+    remaining = skip
+    for threshold in sorted(set(lengths)):
+        if threshold <= round_idx:
+            continue
+        active = sum(1 for length in lengths if length > round_idx)
+        segment = active * (threshold - round_idx)
+        if remaining < segment:
+            round_idx += remaining // active
+            offset = remaining % active
+            break
+        remaining -= segment
+        round_idx = threshold
+    else:
+        return
+    
+    max_length = max(lengths)
+    while round_idx < max_length:
+        active_sources = [i for i, length in enumerate(lengths) if length > round_idx]
+        for source_idx in active_sources[offset:]:
+            yield source_idx, round_idx
+        offset = 0
+        round_idx += 1
+
+
+def count_merged_products(
+    external_products: Sequence[Dict],
+    db_products: Sequence[Dict],
+    static_products: Sequence[Dict] = None
+) -> int:
+    """Количество товаров после чередования (без построения объединенного списка)"""
+    return len(external_products) + len(db_products) + len(static_products or [])
+
+
+def iter_products_alternating(
+    external_products: Sequence[Dict],
+    db_products: Sequence[Dict],
+    static_products: Sequence[Dict] = None,
+    skip: int = 0
+) -> Iterator[Dict]:
+    """
+    Ленивое чередование товаров (внешний источник -> БД -> статические -> повтор)
+    
+    Args:
+        external_products: Товары из внешнего источника
+        db_products: Товары из базы данных
+        static_products: Статические товары (опционально)
+        skip: Сколько первых товаров пропустить
+    
+    Returns:
+        Итератор товаров в порядке чередования
+    """
+    sources = [external_products, db_products, static_products or []]
+    for source_idx, item_idx in _iter_positions([len(s) for s in sources], skip):
+        yield sources[source_idx][item_idx]
+
+
+def merge_products_page(
+    external_products: Sequence[Dict],
+    db_products: Sequence[Dict],
+    static_products: Sequence[Dict] = None,
+    skip: int = 0,
+    limit: int = 50
+) -> List[Dict]:
+    """
+    Страница объединенного с чередованием списка товаров
+    
+    Строятся только элементы, попавшие на страницу; для LazySequence
+    элементы каждого источника загружаются одной пачкой. Если загрузка
+    LazySequence не удалась, страница строится из остальных источников.
+    
+    Args:
+        external_products: Товары из внешнего источника
+        db_products: Товары из базы данных
+        static_products: Статические товары (опционально)
+        skip: Пропустить товаров
+        limit: Размер страницы
+    
+    Returns:
+        Список товаров страницы (не более limit)
+    """
+    sources = [external_products, db_products, static_products or []]
+    positions = list(islice(_iter_positions([len(s) for s in sources], skip), limit))
+    
+    # Группируем индексы по источникам, чтобы загрузить каждый источник одной пачкой
+    indices_by_source: Dict[int, List[int]] = {}
+    for source_idx, item_idx in positions:
+        indices_by_source.setdefault(source_idx, []).append(item_idx)
+    
+    loaded: Dict[Tuple[int, int], Dict] = {}
+    for source_idx, indices in indices_by_source.items():
+        source = sources[source_idx]
+        if isinstance(source, LazySequence):
+            items = source.get_many(indices)
+            if source.failed:
+                # Позиции страницы считались с этим источником - пересчитываем без него
+                return merge_products_page(*sources, skip=skip, limit=limit)
+        else:
+            items = [source[i] for i in indices]
+        loaded.update(((source_idx, i), item) for i, item in zip(indices, items))
+    
+    return [loaded[position] for position in positions]
 
 
 def merge_products_alternating(
@@ -26,29 +183,4 @@ def merge_products_alternating(
     Returns:
         Объединенный список товаров с чередованием
     """
-    if static_products is None:
-        static_products = []
-    
-    merged = []
-    
-    # Индексы для каждого источника
-    external_idx = 0
-    db_idx = 0
-    static_idx = 0
-    
-    # Чередуем товары: внешний источник -> БД -> Статические -> повтор
-    while external_idx < len(external_products) or db_idx < len(db_products) or static_idx < len(static_products):
-        if external_idx < len(external_products):
-            merged.append(external_products[external_idx])
-            external_idx += 1
-        
-        if db_idx < len(db_products):
-            merged.append(db_products[db_idx])
-            db_idx += 1
-        
-        if static_idx < len(static_products):
-            merged.append(static_products[static_idx])
-            static_idx += 1
-    
-    return merged
-
+    return list(iter_products_alternating(external_products, db_products, static_products))
@@ -1,9 +1,26 @@
 """
 Репозиторий для работы с товарами в БД
 """
-from typing import Optional, List
-from sqlalchemy.orm import Session
+import re
+import logging
+from typing import Optional, List, Dict
+from sqlalchemy import text
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.orm import Session, Query
 from models import Product
+from core.query_normalizer import normalize_query, query_tokens
+from services.trigram_index import product_title_index
+
+logger = logging.getLogger(__name__)
+
+# Минимальная длина токена для ngram-парсера MySQL (ngram_token_size по умолчанию = 2)
+FULLTEXT_MIN_TOKEN_LENGTH = 2
+
+# Символы-операторы BOOLEAN MODE, которые нельзя передавать из пользовательского запроса
+_FULLTEXT_OPERATORS = re.compile(r'[+\-<>()~*"@]+')
+
+# Кэш наличия FULLTEXT индекса: {url БД: True/False}
+_fulltext_available: Dict[str, bool] = {}
 
 
 class ProductRepository:
@@ -16,12 +33,70 @@ class ProductRepository:
         """Получение товара по ID"""
         return self.db.query(Product).filter(Product.id_product == product_id).first()
     
-    def search(self, search_term: str, limit: int = 100) -> List[Product]:
-        """Поиск товаров по названию"""
-        search_pattern = f"%{search_term.lower()}%"
-        return self.db.query(Product).filter(
-            Product.title.ilike(search_pattern)
-        ).limit(limit).all()
+    def search(self, search_term: str, limit: int = 100, fuzzy: bool = True) -> List[Product]:
+        """
+        Поиск товаров по названию
+        
+        Сначала точный поиск (FULLTEXT по релевантности или ILIKE), затем, если
+        результатов меньше limit, добор нечеткими совпадениями из триграммного
+        индекса (опечатки вроде "samsng").
+        
+        Args:
+            search_term: Поисковый запрос
+            limit: Максимальное количество товаров
+            fuzzy: Добирать ли результаты нечетким поиском
+        
+        Returns:
+            Список товаров
+        """
+        products = self.search_query(search_term).limit(limit).all()
+        
+        if fuzzy and len(products) < limit and product_title_index.ready:
+            found_ids = {product.id_product for product in products}
+            matches = product_title_index.search(
+                normalize_query(search_term),
+                limit=limit - len(products),
+                exclude=found_ids
+            )
+            if matches:
+                fuzzy_ids = [doc_id for doc_id, _ in matches]
+                by_id = {
+                    product.id_product: product
+                    for product in self.db.query(Product).filter(Product.id_product.in_(fuzzy_ids)).all()
+                }
+                products.extend(by_id[doc_id] for doc_id in fuzzy_ids if doc_id in by_id)
+        
+        return products
+    
+    def search_query(self, search_term: str, ordered: bool = True) -> Query:
+        """
+        Запрос поиска товаров по названию
+        
+        На MySQL с индексом ft_products_title используется MATCH ... AGAINST
+        с сортировкой по релевантности. Для остальных БД (или без индекса) -
+        ILIKE '%токен%' по каждому токену нормализованного запроса.
+        
+        Args:
+            search_term: Поисковый запрос
+            ordered: Сортировать ли по релевантности (не нужно для count)
+        
+        Returns:
+            SQLAlchemy Query по товарам
+        """
+        query = self.db.query(Product)
+        
+        boolean_query = self._to_boolean_query(search_term)
+        if boolean_query and self._has_fulltext_index():
+            relevance = match(Product.title, against=boolean_query).in_boolean_mode()
+            query = query.filter(relevance > 0)
+            if ordered:
+                query = query.order_by(relevance.desc(), Product.id_product)
+            return query
+        
+        tokens = query_tokens(search_term)
+        if not tokens:
+            return query.filter(Product.title.ilike(f"%{search_term.lower()}%"))
+        return query.filter(*(Product.title.ilike(f"%{token}%") for token in tokens))
     
     def get_all(self, skip: int = 0, limit: int = 50) -> List[Product]:
         """Получение всех товаров с пагинацией"""
@@ -29,9 +104,48 @@ class ProductRepository:
     
     def count(self, search_term: Optional[str] = None) -> int:
         """Подсчет количества товаров"""
-        query = self.db.query(Product)
         if search_term:
-            search_pattern = f"%{search_term.lower()}%"
-            query = query.filter(Product.title.ilike(search_pattern))
-        return query.count()
-
+            return self.search_query(search_term, ordered=False).count()
+        return self.db.query(Product).count()
+    
+    @staticmethod
+    def _to_boolean_query(search_term: str) -> str:
+        """
+        Преобразование пользовательского запроса в запрос BOOLEAN MODE
+        
+        Каждый токен нормализованного запроса становится обязательной фразой
+        (+"токен"): для ngram-парсера это эквивалентно поиску подстроки, как и
+        в ILIKE. Токены короче FULLTEXT_MIN_TOKEN_LENGTH индекс не содержит,
+        поэтому они отбрасываются.
+        """
+        tokens = query_tokens(_FULLTEXT_OPERATORS.sub(" ", search_term))
+        tokens = [t for t in tokens if len(t) >= FULLTEXT_MIN_TOKEN_LENGTH]
+        return " ".join(f'+"{t}"' for t in tokens)
+    
+    def _has_fulltext_index(self) -> bool:
+        """Проверка (с кэшированием на процесс) наличия FULLTEXT индекса по products.title"""
+        bind = self.db.get_bind()
+        if bind.dialect.name != "mysql":
+            return False
+        
+        cache_key = str(bind.url)
+        if cache_key not in _fulltext_available:
+            try:
+                count = self.db.execute(text("""
+                    SELECT COUNT(*)
+                    FROM INFORMATION_SCHEMA.STATISTICS
+                    WHERE TABLE_SCHEMA = DATABASE()
+                      AND TABLE_NAME = 'products'
+                      AND COLUMN_NAME = 'title'
+                      AND INDEX_TYPE = 'FULLTEXT'
+                """)).scalar()
+                _fulltext_available[cache_key] = bool(count)
+            except Exception as e:
+                logger.warning(f"Не удалось проверить FULLTEXT индекс: {e}")
+                _fulltext_available[cache_key] = False
+            
+            if not _fulltext_available[cache_key]:
+                logger.info("FULLTEXT индекс по products.title не найден, поиск через ILIKE "
+                            "(выполните: python run_migration.py add_fulltext_title_index.sql)")
+        
+        return _fulltext_available[cache_key]
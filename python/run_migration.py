@@ -1,7 +1,11 @@
 """
 Скрипт для выполнения миграции: обновление структуры таблицы products
-Использование: python run_migration.py
+Использование: python run_migration.py [файл_миграции.sql]
+Примеры:
+    python run_migration.py                              # update_products_structure.sql
+    python run_migration.py add_fulltext_title_index.sql  # полнотекстовый индекс по названию
 """
+import sys
 import logging
 from pathlib import Path
 from sqlalchemy import text
@@ -15,15 +19,18 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Миграция, выполняемая по умолчанию (если файл не указан в аргументах)
+DEFAULT_MIGRATION = "update_products_structure.sql"
 
-def run_migration():
+
+def run_migration(migration_name: str = DEFAULT_MIGRATION):
     """Выполнение миграции для обновления структуры таблицы products"""
     logger.info("=" * 60)
-    logger.info("🔄 Начало миграции: обновление структуры таблицы products")
+    logger.info(f"🔄 Начало миграции: {migration_name}")
     logger.info("=" * 60)
     
     # Путь к файлу миграции
-    migration_file = Path(__file__).parent / "migrations" / "update_products_structure.sql"
+    migration_file = Path(__file__).parent / "migrations" / migration_name
     
     if not migration_file.exists():
         logger.error(f"❌ Файл миграции не найден: {migration_file}")
@@ -94,9 +101,9 @@ def run_migration():
                     # Проверяем, может колонки уже удалены/добавлены
                     if any(phrase in error_str for phrase in [
                         'unknown column', "doesn't exist", 'check that column/key exists',
-                        'duplicate column name', 'already exists', 'duplicate'
+                        'duplicate column name', 'duplicate key name', 'already exists', 'duplicate'
                     ]):
-                        logger.info("ℹ️  Колонки уже обработаны (удалены/добавлены ранее)")
+                        logger.info("ℹ️  Колонки/индексы уже обработаны (удалены/добавлены ранее)")
                         skipped_count += 1
                     else:
                         logger.warning(f"⚠️  Ошибка: {e}")
@@ -143,7 +150,8 @@ def run_migration():
 
 def main():
     """Основная функция"""
-    success = run_migration()
+    migration_name = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_MIGRATION
+    success = run_migration(migration_name)
     
     if not success:
         logger.error("\n❌ Миграция не выполнена. Проверьте ошибки выше.")
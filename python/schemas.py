@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from typing import Optional, List
 from datetime import datetime
 
@@ -89,6 +89,25 @@ class ProductWithPrices(BaseModel):
 class ProductsResponse(BaseModel):
     products: List[ProductWithPrices]
     total: int
+    search_id: Optional[str] = None  # ID снимка поиска для следующих страниц
+    pending_external: Optional[str] = None  # Токен фонового поиска во внешнем источнике (прогрессивный режим)
+
+
+# Схемы для получения ссылок "Купить" для страницы товаров
+class ProductUrlRequestItem(BaseModel):
+    brand: Optional[str] = None
+    model: Optional[str] = None
+    title: Optional[str] = None
+    url: Optional[str] = None  # Уже известный URL товара
+
+
+class ProductUrlsRequest(BaseModel):
+    items: List[ProductUrlRequestItem] = Field(max_length=200)
+    partner_id: Optional[str] = None
+
+
+class ProductUrlsResponse(BaseModel):
+    urls: List[str]  # В порядке items запроса
 
 
 # Схемы для истории просмотров
@@ -103,7 +122,8 @@ class ViewHistoryResponse(BaseModel):
 
 class ViewHistoryListResponse(BaseModel):
     views: List[ViewHistoryResponse]
-    total: int
+    total: Optional[int] = None  # None, если include_total=false
+    next_cursor: Optional[str] = None  # Курсор следующей страницы (None - страниц больше нет)
 
 
 # Схемы для избранного
@@ -118,7 +138,8 @@ class FavoriteResponse(BaseModel):
 
 class FavoritesListResponse(BaseModel):
     favorites: List[FavoriteResponse]
-    total: int
+    total: Optional[int] = None  # None, если include_total=false
+    next_cursor: Optional[str] = None  # Курсор следующей страницы (None - страниц больше нет)
 
 
 # Схемы для отслеживания цен
@@ -140,7 +161,8 @@ class PriceAlertResponse(BaseModel):
 
 class PriceAlertsListResponse(BaseModel):
     alerts: List[PriceAlertResponse]
-    total: int
+    total: Optional[int] = None  # None, если include_total=false
+    next_cursor: Optional[str] = None  # Курсор следующей страницы (None - страниц больше нет)
 
 
 # Схемы для списков покупок
@@ -0,0 +1,280 @@
+"""
+Реестр фоновых внешних поисков для прогрессивного режима /products
+
+Первая фаза отвечает товарами из БД и кэша сразу, а поиск во внешнем
+источнике продолжается в фоне; его результат забирается по токену
+pending_external (опросом или через SSE).
+
+Состояние токена (running/done/empty/failed) хранится в Redis с TTL, поэтому
+опрос, попавший на другой worker, видит, что поиск еще идет или завершился;
+сам результат этот worker читает из кэша внешнего источника.
+"""
+import json
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import Executor, Future, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+import redis
+
+from services.search_session_service import normalize_search_query
+
+logger = logging.getLogger(__name__)
+
+# Состояния фонового поиска
+PENDING_RUNNING = "running"
+PENDING_DONE = "done"
+PENDING_EMPTY = "empty"
+PENDING_FAILED = "failed"
+
+# Перехват запроса, закрепленного за токеном без идущего поиска (только если он не изменился)
+_REPLACE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    redis.call("set", KEYS[1], ARGV[2], "EX", ARGV[3])
+    return 1
+end
+return 0
+"""
+
+# Освобождение запроса завершенным поиском (только своего токена)
+_RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+@dataclass
+class PendingSearch:
+    """Фоновый поиск во внешнем источнике"""
+    token: str
+    query: str
+    future: Future
+    expires_at: float
+
+
+class PendingSearchRegistry:
+    """
+    Реестр фоновых поисков
+    
+    Поиск выполняется в пуле потоков процесса, который его запустил; состояние
+    токена дублируется в Redis (ключ pending_search:{token}), чтобы его видели
+    остальные worker. Одинаковые запросы (после нормализации), пока поиск жив,
+    получают один и тот же токен и не запускают повторный поиск - в том числе
+    если поиск идет в другом worker: запрос закрепляется за токеном ключом
+    pending_search:query:{запрос} (SET NX), пока поиск не завершится. Токен
+    живет ttl секунд с момента запуска поиска. Без Redis токены видны только
+    в памяти процесса.
+    """
+    
+    # Интервал опроса состояния поиска, запущенного другим worker (секунд)
+    POLL_INTERVAL = 0.5
+    
+    def __init__(self, executor: Executor, ttl: int = 300, redis_client: Optional[redis.Redis] = None):
+        """
+        Args:
+            executor: Пул потоков для фоновых поисков
+            ttl: Время жизни токена в секундах
+            redis_client: Клиент Redis для общего состояния токенов (None - только память процесса)
+        """
+        self.executor = executor
+        self.ttl = ttl
+        self.redis_client = redis_client
+        self._searches: Dict[str, PendingSearch] = {}
+        self._tokens_by_query: Dict[str, str] = {}
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _state_key(token: str) -> str:
+        return f"pending_search:{token}"
+    
+    @staticmethod
+    def _query_key(normalized_query: str) -> str:
+        return f"pending_search:query:{normalized_query}"
+    
+    def start(self, query: str, fetch: Callable[[], List[Dict]]) -> str:
+        """
+        Запуск фонового поиска (или присоединение к уже запущенному)
+        
+        Args:
+            query: Поисковый запрос
+            fetch: Функция поиска во внешнем источнике
+        
+        Returns:
+            Токен pending_external
+        """
+        normalized_query = normalize_search_query(query)
+        # Поиск запроса и регистрация нового - под одной блокировкой процесса,
+        # между workers запрос закрепляется за токеном через SET NX
+        with self._lock:
+            self._evict_expired_locked()
+            token = self._tokens_by_query.get(normalized_query)
+            if token is not None:
+                future = self._searches[token].future
+                # Неудавшийся поиск не переиспользуем
+                if not (future.done() and future.exception() is not None):
+                    return token
+            
+            token = uuid.uuid4().hex
+            remote_token = self._claim_query(normalized_query, token)
+            if remote_token is not None:
+                logger.info(f"⏳ Поиск '{query}' уже идет в другом worker (токен {remote_token})")
+                return remote_token
+            
+            pending = PendingSearch(
+                token=token,
+                query=normalized_query,
+                future=self.executor.submit(fetch),
+                expires_at=time.monotonic() + self.ttl
+            )
+            self._searches[token] = pending
+            self._tokens_by_query[normalized_query] = token
+        pending.future.add_done_callback(lambda future: self._finish(token, normalized_query, future))
+        logger.info(f"⏳ Запущен фоновый поиск во внешнем источнике: '{query}' (токен {token})")
+        return token
+    
+    def get(self, token: str) -> Optional[PendingSearch]:
+        """Фоновый поиск этого процесса по токену (None, если токен неизвестен или истек)"""
+        with self._lock:
+            self._evict_expired_locked()
+            return self._searches.get(token)
+    
+    def state(self, token: str) -> Optional[str]:
+        """
+        Состояние фонового поиска, запущенного любым worker
+        
+        Args:
+            token: Токен pending_external
+        
+        Returns:
+            PENDING_RUNNING, PENDING_DONE, PENDING_EMPTY, PENDING_FAILED или
+            None, если токен неизвестен или истек
+        """
+        pending = self.get(token)
+        if pending is not None:
+            return self._future_state(pending.future)
+        
+        if not self.redis_client:
+            return None
+        try:
+            return self._remote_state(token)
+        except Exception as e:
+            logger.warning(f"Не удалось прочитать состояние фонового поиска {token}: {e}")
+            return None
+    
+    def wait(self, token: str, timeout: float) -> bool:
+        """
+        Ожидание завершения фонового поиска
+        
+        Args:
+            token: Токен pending_external
+            timeout: Сколько секунд ждать
+        
+        Returns:
+            True, если поиск завершился (или токен неизвестен), False по таймауту
+        """
+        pending = self.get(token)
+        if pending is not None:
+            try:
+                pending.future.result(timeout=timeout)
+            except FutureTimeoutError:
+                return False
+            except Exception:
+                pass
+            return True
+        
+        deadline = time.monotonic() + timeout
+        while self.state(token) == PENDING_RUNNING:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(self.POLL_INTERVAL, remaining))
+        return True
+    
+    @staticmethod
+    def _future_state(future: Future) -> str:
+        """Состояние поиска по его Future"""
+        if not future.done():
+            return PENDING_RUNNING
+        if future.exception() is not None:
+            return PENDING_FAILED
+        return PENDING_DONE if future.result() else PENDING_EMPTY
+    
+    def _remote_state(self, token: str) -> Optional[str]:
+        """Состояние токена из Redis (None, если записи нет)"""
+        raw = self.redis_client.get(self._state_key(token))
+        if raw is None:
+            return None
+        try:
+            return json.loads(raw)["state"]
+        except (ValueError, KeyError, TypeError):
+            return None
+    
+    def _claim_query(self, normalized_query: str, token: str) -> Optional[str]:
+        """
+        Закрепление запроса за новым токеном в Redis
+        
+        Состояние running записывается до закрепления, поэтому закрепленный
+        токен без состояния (worker упал, запись истекла) или с завершенным
+        поиском можно перехватить.
+        
+        Returns:
+            Токен поиска, который уже идет в другом worker, или None, если запрос
+            закреплен за token (или Redis недоступен)
+        """
+        if not self.redis_client:
+            return None
+        query_key = self._query_key(normalized_query)
+        try:
+            self._save_state(token, normalized_query, PENDING_RUNNING)
+            current = None
+            while not self.redis_client.set(query_key, token, nx=True, ex=self.ttl):
+                current = self.redis_client.get(query_key)
+                if current is None:
+                    continue  # Поиск завершился между SET NX и GET
+                if isinstance(current, bytes):
+                    current = current.decode()
+                if self._remote_state(current) == PENDING_RUNNING:
+                    self.redis_client.delete(self._state_key(token))
+                    return current
+                if self.redis_client.eval(_REPLACE_SCRIPT, 1, query_key, current, token, self.ttl):
+                    break
+        except Exception as e:
+            logger.warning(f"Не удалось проверить фоновые поиски других worker: {e}")
+        return None
+    
+    def _finish(self, token: str, normalized_query: str, future: Future) -> None:
+        """Запись итогового состояния и освобождение запроса (если он еще закреплен за token)"""
+        self._save_state(token, normalized_query, self._future_state(future))
+        if not self.redis_client:
+            return
+        try:
+            self.redis_client.eval(_RELEASE_SCRIPT, 1, self._query_key(normalized_query), token)
+        except Exception as e:
+            logger.warning(f"Не удалось освободить запрос фонового поиска {token}: {e}")
+    
+    def _save_state(self, token: str, normalized_query: str, state: str) -> None:
+        """Запись состояния токена в Redis (TTL - ttl реестра)"""
+        if not self.redis_client:
+            return
+        try:
+            self.redis_client.set(
+                self._state_key(token),
+                json.dumps({"state": state, "query": normalized_query}),
+                ex=self.ttl
+            )
+        except Exception as e:
+            logger.warning(f"Не удалось сохранить состояние фонового поиска {token}: {e}")
+    
+    def _evict_expired_locked(self) -> None:
+        """Удаление истекших поисков"""
+        now = time.monotonic()
+        expired = [token for token, pending in self._searches.items() if pending.expires_at <= now]
+        for token in expired:
+            pending = self._searches.pop(token)
+            if self._tokens_by_query.get(pending.query) == token:
+                del self._tokens_by_query[pending.query]
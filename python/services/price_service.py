@@ -1,9 +1,10 @@
 """
 Сервис для работы с ценами
 """
+from sqlalchemy import func, and_
 from sqlalchemy.orm import Session
 from models import Price
-from typing import Optional
+from typing import Optional, Dict, Iterable
 
 
 class PriceService:
@@ -39,4 +40,42 @@ class PriceService:
         return self.db.query(Price).filter(
             Price.listing_id == listing_id
         ).order_by(Price.scraped_at.desc()).all()
-
+    
+    def get_latest_prices(self, listing_ids: Iterable[int]) -> Dict[int, Price]:
+        """
+        Получение последних цен сразу для набора listings одним запросом
+        
+        Для каждого listing выбирается цена с максимальным scraped_at
+        (при совпадении времени - с максимальным id_price).
+        
+        Args:
+            listing_ids: ID listings
+        
+        Returns:
+            Словарь {listing_id: последняя цена}; listings без цен отсутствуют
+        """
+        listing_ids = list(set(listing_ids))
+        if not listing_ids:
+            return {}
+        
+        latest = self.db.query(
+            Price.listing_id.label("listing_id"),
+            func.max(Price.scraped_at).label("max_scraped_at")
+        ).filter(
+            Price.listing_id.in_(listing_ids)
+        ).group_by(Price.listing_id).subquery()
+        
+        rows = self.db.query(Price).join(
+            latest,
+            and_(
+                Price.listing_id == latest.c.listing_id,
+                Price.scraped_at == latest.c.max_scraped_at
+            )
+        ).all()
+        
+        latest_prices = {}
+        for price in rows:
+            current = latest_prices.get(price.listing_id)
+            if current is None or price.id_price > current.id_price:
+                latest_prices[price.listing_id] = price
+        return latest_prices
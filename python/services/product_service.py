@@ -9,6 +9,7 @@ import logging
 from models import Product, Listing, Price, Shop
 from schemas import ProductWithPrices, ProductResponse, PriceResponse
 from services.price_service import PriceService
+from repositories.product_repository import ProductRepository
 
 logger = logging.getLogger(__name__)
 
@@ -110,13 +111,15 @@ class ProductService:
         Returns:
             Кортеж (список товаров, общее количество)
         """
-        query = self.db.query(Product)
+        repository = ProductRepository(self.db)
         
         if search:
-            search_term = f"%{search.lower()}%"
-            query = query.filter(Product.title.ilike(search_term))
+            query = repository.search_query(search)
+            total = repository.count(search)
+        else:
+            query = self.db.query(Product)
+            total = query.count()
         
-        total = query.count()
         products = query.offset(skip).limit(limit).all()
         
         # Преобразуем в формат для merger
@@ -147,6 +150,82 @@ class ProductService:
         
         return db_products, total
     
+    def get_products_with_prices(self, product_ids: List[int]) -> Dict[int, ProductWithPrices]:
+        """
+        Пакетная сборка товаров с последними ценами (избранное, история, отслеживания)
+        
+        Выполняет фиксированное число запросов независимо от количества товаров
+        и не загружает полную историю цен listings.
+        
+        Args:
+            product_ids: ID товаров
+        
+        Returns:
+            Словарь {product_id: товар с ценами}; отсутствующие в БД товары пропускаются
+        """
+        product_ids = list(set(product_ids))
+        if not product_ids:
+            return {}
+        
+        products = self.db.query(Product).filter(Product.id_product.in_(product_ids)).all()
+        listings_by_product = self.get_listings_by_product_ids([p.id_product for p in products])
+        latest_prices = self.price_service.get_latest_prices(
+            listing.id_listing
+            for listings in listings_by_product.values()
+            for listing in listings
+        )
+        
+        result = {}
+        for product in products:
+            price_responses = []
+            shop_ids = set()
+            for listing in listings_by_product.get(product.id_product, []):
+                latest_price = latest_prices.get(listing.id_listing)
+                # Одна цена на магазин: берем первый listing магазина
+                if latest_price is None or listing.shop_id in shop_ids:
+                    continue
+                price_responses.append(PriceResponse(
+                    price=float(latest_price.price),
+                    scraped_at=latest_price.scraped_at,
+                    shop_name=listing.shop.name,
+                    shop_id=listing.shop_id,
+                    url=listing.url
+                ))
+                shop_ids.add(listing.shop_id)
+            
+            prices_values = [p.price for p in price_responses]
+            result[product.id_product] = ProductWithPrices(
+                product=ProductResponse.model_validate(product),
+                prices=price_responses,
+                min_price=min(prices_values) if prices_values else None,
+                max_price=max(prices_values) if prices_values else None
+            )
+        return result
+    
+    def get_listings_by_product_ids(self, product_ids: List[int]) -> Dict[int, List[Listing]]:
+        """
+        Получение listings для набора товаров одним запросом (магазины подгружаются сразу)
+        
+        Args:
+            product_ids: ID товаров
+        
+        Returns:
+            Словарь {product_id: список listings в порядке id_listing}
+        """
+        listings_by_product = {}
+        if not product_ids:
+            return listings_by_product
+        
+        listings = self.db.query(Listing).options(
+            joinedload(Listing.shop)
+        ).filter(
+            Listing.product_id.in_(product_ids)
+        ).order_by(Listing.id_listing).all()
+        
+        for listing in listings:
+            listings_by_product.setdefault(listing.product_id, []).append(listing)
+        return listings_by_product
+    
     def _get_default_shop_name(self, listings: List[Listing]) -> str:
         """Получение названия магазина по умолчанию"""
         if listings and listings[0].shop:
@@ -0,0 +1,152 @@
+"""
+Сервис снимков поиска (search session)
+
+Первая страница поиска сохраняет объединенный упорядоченный результат
+под непрозрачным search_id, следующие страницы читаются из снимка за O(limit)
+без повторного поиска во внешнем источнике, запроса к БД и чередования.
+"""
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import redis
+
+from core.query_normalizer import normalize_query
+
+logger = logging.getLogger(__name__)
+
+# Максимальное количество снимков в памяти процесса (если Redis недоступен)
+MAX_LOCAL_SESSIONS = 256
+
+
+def normalize_search_query(query: str) -> str:
+    """Нормализация запроса для сравнения со снимком"""
+    return normalize_query(query)
+
+
+class SearchSessionService:
+    """
+    Хранилище снимков поиска
+    
+    В Redis снимок хранится как список (RPUSH при создании, LRANGE при чтении
+    страницы) плюс ключ с исходным запросом; оба ключа живут ttl секунд.
+    Без Redis используется LRU-словарь в памяти процесса с тем же TTL.
+    Элемент снимка - JSON-словарь: {"source": "db", "id": ...} для товаров
+    из БД (цены подгружаются при чтении страницы) или
+    {"source": "external", "item": {...}} для товаров из внешнего источника.
+    """
+    
+    def __init__(self, redis_client: Optional[redis.Redis] = None, ttl: int = 600):
+        """
+        Args:
+            redis_client: Клиент Redis (если None, снимки хранятся в памяти процесса)
+            ttl: Время жизни снимка в секундах
+        """
+        self.redis_client = redis_client
+        self.ttl = ttl
+        self._local: "OrderedDict[str, Tuple[float, str, List[Dict]]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _items_key(search_id: str) -> str:
+        return f"search_session:{search_id}:items"
+    
+    @staticmethod
+    def _query_key(search_id: str) -> str:
+        return f"search_session:{search_id}:query"
+    
+    def create(self, query: str, entries: List[Dict]) -> str:
+        """
+        Создание снимка поиска
+        
+        Args:
+            query: Поисковый запрос
+            entries: Элементы результата в итоговом порядке
+        
+        Returns:
+            search_id снимка
+        """
+        search_id = uuid.uuid4().hex
+        normalized_query = normalize_search_query(query)
+        
+        if self.redis_client:
+            try:
+                pipe = self.redis_client.pipeline(transaction=False)
+                pipe.set(self._query_key(search_id), normalized_query, ex=self.ttl)
+                if entries:
+                    pipe.rpush(
+                        self._items_key(search_id),
+                        *[json.dumps(entry, default=str) for entry in entries]
+                    )
+                    pipe.expire(self._items_key(search_id), self.ttl)
+                pipe.execute()
+                return search_id
+            except Exception as e:
+                logger.error(f"Ошибка сохранения снимка поиска в Redis: {e}")
+        
+        with self._lock:
+            self._evict_expired_locked()
+            self._local[search_id] = (time.monotonic() + self.ttl, normalized_query, list(entries))
+            while len(self._local) > MAX_LOCAL_SESSIONS:
+                self._local.popitem(last=False)
+        return search_id
+    
+    def get_page(
+        self,
+        search_id: str,
+        query: str,
+        skip: int,
+        limit: int
+    ) -> Optional[Tuple[List[Dict], int]]:
+        """
+        Чтение страницы снимка
+        
+        Args:
+            search_id: ID снимка
+            query: Поисковый запрос (должен совпадать с запросом снимка)
+            skip: Пропустить элементов
+            limit: Размер страницы
+        
+        Returns:
+            Кортеж (элементы страницы, всего элементов) или None, если снимок
+            не найден, истек или создан для другого запроса
+        """
+        normalized_query = normalize_search_query(query)
+        
+        if self.redis_client:
+            try:
+                pipe = self.redis_client.pipeline(transaction=False)
+                pipe.get(self._query_key(search_id))
+                pipe.lrange(self._items_key(search_id), skip, skip + limit - 1)
+                pipe.llen(self._items_key(search_id))
+                stored_query, raw_items, total = pipe.execute()
+                if stored_query is not None:
+                    if stored_query != normalized_query:
+                        return None
+                    return [json.loads(raw) for raw in raw_items], total
+            except Exception as e:
+                logger.error(f"Ошибка чтения снимка поиска из Redis: {e}")
+        
+        with self._lock:
+            session = self._local.get(search_id)
+            if session is None:
+                return None
+            expires_at, stored_query, entries = session
+            if expires_at <= time.monotonic():
+                del self._local[search_id]
+                return None
+            if stored_query != normalized_query:
+                return None
+            self._local.move_to_end(search_id)
+            return entries[skip:skip + limit], len(entries)
+    
+    def _evict_expired_locked(self) -> None:
+        """Удаление истекших снимков из памяти"""
+        now = time.monotonic()
+        expired = [search_id for search_id, (expires_at, _, _) in self._local.items() if expires_at <= now]
+        for search_id in expired:
+            del self._local[search_id]
@@ -0,0 +1,232 @@
+"""
+Триграммный индекс в памяти для нечеткого (устойчивого к опечаткам) поиска по названиям товаров
+
+Индекс строится при запуске и обновляется изменениями товаров через ORM этого
+процесса (после commit). Изменения из других процессов (другие workers
+uvicorn, load_from_sql.py, SQL-миграции) попадают в индекс при периодической
+перестройке (rebuild_product_title_index_forever).
+"""
+import asyncio
+import re
+import heapq
+import logging
+import threading
+from collections import Counter
+from typing import Callable, Dict, FrozenSet, List, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import Product
+
+logger = logging.getLogger(__name__)
+
+_NON_WORD = re.compile(r'[^\w]+', re.UNICODE)
+
+
+def normalize_text(value: str) -> str:
+    """Нормализация текста для триграмм: нижний регистр, ё -> е, только буквы/цифры"""
+    value = (value or "").lower().replace("ё", "е")
+    return " ".join(_NON_WORD.sub(" ", value).split())
+
+
+def make_trigrams(value: str) -> FrozenSet[str]:
+    """
+    Множество триграмм строки (как в pg_trgm: каждое слово дополняется
+    двумя пробелами в начале и одним в конце)
+    """
+    trigrams = set()
+    for word in normalize_text(value).split():
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            trigrams.add(padded[i:i + 3])
+    return frozenset(trigrams)
+
+
+class TrigramIndex:
+    """
+    Инвертированный индекс триграмм: триграмма -> множество ID документов
+
+    Сходство запроса с документом считается как доля триграмм запроса,
+    найденных в документе (при равенстве - по коэффициенту Жаккара),
+    поэтому короткий запрос с опечаткой ("samsng") находит длинное название.
+    """
+
+    def __init__(self, min_similarity: float = 0.5):
+        """
+        Args:
+            min_similarity: Минимальная доля совпавших триграмм запроса (0..1)
+        """
+        self.min_similarity = min_similarity
+        self._postings: Dict[str, Set[int]] = {}
+        self._documents: Dict[int, FrozenSet[str]] = {}
+        self._lock = threading.RLock()
+        self.ready = False
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def add(self, doc_id: int, text: Optional[str]) -> None:
+        """Добавление (или обновление) документа"""
+        trigrams = make_trigrams(text or "")
+        with self._lock:
+            self._remove_locked(doc_id)
+            if not trigrams:
+                return
+            self._documents[doc_id] = trigrams
+            for trigram in trigrams:
+                self._postings.setdefault(trigram, set()).add(doc_id)
+
+    def remove(self, doc_id: int) -> None:
+        """Удаление документа"""
+        with self._lock:
+            self._remove_locked(doc_id)
+
+    def rebuild(self, documents) -> None:
+        """
+        Полная перестройка индекса
+
+        Args:
+            documents: Итерируемое из пар (doc_id, text)
+        """
+        postings: Dict[str, Set[int]] = {}
+        docs: Dict[int, FrozenSet[str]] = {}
+        for doc_id, text in documents:
+            trigrams = make_trigrams(text or "")
+            if not trigrams:
+                continue
+            docs[doc_id] = trigrams
+            for trigram in trigrams:
+                postings.setdefault(trigram, set()).add(doc_id)
+
+        with self._lock:
+            self._postings = postings
+            self._documents = docs
+            self.ready = True
+
+    def search(
+        self,
+        query: str,
+        limit: int = 20,
+        exclude: Optional[Set[int]] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Поиск top-k документов, похожих на запрос
+
+        Args:
+            query: Поисковый запрос
+            limit: Максимальное количество результатов
+            exclude: ID документов, которые нужно пропустить
+
+        Returns:
+            Список (doc_id, сходство) по убыванию сходства
+        """
+        query_trigrams = make_trigrams(query)
+        if not query_trigrams or limit <= 0:
+            return []
+
+        with self._lock:
+            shared = Counter()
+            for trigram in query_trigrams:
+                posting = self._postings.get(trigram)
+                if posting:
+                    shared.update(posting)
+
+            min_shared = self.min_similarity * len(query_trigrams)
+            scored = []
+            for doc_id, count in shared.items():
+                if count < min_shared or (exclude and doc_id in exclude):
+                    continue
+                doc_size = len(self._documents[doc_id])
+                coverage = count / len(query_trigrams)
+                jaccard = count / (len(query_trigrams) + doc_size - count)
+                scored.append((coverage, jaccard, doc_id))
+
+        best = heapq.nlargest(limit, scored)
+        return [(doc_id, round(coverage, 4)) for coverage, _, doc_id in best]
+
+    def _remove_locked(self, doc_id: int) -> None:
+        trigrams = self._documents.pop(doc_id, None)
+        if not trigrams:
+            return
+        for trigram in trigrams:
+            posting = self._postings.get(trigram)
+            if posting is not None:
+                posting.discard(doc_id)
+                if not posting:
+                    del self._postings[trigram]
+
+
+# Индекс названий товаров (общий для процесса)
+product_title_index = TrigramIndex()
+
+
+def build_product_title_index(db) -> int:
+    """
+    Построение индекса названий по таблице products
+
+    Args:
+        db: Сессия БД
+
+    Returns:
+        Количество проиндексированных товаров
+    """
+    rows = db.query(Product.id_product, Product.title).yield_per(10000)
+    product_title_index.rebuild((row.id_product, row.title) for row in rows)
+    logger.info(f"Триграммный индекс названий построен: {len(product_title_index)} товаров")
+    return len(product_title_index)
+
+
+async def rebuild_product_title_index_forever(session_factory: Callable[[], Session], interval: float) -> None:
+    """
+    Периодическая перестройка индекса (фоновая задача приложения)
+
+    Подхватывает товары, измененные в обход ORM этого процесса.
+
+    Args:
+        session_factory: Фабрика сессий БД
+        interval: Интервал между перестройками в секундах
+    """
+    def rebuild() -> None:
+        with session_factory() as db:
+            build_product_title_index(db)
+
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(rebuild)
+        except Exception as e:
+            logger.error(f"Ошибка перестройки триграммного индекса: {e}")
+
+
+# Инкрементальное обновление индекса при изменении товаров через ORM.
+# Изменения копятся в сессии при flush и применяются только после commit:
+# откаченная транзакция не оставляет в индексе несуществующих товаров
+_PENDING_CHANGES = "product_title_index_changes"
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_product_changes(session: Session, flush_context) -> None:
+    changes = None
+    for objects, deleted in ((session.new, False), (session.dirty, False), (session.deleted, True)):
+        for target in objects:
+            if isinstance(target, Product) and target.id_product is not None:
+                if changes is None:
+                    changes = session.info.setdefault(_PENDING_CHANGES, {})
+                # None - товар удален
+                changes[target.id_product] = None if deleted else target.title
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_product_changes(session: Session) -> None:
+    changes = session.info.pop(_PENDING_CHANGES, None)
+    for doc_id, title in (changes or {}).items():
+        if title is None:
+            product_title_index.remove(doc_id)
+        else:
+            product_title_index.add(doc_id, title)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_product_changes(session: Session) -> None:
+    session.info.pop(_PENDING_CHANGES, None)
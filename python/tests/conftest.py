@@ -0,0 +1,80 @@
+"""
+Общие настройки тестов
+
+Запуск из каталога python: python -m pytest tests
+"""
+import logging
+import os
+import sys
+import tempfile
+
+import fakeredis
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# database.py создает engine при импорте: тесты не должны зависеть от MySQL из .env
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'tests.db')}")
+
+from data_providers import ProductData  # noqa: E402
+
+
+class FakeSource:
+    """Внешний источник: возвращает по одному товару на запрос и запоминает запросы"""
+    
+    def __init__(self):
+        self.calls = []
+    
+    def search_products(self, query, limit):
+        self.calls.append(query)
+        return [ProductData(title=f"{query} x", brand="b", model="m", price=1, shop_name="YM", url=f"https://u/{query}")]
+    
+    async def search_products_async(self, query, limit):
+        return self.search_products(query, limit)
+    
+    def get_popular_products(self, category, limit):
+        self.calls.append(f"pop:{category}")
+        return [ProductData(title="p", brand="b", model="m", price=1, shop_name="YM", url="https://u/p")]
+
+
+@pytest.fixture
+def redis_server():
+    return fakeredis.FakeServer()
+
+
+def make_service(redis_server=None, source=None):
+    """
+    ExternalDataService поверх fakeredis с подменным внешним источником
+    
+    Args:
+        redis_server: Общий fakeredis-сервер (None - сервис без Redis)
+        source: Внешний источник (по умолчанию FakeSource)
+    """
+    from core.cache_keys import CacheKeyBuilder
+    from core.single_flight import SingleFlight
+    from external_data_service import ExternalDataService
+    
+    service = ExternalDataService(redis_enabled=False)
+    service.yandex_api = None
+    service.yandex_parser = source or FakeSource()
+    if redis_server is None:
+        return service
+    
+    service.redis_client = fakeredis.FakeRedis(server=redis_server, decode_responses=True)
+    service.cache_client = fakeredis.FakeRedis(server=redis_server)
+    service.redis_enabled = True
+    service.key_builder = CacheKeyBuilder(service.redis_client)
+    service._async_redis_client = lambda: fakeredis.FakeAsyncRedis(server=redis_server, decode_responses=True)
+    service._async_cache_client = lambda: fakeredis.FakeAsyncRedis(server=redis_server)
+    service.single_flight = SingleFlight(service.redis_client, async_redis_factory=service._async_redis_client)
+    service.url_cache.redis_client = service.redis_client
+    service.url_cache.key_builder = service.key_builder
+    return service
+
+
+@pytest.fixture
+def service(redis_server):
+    """ExternalDataService поверх fakeredis с подменным внешним источником"""
+    logging.disable(logging.CRITICAL)
+    yield make_service(redis_server)
+    logging.disable(logging.NOTSET)
@@ -0,0 +1,66 @@
+"""
+Тесты асинхронного пути поиска во внешнем источнике
+"""
+import asyncio
+
+import fakeredis
+
+from core.single_flight import SingleFlight
+
+
+class BlockingRedis:
+    """Синхронный клиент, который нельзя вызывать из асинхронного пути"""
+    
+    def __getattr__(self, name):
+        raise AssertionError(f"синхронный вызов Redis в event loop: {name}")
+
+
+def test_aggregate_async_uses_cache_and_single_flight(service):
+    """Первый вызов загружает и кэширует, одновременные вызовы объединяются, повтор - из кэша"""
+    async def scenario():
+        first = await asyncio.gather(*(service.aggregate_by_product_async("iphone 15") for _ in range(5)))
+        service.local_cache.delete_matching()
+        again = await service.aggregate_by_product_async("iphone 15")
+        return first, again
+    
+    first, again = asyncio.run(scenario())
+    
+    assert service.yandex_parser.calls == ["iphone 15"]
+    assert all(result == first[0] for result in first)
+    assert again == first[0]
+
+
+def test_cache_hit_does_not_touch_sync_redis(service):
+    """Попадание в кэш читается только через асинхронный клиент"""
+    service.aggregate_by_product("iphone 15")
+    service.local_cache.delete_matching()
+    service.yandex_parser.calls.clear()
+    service.redis_client = BlockingRedis()
+    service.cache_client = BlockingRedis()
+    service.key_builder.redis_client = BlockingRedis()
+    service.key_builder.generation_cache_ttl = 0
+    
+    result = asyncio.run(service.aggregate_by_product_async("iphone 15"))
+    
+    assert result and result[0]["title"] == "iphone 15 x"
+    assert service.yandex_parser.calls == []
+
+
+def test_async_single_flight_waits_for_other_process(redis_server):
+    """Пока блокировку держит другой процесс, ожидание идет через асинхронный клиент"""
+    flight = SingleFlight(
+        fakeredis.FakeRedis(server=redis_server, decode_responses=True),
+        async_redis_factory=lambda: fakeredis.FakeAsyncRedis(server=redis_server, decode_responses=True),
+        poll_interval=0.01
+    )
+    fakeredis.FakeRedis(server=redis_server).set("lock:k", "other", px=60000)
+    reads = []
+    
+    async def read_cached():
+        reads.append(1)
+        return "cached" if len(reads) >= 3 else None
+    
+    async def fetch():
+        raise AssertionError("загрузка не должна выполняться")
+    
+    assert asyncio.run(flight.do_async("k", fetch, read_cached=read_cached)) == "cached"
@@ -0,0 +1,171 @@
+"""
+Тесты пула браузеров (core.browser_pool) на поддельном WebDriver
+"""
+import threading
+
+import pytest
+
+from core.browser_pool import BrowserPool, BrowserPoolTimeout
+
+
+class FakeDriver:
+    """WebDriver без браузера: отвечает, пока не "упал", и запоминает quit"""
+    
+    def __init__(self, number):
+        self.number = number
+        self.alive = True
+        self.quitted = False
+    
+    def execute_script(self, script):
+        if not self.alive:
+            raise RuntimeError("chrome not reachable")
+        return 1
+    
+    def quit(self):
+        self.quitted = True
+
+
+class DriverFactory:
+    """Фабрика FakeDriver, запоминающая все созданные драйверы"""
+    
+    def __init__(self):
+        self.drivers = []
+        self._lock = threading.Lock()
+    
+    def __call__(self):
+        with self._lock:
+            driver = FakeDriver(len(self.drivers))
+            self.drivers.append(driver)
+            return driver
+
+
+@pytest.fixture
+def factory():
+    return DriverFactory()
+
+
+def make_pool(factory, **options):
+    return BrowserPool(factory, **{"size": 2, "max_pages": 50, "checkout_timeout": 0.2, **options})
+
+
+def test_pool_never_exceeds_size(factory):
+    """Одновременные запросы получают не больше size браузеров, остальные ждут возврата"""
+    pool = make_pool(factory, size=2, checkout_timeout=5)
+    barrier = threading.Barrier(6)
+    in_use = []
+    peak = []
+    lock = threading.Lock()
+    
+    def work():
+        barrier.wait(5)
+        for _ in range(5):
+            with pool.browser():
+                with lock:
+                    in_use.append(1)
+                    peak.append(len(in_use))
+                threading.Event().wait(0.005)
+                with lock:
+                    in_use.pop()
+    
+    threads = [threading.Thread(target=work) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    
+    assert max(peak) <= 2
+    assert len(factory.drivers) == 2
+    assert pool.stats()["created"] == 2
+
+
+def test_checkout_times_out_when_all_busy(factory):
+    """Все браузеры заняты дольше timeout - BrowserPoolTimeout"""
+    pool = make_pool(factory, size=1)
+    browser = pool.checkout()
+    
+    with pytest.raises(BrowserPoolTimeout):
+        pool.checkout(timeout=0.05)
+    
+    pool.checkin(browser)
+    assert pool.checkout(timeout=0.05) is browser
+
+
+def test_waiting_checkout_gets_returned_browser(factory):
+    """Ожидающий запрос получает браузер, как только его вернули"""
+    pool = make_pool(factory, size=1, checkout_timeout=5)
+    browser = pool.checkout()
+    threading.Timer(0.1, pool.checkin, args=(browser,)).start()
+    
+    assert pool.checkout() is browser
+    assert len(factory.drivers) == 1
+
+
+def test_dead_browser_is_replaced(factory):
+    """Неотвечающий браузер закрывается при выдаче, вместо него запускается новый"""
+    pool = make_pool(factory, size=1)
+    browser = pool.checkout()
+    pool.checkin(browser)
+    browser.driver.alive = False
+    
+    replacement = pool.checkout()
+    
+    assert replacement.driver is factory.drivers[1]
+    assert factory.drivers[0].quitted
+    assert pool.stats()["created"] == 1
+
+
+def test_browser_failed_inside_block_is_discarded(factory):
+    """Ошибка в блоке with и неотвечающий браузер - браузер не возвращается в пул"""
+    pool = make_pool(factory, size=1)
+    
+    with pytest.raises(RuntimeError):
+        with pool.browser() as driver:
+            driver.alive = False
+            raise RuntimeError("page crashed")
+    
+    assert factory.drivers[0].quitted
+    assert pool.stats()["created"] == 0
+    with pool.browser() as driver:
+        assert driver is factory.drivers[1]
+
+
+def test_browser_is_recycled_after_max_pages(factory):
+    """После max_pages страниц браузер закрывается и пересоздается"""
+    pool = make_pool(factory, max_pages=3)
+    
+    for _ in range(3):
+        with pool.browser() as driver:
+            assert driver is factory.drivers[0]
+    
+    assert factory.drivers[0].quitted
+    assert pool.stats()["recycled"] == 1
+    with pool.browser() as driver:
+        assert driver is factory.drivers[1]
+
+
+def test_close_with_browsers_checked_out(factory):
+    """close закрывает свободные браузеры сразу, занятые - при возврате; новых не выдает"""
+    pool = make_pool(factory)
+    busy = pool.checkout()
+    idle = pool.checkout()
+    pool.checkin(idle)
+    
+    pool.close()
+    
+    assert idle.driver.quitted
+    assert not busy.driver.quitted
+    with pytest.raises(RuntimeError):
+        pool.checkout()
+    
+    pool.checkin(busy)
+    assert busy.driver.quitted
+    assert pool.stats() == {"size": 2, "created": 0, "idle": 0, "recycled": 0}
+
+
+def test_warm_starts_browsers_up_to_size(factory):
+    """warm запускает браузеры заранее, но не больше size"""
+    pool = make_pool(factory, size=2)
+    pool.warm(5)
+    
+    assert len(factory.drivers) == 2
+    assert pool.stats()["idle"] == 2
@@ -0,0 +1,89 @@
+"""
+Тесты кодеков значений кэша (core.cache_codec)
+"""
+import json
+from datetime import datetime
+
+import pytest
+
+from tests.conftest import make_service
+from core import cache_codec
+from core.cache_codec import decode_cache_value, get_cache_codec
+
+CODECS = ["json", "zlib", "msgpack"]
+
+VALUE = {
+    "Яндекс.Маркет": [
+        {"title": "Смартфон Apple iPhone 15 128 ГБ", "price": 72990.0, "url": "https://market.yandex.ru/product/1",
+         "image": None, "tags": ["new", "hit"], "rating": 4, "in_stock": True},
+    ],
+    "empty": [],
+}
+
+
+@pytest.mark.parametrize("name", CODECS)
+def test_round_trip(name):
+    """Значение после кодирования и декодирования не меняется"""
+    codec = get_cache_codec(name)
+    
+    assert codec.name == name
+    assert codec.decode(codec.encode(VALUE)) == VALUE
+
+
+@pytest.mark.parametrize("writer", CODECS)
+@pytest.mark.parametrize("reader", CODECS)
+def test_any_codec_reads_any_format(writer, reader):
+    """Кодек можно менять без очистки кэша"""
+    assert get_cache_codec(reader).decode(get_cache_codec(writer).encode(VALUE)) == VALUE
+
+
+def test_compressed_formats_are_smaller():
+    """Сжатые форматы заметно меньше JSON на типичной выдаче"""
+    big = {"products": [dict(VALUE["Яндекс.Маркет"][0], id=i) for i in range(200)]}
+    json_size = len(get_cache_codec("json").encode(big))
+    
+    assert len(get_cache_codec("zlib").encode(big)) < json_size / 3
+    assert len(get_cache_codec("msgpack").encode(big)) < json_size / 3
+
+
+@pytest.mark.parametrize("raw", [
+    json.dumps(VALUE),
+    json.dumps(VALUE).encode("utf-8"),
+    json.dumps(VALUE, ensure_ascii=False).encode("utf-8"),
+], ids=["str", "ascii-bytes", "utf8-bytes"])
+def test_legacy_json_is_read(raw):
+    """Старые записи - JSON без заголовка, в том числе str от клиента с decode_responses"""
+    assert decode_cache_value(raw) == VALUE
+
+
+def test_non_json_values_are_written_as_strings():
+    """Даты и другие типы без JSON-представления записываются строкой (как default=str)"""
+    moment = datetime(2024, 5, 1, 10, 0)
+    for name in CODECS:
+        assert get_cache_codec(name).decode(get_cache_codec(name).encode({"at": moment})) == {"at": str(moment)}
+
+
+def test_codec_fallbacks(monkeypatch):
+    """Неизвестное имя - json; msgpack без пакета - zlib"""
+    assert get_cache_codec("brotli").name == "json"
+    assert get_cache_codec(None).name == "msgpack"
+    
+    monkeypatch.setattr(cache_codec, "msgpack", None)
+    assert get_cache_codec("msgpack").name == "zlib"
+
+
+def test_msgpack_entry_without_msgpack_is_an_error(monkeypatch):
+    """Запись msgpack без пакета msgpack - ValueError (читается как промах кэша)"""
+    raw = get_cache_codec("msgpack").encode(VALUE)
+    monkeypatch.setattr(cache_codec, "msgpack", None)
+    
+    with pytest.raises(ValueError):
+        decode_cache_value(raw)
+
+
+def test_service_reads_legacy_entry(redis_server):
+    """Запись старого формата (JSON без конверта) читается сервисом как свежая"""
+    service = make_service(redis_server)
+    service.cache_client.setex("legacy:key", 60, json.dumps({"value": [1, 2, 3]}))
+    
+    assert service._read_cache_entry("legacy:key") == ({"value": [1, 2, 3]}, True)
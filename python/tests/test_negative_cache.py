@@ -0,0 +1,67 @@
+"""
+Тесты негативного кэша: фильтр пустых запросов - только подсказка
+"""
+from core.query_normalizer import normalize_query
+from tests.conftest import FakeSource, make_service
+
+
+class SwitchableSource(FakeSource):
+    """Источник, который ничего не находит, пока empty=True"""
+    
+    def __init__(self):
+        super().__init__()
+        self.empty = True
+    
+    def search_products(self, query, limit):
+        if self.empty:
+            self.calls.append(query)
+            return []
+        return super().search_products(query, limit)
+
+
+def search_key(service, query):
+    return service.key_builder.key("search", normalize_query(query))
+
+
+def test_confirmed_empty_query_is_not_fetched_again(service):
+    service.yandex_parser = SwitchableSource()
+    
+    assert service.aggregate_by_product("нет такого") == []
+    assert service.aggregate_by_product("нет такого") == []
+    assert service.search_products("нет такого") == {}
+    assert service.yandex_parser.calls == ["нет такого"]
+
+
+def test_bloom_false_positive_does_not_return_empty(service):
+    """Бит фильтра без негативной записи в кэше не дает пустого ответа"""
+    service.empty_queries.add(search_key(service, "iphone"))
+    
+    assert service.aggregate_by_product("iphone")[0]["title"] == "iphone x"
+    assert service.search_products("iphone")
+    assert service.yandex_parser.calls == ["iphone"]
+
+
+def test_result_filled_by_other_worker_is_served(redis_server):
+    """Запрос, пустой для этого worker, но заполненный другим, отдает товары"""
+    first = make_service(redis_server, source=SwitchableSource())
+    second = make_service(redis_server, source=FakeSource())
+    assert first.aggregate_by_product("новинка") == []
+    
+    second.aggregate_by_product("новинка", use_cache=False)
+    # Сообщение pub/sub о записи второго worker сбрасывает запись в памяти первого
+    first.local_cache.delete(search_key(first, "новинка"))
+    
+    assert first.aggregate_by_product("новинка")[0]["title"] == "новинка x"
+    assert first.yandex_parser.calls == ["новинка"]
+
+
+def test_without_redis_negative_entry_lives_in_memory():
+    service = make_service(source=SwitchableSource())
+    
+    assert service.aggregate_by_product("нет такого") == []
+    assert service.aggregate_by_product("нет такого") == []
+    assert service.yandex_parser.calls == ["нет такого"]
+    
+    service.empty_queries.add(search_key(service, "iphone"))
+    service.yandex_parser.empty = False
+    assert service.aggregate_by_product("iphone")[0]["title"] == "iphone x"
@@ -0,0 +1,100 @@
+"""
+Тесты курсорной пагинации (core.pagination)
+"""
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import Column, DateTime, Integer, create_engine
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+from core.exceptions import ValidationError
+from core.pagination import decode_cursor, encode_cursor, paginate_keyset
+
+Base = declarative_base()
+
+
+class Event(Base):
+    __tablename__ = "events"
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    
+    # Много одинаковых дат: порядок внутри них задает id
+    rng = random.Random(7)
+    start = datetime(2024, 1, 1, 12, 0, 0)
+    session.add_all(
+        Event(id=i, user_id=i % 2, created_at=start + timedelta(minutes=rng.randint(0, 5)))
+        for i in range(1, 42)
+    )
+    session.commit()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def expected_order(session, user_id):
+    events = session.query(Event).filter(Event.user_id == user_id).all()
+    return [event.id for event in sorted(events, key=lambda event: (event.created_at, event.id), reverse=True)]
+
+
+def test_cursor_round_trip():
+    """Курсор восстанавливает дату с микросекундами и id, паддинг base64 отрезан"""
+    moment = datetime(2024, 3, 5, 10, 30, 15, 123456)
+    cursor = encode_cursor(moment, 42)
+    
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (moment, 42)
+
+
+@pytest.mark.parametrize("cursor", ["", "not-base64!", encode_cursor(datetime(2024, 1, 1), 1)[:-3], "eyJ0IjoxfQ"])
+def test_broken_cursor_is_rejected(cursor):
+    """Поврежденный курсор - ошибка валидации, а не 500"""
+    with pytest.raises(ValidationError):
+        decode_cursor(cursor)
+
+
+@pytest.mark.parametrize("limit", [1, 4, 7, 20, 50])
+def test_cursor_pages_follow_date_and_id_order(db, limit):
+    """Страницы по курсору идут по (дата, id) по убыванию без пропусков и повторов"""
+    query = db.query(Event).filter(Event.user_id == 1)
+    collected = []
+    cursor = None
+    while True:
+        rows, cursor = paginate_keyset(query, Event.created_at, Event.id, limit, cursor=cursor)
+        assert len(rows) <= limit
+        collected.extend(row.id for row in rows)
+        if cursor is None:
+            break
+    
+    assert collected == expected_order(db, 1)
+
+
+def test_skip_without_cursor_matches_cursor_pages(db):
+    """Клиенты без курсора получают те же страницы через skip"""
+    query = db.query(Event).filter(Event.user_id == 0)
+    first, cursor = paginate_keyset(query, Event.created_at, Event.id, 5)
+    by_cursor, _ = paginate_keyset(query, Event.created_at, Event.id, 5, cursor=cursor)
+    by_skip, _ = paginate_keyset(query, Event.created_at, Event.id, 5, skip=5)
+    
+    assert [row.id for row in by_cursor] == [row.id for row in by_skip]
+    assert [row.id for row in first + by_cursor] == expected_order(db, 0)[:10]
+
+
+def test_last_page_has_no_cursor(db):
+    """Если следующей страницы нет, курсор не возвращается"""
+    query = db.query(Event).filter(Event.user_id == 0)
+    total = query.count()
+    
+    rows, cursor = paginate_keyset(query, Event.created_at, Event.id, total)
+    
+    assert len(rows) == total
+    assert cursor is None
@@ -0,0 +1,155 @@
+"""
+Тесты жизненного цикла токенов прогрессивного поиска
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import fakeredis
+import pytest
+
+from services.pending_search_service import (
+    PENDING_DONE,
+    PENDING_EMPTY,
+    PENDING_FAILED,
+    PENDING_RUNNING,
+    PendingSearchRegistry,
+)
+
+
+@pytest.fixture
+def executor():
+    executor = ThreadPoolExecutor(max_workers=4)
+    yield executor
+    executor.shutdown(wait=True)
+
+
+@pytest.fixture
+def workers(executor):
+    """Два реестра (два worker) с общим Redis"""
+    server = fakeredis.FakeServer()
+    return [
+        PendingSearchRegistry(executor, ttl=60, redis_client=fakeredis.FakeRedis(server=server, decode_responses=True))
+        for _ in range(2)
+    ]
+
+
+def test_state_is_visible_to_other_worker(workers):
+    """Опрос на другом worker видит, что поиск идет, а затем - что завершился"""
+    first, second = workers
+    release = threading.Event()
+    token = first.start("Смартфон Samsung", lambda: release.wait(5) and [{"title": "Samsung"}])
+    
+    assert second.get(token) is None
+    assert second.state(token) == PENDING_RUNNING
+    assert not second.wait(token, timeout=0.1)
+    
+    release.set()
+    assert second.wait(token, timeout=5)
+    assert second.state(token) == PENDING_DONE
+    assert first.state(token) == PENDING_DONE
+
+
+def test_empty_and_failed_states(workers):
+    """Поиск без товаров и упавший поиск - известные токены, а не 404"""
+    first, second = workers
+    empty_token = first.start("пусто", lambda: [])
+    failed_token = first.start("ошибка", lambda: 1 / 0)
+    
+    assert second.wait(empty_token, timeout=5) and second.wait(failed_token, timeout=5)
+    assert second.state(empty_token) == PENDING_EMPTY
+    assert second.state(failed_token) == PENDING_FAILED
+
+
+def test_same_query_joins_running_search(workers):
+    """Тот же запрос (после нормализации) на любом worker получает тот же токен"""
+    first, second = workers
+    release = threading.Event()
+    calls = []
+    
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return [{"title": "x"}]
+    
+    token = first.start("Смартфон Samsung", fetch)
+    assert first.start("samsung смартфон", fetch) == token
+    assert second.start("купить смартфон самсунг", fetch) == token
+    release.set()
+    first.wait(token, timeout=5)
+    
+    assert len(calls) == 1
+
+
+def test_failed_search_is_restarted(workers):
+    """После ошибки повторный запрос запускает новый поиск"""
+    first, _ = workers
+    token = first.start("ошибка", lambda: 1 / 0)
+    first.wait(token, timeout=5)
+    
+    assert first.start("ошибка", lambda: []) != token
+
+
+def test_unknown_token(workers):
+    first, _ = workers
+    assert first.state("unknown") is None
+    assert first.wait("unknown", timeout=0.1)
+
+
+def test_without_redis_tokens_are_local(executor):
+    """Без Redis состояние доступно только процессу, запустившему поиск"""
+    registry = PendingSearchRegistry(executor, ttl=60)
+    other = PendingSearchRegistry(executor, ttl=60)
+    token = registry.start("iphone", lambda: [{"title": "iPhone"}])
+    registry.wait(token, timeout=5)
+    
+    assert registry.state(token) == PENDING_DONE
+    assert other.state(token) is None
+
+
+def test_concurrent_starts_create_one_search(workers):
+    """Одновременные запросы в одном и в разных worker получают один токен и один поиск"""
+    release = threading.Event()
+    calls = []
+    tokens = []
+    barrier = threading.Barrier(8)
+    
+    def fetch():
+        calls.append(1)
+        release.wait(5)
+        return [{"title": "x"}]
+    
+    def start(registry):
+        barrier.wait(5)
+        tokens.append(registry.start("iphone 15", fetch))
+    
+    threads = [threading.Thread(target=start, args=(workers[i % 2],)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    release.set()
+    
+    assert len(set(tokens)) == 1
+    assert len(calls) == 1
+
+
+def test_finished_search_releases_query(workers):
+    """Завершенный поиск освобождает запрос: следующий worker запускает свой"""
+    first, second = workers
+    token = first.start("iphone", lambda: [])
+    first.wait(token, timeout=5)
+    
+    assert first.redis_client.get("pending_search:query:iphone") is None
+    assert second.start("iphone", lambda: []) != token
+
+
+def test_claim_of_crashed_worker_is_taken_over(workers):
+    """Запрос закреплен за токеном упавшего worker (состояния нет) - запускаем свой поиск"""
+    first, _ = workers
+    first.redis_client.set("pending_search:query:iphone", "dead-token", ex=60)
+    
+    token = first.start("iphone", lambda: [{"title": "iPhone"}])
+    
+    assert token != "dead-token"
+    assert first.wait(token, timeout=5)
+    assert first.state(token) == PENDING_DONE
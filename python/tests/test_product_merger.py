@@ -0,0 +1,77 @@
+"""
+Тесты чередования товаров из источников (product_merger)
+"""
+import random
+
+import pytest
+
+from product_merger import LazySequence, count_merged_products, merge_products_page
+
+
+def naive_merge(*sources):
+    """Чередование перебором: по одному товару из каждого непустого источника за раунд"""
+    merged = []
+    for round_idx in range(max((len(source) for source in sources), default=0)):
+        for source in sources:
+            if round_idx < len(source):
+                merged.append(source[round_idx])
+    return merged
+
+
+def make_sources(rng, max_length=12):
+    return [[f"{name}{i}" for i in range(rng.randint(0, max_length))] for name in ("e", "d", "s")]
+
+
+def test_page_matches_naive_merge_on_random_sources():
+    """Любая страница совпадает со срезом полного чередования"""
+    rng = random.Random(6)
+    for _ in range(300):
+        external, db, static = make_sources(rng)
+        full = naive_merge(external, db, static)
+        skip = rng.randint(0, len(full) + 3)
+        limit = rng.randint(0, 10)
+        
+        assert merge_products_page(external, db, static, skip=skip, limit=limit) == full[skip:skip + limit]
+        assert count_merged_products(external, db, static) == len(full)
+
+
+@pytest.mark.parametrize("lengths", [(0, 0, 0), (5, 0, 0), (0, 3, 0), (1, 1, 1), (2, 7, 4), (10, 1, 0)])
+def test_all_pages_cover_merge_exactly_once(lengths):
+    """Страницы подряд дают все товары ровно один раз и в порядке чередования"""
+    external, db, static = ([f"{name}{i}" for i in range(length)] for name, length in zip("eds", lengths))
+    pages = []
+    for skip in range(0, sum(lengths) + 3, 3):
+        pages.extend(merge_products_page(external, db, static, skip=skip, limit=3))
+    
+    assert pages == naive_merge(external, db, static)
+
+
+def test_static_products_are_optional():
+    """Без статических товаров чередуются два источника"""
+    assert merge_products_page(["e0", "e1"], ["d0"], skip=1, limit=5) == ["d0", "e1"]
+    assert count_merged_products(["e0", "e1"], ["d0"]) == 3
+
+
+def test_lazy_source_loads_page_items_in_one_batch():
+    """Из LazySequence загружаются только товары страницы и одной пачкой"""
+    batches = []
+    
+    def loader(rows):
+        batches.append(list(rows))
+        return [f"built-{row}" for row in rows]
+    
+    db = LazySequence(list(range(20)), loader)
+    page = merge_products_page(["e0", "e1", "e2"], db, skip=4, limit=6)
+    
+    assert page == ["e2", "built-2", "built-3", "built-4", "built-5", "built-6"]
+    assert batches == [[2, 3, 4, 5, 6]]
+
+
+def test_failed_lazy_source_is_left_out():
+    """Если загрузчик не вернул товары (ошибка БД), страница строится без этого источника"""
+    db = LazySequence(list(range(5)), lambda rows: [])
+    external = ["e0", "e1", "e2", "e3"]
+    
+    assert merge_products_page(external, db, skip=1, limit=3) == ["e1", "e2", "e3"]
+    assert db.failed
+    assert count_merged_products(external, db) == 4
@@ -0,0 +1,92 @@
+"""
+Тесты GET /products с асинхронным поиском во внешнем источнике
+"""
+import asyncio
+import importlib
+
+import pytest
+
+from tests.conftest import FakeSource
+
+
+class SlowSource(FakeSource):
+    """Источник, который отвечает дольше EXTERNAL_SEARCH_DEADLINE"""
+    
+    async def search_products_async(self, query, limit):
+        await asyncio.sleep(0.5)
+        return self.search_products(query, limit)
+
+
+@pytest.fixture
+def app_module(tmp_path, monkeypatch):
+    """main.py на SQLite без Redis и прогрева кэша"""
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'test.db'}")
+    monkeypatch.setenv("REDIS_ENABLED", "false")
+    monkeypatch.setenv("CACHE_WARMER_ENABLED", "false")
+    for module in ("main", "database"):
+        if module in importlib.sys.modules:
+            del importlib.sys.modules[module]
+    main = importlib.import_module("main")
+    main.external_data_service.yandex_api = None
+    main.external_data_service.yandex_parser = FakeSource()
+    
+    def sync_search(*args, **kwargs):
+        raise AssertionError("/products не должен вызывать синхронный поиск")
+    
+    monkeypatch.setattr(main.external_data_service, "search_products", sync_search)
+    yield main
+    for module in ("main", "database"):
+        importlib.sys.modules.pop(module, None)
+
+
+def test_products_uses_async_external_search(app_module):
+    """Внешний поиск выполняется асинхронно, товары попадают в ответ и снимок"""
+    from fastapi.testclient import TestClient
+    
+    with TestClient(app_module.app) as client:
+        response = client.get("/products", params={"search": "iphone 15"})
+    
+    body = response.json()
+    assert response.status_code == 200
+    assert body["total"] == 1
+    assert body["products"][0]["product"]["title"] == "iphone 15 x"
+    assert body["search_id"]
+    assert app_module.external_data_service.yandex_parser.calls == ["iphone 15"]
+
+
+def test_products_deadline_returns_db_results(app_module, monkeypatch):
+    """Не успевший внешний поиск не задерживает ответ дольше EXTERNAL_SEARCH_DEADLINE"""
+    from fastapi.testclient import TestClient
+    
+    monkeypatch.setattr(app_module, "EXTERNAL_SEARCH_DEADLINE", 0.05)
+    app_module.external_data_service.yandex_parser = SlowSource()
+    
+    with TestClient(app_module.app) as client:
+        response = client.get("/products", params={"search": "iphone 15"})
+    
+    body = response.json()
+    assert response.status_code == 200
+    assert body["total"] == 0
+    assert body["search_id"] is None
+
+
+def test_products_db_error_returns_external_results(app_module, monkeypatch):
+    """Ошибка загрузки цен товаров БД не дает 500: в ответе только внешние товары"""
+    from fastapi.testclient import TestClient
+    
+    with app_module.SessionLocal() as db:
+        db.add(app_module.Product(title="iphone 15 pro"))
+        db.commit()
+    
+    def broken_build(db, products):
+        raise RuntimeError("database is gone")
+    
+    monkeypatch.setattr(app_module, "build_db_search_products", broken_build)
+    
+    with TestClient(app_module.app) as client:
+        response = client.get("/products", params={"search": "iphone 15"})
+    
+    body = response.json()
+    assert response.status_code == 200
+    assert body["total"] == 1
+    assert [item["product"]["title"] for item in body["products"]] == ["iphone 15 x"]
@@ -0,0 +1,45 @@
+"""
+Тесты нормализации поисковых запросов
+"""
+from core.query_normalizer import normalize_query, query_tokens
+
+
+def test_variants_of_same_query_share_key():
+    """Регистр, порядок слов, пробелы, служебные слова и кириллица бренда не меняют ключ"""
+    expected = normalize_query("Смартфон Samsung")
+    for variant in ("samsung  смартфон", "купить смартфон самсунг", "СМАРТФОН, Samsung!", "смартфон samsung цена"):
+        assert normalize_query(variant) == expected
+
+
+def test_category_words_are_kept():
+    """Слова-категории меняют выдачу, поэтому остаются в ключе"""
+    phones = normalize_query("Смартфон Samsung")
+    laptops = normalize_query("ноутбук samsung")
+    brand_only = normalize_query("samsung")
+    
+    assert phones == "samsung смартфон"
+    assert laptops == "samsung ноутбук"
+    assert len({phones, laptops, brand_only}) == 3
+
+
+def test_query_tokens_keep_order_and_categories():
+    """Токены для поиска в БД: исходный порядок, категория сохраняется"""
+    assert query_tokens("Ноутбук Леново ThinkPad") == ["ноутбук", "lenovo", "thinkpad"]
+    assert query_tokens("купить айфон 15") == ["iphone", "15"]
+
+
+def test_yo_folding():
+    """Ё приравнивается к е"""
+    assert normalize_query("чёрный") == normalize_query("черный")
+
+
+def test_only_service_words_are_kept():
+    """Запрос только из служебных слов не превращается в пустой"""
+    assert query_tokens("Купить") == ["купить"]
+    assert normalize_query("цена купить") == "купить цена"
+
+
+def test_empty_query():
+    assert normalize_query("") == ""
+    assert normalize_query(None) == ""
+    assert query_tokens("  ,. ") == []
@@ -0,0 +1,247 @@
+"""
+Тесты single-flight (core.single_flight)
+
+Два экземпляра SingleFlight на одном fakeredis-сервере - это два worker-а.
+"""
+import asyncio
+import threading
+import time
+
+import fakeredis
+import pytest
+
+from core.single_flight import SingleFlight
+
+FAST = dict(wait_timeout=0.5, poll_interval=0.01)
+
+
+class Store:
+    """Кэш результата, общий для "процессов", и счетчик загрузок"""
+    
+    def __init__(self):
+        self.value = None
+        self.fetches = 0
+    
+    def read(self):
+        return self.value
+    
+    async def read_async(self):
+        return self.value
+
+
+def make_flight(server, **options):
+    return SingleFlight(
+        fakeredis.FakeRedis(server=server, decode_responses=True),
+        async_redis_factory=lambda: fakeredis.FakeAsyncRedis(server=server, decode_responses=True),
+        **{**FAST, **options}
+    )
+
+
+def run_threads(count, target):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+
+def test_concurrent_calls_share_one_fetch():
+    """Одинаковые вызовы в процессе получают результат одной загрузки"""
+    flight = SingleFlight()
+    release = threading.Event()
+    fetches = []
+    results = []
+    
+    def fetch():
+        fetches.append(1)
+        release.wait(2)
+        return "result"
+    
+    def call():
+        results.append(flight.do("key", fetch))
+    
+    threading.Timer(0.2, release.set).start()
+    run_threads(8, call)
+    
+    assert len(fetches) == 1
+    assert results == ["result"] * 8
+
+
+def test_error_reaches_all_waiters():
+    """Ошибку загрузки получают все ожидающие вызовы"""
+    flight = SingleFlight()
+    release = threading.Event()
+    errors = []
+    
+    def fetch():
+        release.wait(2)
+        raise RuntimeError("boom")
+    
+    def call():
+        try:
+            flight.do("key", fetch)
+        except RuntimeError as e:
+            errors.append(str(e))
+    
+    threading.Timer(0.2, release.set).start()
+    run_threads(4, call)
+    
+    assert errors == ["boom"] * 4
+    # После ошибки ключ свободен: следующий вызов загружает заново
+    assert flight.do("key", lambda: "ok") == "ok"
+
+
+def test_other_process_waits_for_cached_result(redis_server):
+    """Второй worker не загружает сам, а дожидается результата первого в кэше"""
+    store = Store()
+    first, second = make_flight(redis_server), make_flight(redis_server)
+    started = threading.Event()
+    results = {}
+    
+    def slow_fetch():
+        store.fetches += 1
+        started.set()
+        time.sleep(0.2)
+        store.value = "result"
+        return "result"
+    
+    def own_fetch():
+        store.fetches += 1
+        return "own"
+    
+    leader = threading.Thread(target=lambda: results.setdefault("first", first.do("key", slow_fetch, store.read)))
+    leader.start()
+    started.wait(2)
+    results["second"] = second.do("key", own_fetch, store.read)
+    leader.join(2)
+    
+    assert results == {"first": "result", "second": "result"}
+    assert store.fetches == 1
+    assert not fakeredis.FakeRedis(server=redis_server).exists("lock:key")
+
+
+def test_lock_released_without_result_is_taken_over(redis_server):
+    """Владелец снял блокировку без результата (ошибка) - ожидающий загружает сам"""
+    client = fakeredis.FakeRedis(server=redis_server, decode_responses=True)
+    client.set("lock:key", "other-worker", px=60000)
+    threading.Timer(0.1, client.delete, args=("lock:key",)).start()
+    store = Store()
+    
+    started_at = time.monotonic()
+    result = make_flight(redis_server, wait_timeout=5).do("key", lambda: "own", store.read)
+    
+    assert result == "own"
+    assert time.monotonic() - started_at < 2
+
+
+def test_lost_lock_times_out_and_fetches(redis_server):
+    """Блокировку держит упавший worker: после wait_timeout загружаем сами"""
+    fakeredis.FakeRedis(server=redis_server).set("lock:key", "dead-worker", px=60000)
+    store = Store()
+    
+    started_at = time.monotonic()
+    result = make_flight(redis_server, wait_timeout=0.3).do("key", lambda: "own", store.read)
+    
+    assert result == "own"
+    assert 0.3 <= time.monotonic() - started_at < 2
+
+
+def test_foreign_lock_is_not_released(redis_server):
+    """Блокировка истекла и взята другим worker-ом: владелец старой ее не снимает"""
+    client = fakeredis.FakeRedis(server=redis_server, decode_responses=True)
+    flight = make_flight(redis_server)
+    
+    def fetch():
+        client.set("lock:key", "next-worker")
+        return "result"
+    
+    assert flight.do("key", fetch, Store().read) == "result"
+    assert client.get("lock:key") == "next-worker"
+
+
+def test_async_calls_share_one_fetch():
+    """Одинаковые корутины в одном event loop получают результат одной загрузки"""
+    flight = SingleFlight()
+    store = Store()
+    
+    async def fetch():
+        store.fetches += 1
+        await asyncio.sleep(0.05)
+        return "result"
+    
+    async def main():
+        return await asyncio.gather(*(flight.do_async("key", fetch) for _ in range(8)))
+    
+    assert asyncio.run(main()) == ["result"] * 8
+    assert store.fetches == 1
+
+
+def test_async_other_process_waits_for_cached_result(redis_server):
+    """Асинхронно: второй worker дожидается результата первого в кэше"""
+    store = Store()
+    first, second = make_flight(redis_server), make_flight(redis_server)
+    
+    async def slow_fetch():
+        store.fetches += 1
+        await asyncio.sleep(0.2)
+        store.value = "result"
+        return "result"
+    
+    async def own_fetch():
+        store.fetches += 1
+        return "own"
+    
+    async def main():
+        leader = asyncio.create_task(first.do_async("key", slow_fetch, store.read_async))
+        await asyncio.sleep(0.05)
+        waiter = await second.do_async("key", own_fetch, store.read_async)
+        return await leader, waiter
+    
+    assert asyncio.run(main()) == ("result", "result")
+    assert store.fetches == 1
+
+
+def test_async_lost_lock_times_out_and_fetches(redis_server):
+    """Асинхронно: после wait_timeout при чужой блокировке загружаем сами"""
+    fakeredis.FakeRedis(server=redis_server).set("lock:key", "dead-worker", px=60000)
+    store = Store()
+    
+    async def fetch():
+        return "own"
+    
+    async def main():
+        started_at = time.monotonic()
+        result = await make_flight(redis_server, wait_timeout=0.3).do_async("key", fetch, store.read_async)
+        return result, time.monotonic() - started_at
+    
+    result, elapsed = asyncio.run(main())
+    assert result == "own"
+    assert 0.3 <= elapsed < 2
+
+
+def test_async_error_reaches_waiters():
+    """Ошибку асинхронной загрузки получают все ожидающие корутины"""
+    flight = SingleFlight()
+    
+    async def fetch():
+        await asyncio.sleep(0.05)
+        raise RuntimeError("boom")
+    
+    async def main():
+        return await asyncio.gather(*(flight.do_async("key", fetch) for _ in range(3)), return_exceptions=True)
+    
+    errors = asyncio.run(main())
+    assert [str(error) for error in errors] == ["boom"] * 3
+
+
+@pytest.mark.parametrize("use_async", [False, True], ids=["thread", "async"])
+def test_without_read_cached_no_lock_is_taken(redis_server, use_async):
+    """Без чтения кэша ждать нечего: загрузка без блокировки Redis"""
+    fakeredis.FakeRedis(server=redis_server).set("lock:key", "other-worker", px=60000)
+    flight = make_flight(redis_server, wait_timeout=5)
+    
+    async def fetch():
+        return "own"
+    
+    result = asyncio.run(flight.do_async("key", fetch)) if use_async else flight.do("key", lambda: "own")
+    assert result == "own"
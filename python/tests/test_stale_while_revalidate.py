@@ -0,0 +1,130 @@
+"""
+Тесты stale-while-revalidate: конверт записи кэша, отдача устаревших данных
+и фоновое обновление
+"""
+import json
+import threading
+import time
+
+from core.query_normalizer import normalize_query
+from data_providers import ProductData
+from tests.conftest import FakeSource, make_service
+
+
+class VersionedSource(FakeSource):
+    """Источник, который на каждый запрос отдает новую цену: start + номер запроса"""
+    
+    def __init__(self, start=0):
+        super().__init__()
+        self.start = start
+    
+    def search_products(self, query, limit):
+        self.calls.append(query)
+        price = self.start + len(self.calls)
+        return [ProductData(title=f"{query} x", brand="b", model="m", price=price, shop_name="YM", url=f"https://u/{query}")]
+
+
+class BlockingSource(VersionedSource):
+    """VersionedSource, который отвечает только после release"""
+    
+    def __init__(self, start=0):
+        super().__init__(start)
+        self.release = threading.Event()
+    
+    def search_products(self, query, limit):
+        self.release.wait(5)
+        return super().search_products(query, limit)
+
+
+def search_key(service, query):
+    return service.key_builder.key("search", normalize_query(query))
+
+
+def age_entry(service, cache_key, seconds):
+    """Сдвиг fetched_at записи в Redis в прошлое"""
+    entry = service.codec.decode(service.cache_client.get(cache_key))
+    entry["fetched_at"] -= seconds
+    service.cache_client.set(cache_key, service.codec.encode(entry), keepttl=True)
+
+
+def wait_refresh(service):
+    """Ожидание фоновых обновлений кэша"""
+    service._refresh_executor.shutdown(wait=True)
+
+
+def first_price(results):
+    return results["Яндекс.Маркет"][0].price
+
+
+def test_entry_is_written_in_envelope(service):
+    """Запись: конверт с fetched_at и soft_ttl, жесткий TTL = cache_ttl + stale_ttl"""
+    service.search_products("iphone")
+    cache_key = search_key(service, "iphone")
+    
+    entry = service.codec.decode(service.cache_client.get(cache_key))
+    assert entry.keys() == {"fetched_at", "soft_ttl", "data"}
+    assert entry["soft_ttl"] == service.cache_ttl
+    assert abs(entry["fetched_at"] - time.time()) < 5
+    assert service.cache_ttl < service.cache_client.ttl(cache_key) <= service.cache_ttl + service.stale_ttl
+
+
+def test_fresh_entry_is_served_without_fetch(redis_server):
+    """Свежая запись отдается без загрузки и без фонового обновления"""
+    writer = make_service(redis_server, source=VersionedSource())
+    writer.search_products("iphone")
+    reader = make_service(redis_server, source=VersionedSource())
+    
+    assert first_price(reader.search_products("iphone")) == 1
+    wait_refresh(reader)
+    assert reader.yandex_parser.calls == []
+
+
+def test_stale_entry_is_served_and_refreshed_in_background(redis_server):
+    """Устаревшая запись отдается сразу, свежая загружается в фоне один раз"""
+    writer = make_service(redis_server, source=VersionedSource())
+    writer.search_products("iphone")
+    cache_key = search_key(writer, "iphone")
+    age_entry(writer, cache_key, writer.cache_ttl + 1)
+    
+    reader = make_service(redis_server, source=BlockingSource(start=100))
+    # Пока обновление идет, повторные чтения отдают устаревшую запись и не запускают второе
+    assert first_price(reader.search_products("iphone")) == 1
+    assert first_price(reader.search_products("iphone")) == 1
+    reader.yandex_parser.release.set()
+    wait_refresh(reader)
+    
+    assert reader.yandex_parser.calls == ["iphone"]
+    entry = reader.codec.decode(reader.cache_client.get(cache_key))
+    assert time.time() - entry["fetched_at"] < 5
+    other_worker = make_service(redis_server, source=VersionedSource(start=200))
+    assert first_price(other_worker.search_products("iphone")) == 101
+    assert other_worker.yandex_parser.calls == []
+
+
+def test_stale_aggregated_entry_is_refreshed(redis_server):
+    """Устаревший агрегированный список отдается сразу; обновление результатов поиска сбрасывает его"""
+    writer = make_service(redis_server, source=VersionedSource())
+    assert writer.aggregate_by_product("iphone")[0]["min_price"] == 1
+    aggregated_key = writer._aggregated_cache_key("iphone")
+    age_entry(writer, aggregated_key, writer.cache_ttl + 1)
+    
+    reader = make_service(redis_server, source=VersionedSource(start=100))
+    assert reader.aggregate_by_product("iphone")[0]["min_price"] == 1
+    wait_refresh(reader)
+    
+    assert reader.yandex_parser.calls == ["iphone"]
+    other_worker = make_service(redis_server, source=VersionedSource(start=200))
+    assert other_worker.aggregate_by_product("iphone")[0]["min_price"] == 101
+    assert other_worker.yandex_parser.calls == []
+
+
+def test_legacy_entry_is_fresh(redis_server):
+    """Запись без конверта (до stale-while-revalidate) считается свежей до истечения TTL"""
+    service = make_service(redis_server, source=VersionedSource())
+    cache_key = search_key(service, "iphone")
+    product = {"title": "iphone old", "brand": "b", "model": "m", "price": 5, "shop_name": "YM", "url": "https://u/old"}
+    service.cache_client.setex(cache_key, 60, json.dumps({"Яндекс.Маркет": [product]}))
+    
+    assert first_price(service.search_products("iphone")) == 5
+    wait_refresh(service)
+    assert service.yandex_parser.calls == []
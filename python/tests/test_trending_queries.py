@@ -0,0 +1,36 @@
+"""
+Тесты статистики частых запросов и прогрева по ним
+"""
+from datetime import datetime
+
+from cache_warmer import CacheWarmer
+
+
+def test_trending_returns_text_typed_by_user(service):
+    """Частота - по нормализованной форме, текст - первый введенный пользователем"""
+    for query in ("iPhone 15 Pro", "iphone  15 pro", "купить iPhone 15 Pro", "Смартфон Samsung"):
+        service.record_search_query(query)
+    
+    assert service.get_trending_queries(5) == ["iPhone 15 Pro", "Смартфон Samsung"]
+
+
+def test_warmer_scrapes_original_text(service):
+    """Прогрев отправляет во внешний источник исходный текст, а не нормализованный ключ"""
+    for _ in range(3):
+        service.record_search_query("Смартфон Samsung")
+    service.record_search_query("ноутбук Леново")
+    
+    warmer = CacheWarmer(service, interval=60, scrape_budget=10, trending_top=5)
+    warmer.warm_once(force=True)
+    scraped = [call for call in service.yandex_parser.calls if not call.startswith("pop:")]
+    
+    assert scraped == ["Смартфон Samsung", "ноутбук Леново"]
+    assert service.is_search_cached("samsung смартфон")
+
+
+def test_legacy_entries_without_text(service):
+    """Записи, учтенные до хранения текстов, возвращаются в нормализованной форме"""
+    trending_key = service._trending_key(datetime.utcnow())
+    service.redis_client.zincrby(trending_key, 1, "15 iphone")
+    
+    assert service.get_trending_queries(5) == ["15 iphone"]
@@ -0,0 +1,132 @@
+"""
+Тесты триграммного индекса нечеткого поиска (services.trigram_index)
+"""
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import models
+from services.trigram_index import TrigramIndex, make_trigrams, product_title_index
+
+TITLES = {
+    1: "Смартфон Samsung Galaxy S24",
+    2: "Смартфон Samsung Galaxy A55",
+    3: "Наушники Sony WH-1000XM5",
+    4: "Ноутбук Lenovo ThinkPad X1",
+}
+
+
+@pytest.fixture
+def index():
+    trigram_index = TrigramIndex()
+    trigram_index.rebuild(TITLES.items())
+    return trigram_index
+
+
+def test_trigrams_are_normalized():
+    """Регистр, ё и знаки препинания не влияют на триграммы"""
+    assert make_trigrams("Ёлка!") == make_trigrams("елка")
+    assert "  s" in make_trigrams("Samsung")
+    assert make_trigrams("   ") == frozenset()
+
+
+def test_typo_finds_title(index):
+    """Запрос с опечаткой находит название"""
+    found = [doc_id for doc_id, _ in index.search("samsng galaxy")]
+    
+    assert set(found[:2]) == {1, 2}
+    assert 3 not in found and 4 not in found
+
+
+def test_results_ranked_by_similarity(index):
+    """Более похожие названия выше, сходство по убыванию"""
+    results = index.search("galaxy s24")
+    
+    assert results[0][0] == 1
+    assert [score for _, score in results] == sorted((score for _, score in results), reverse=True)
+    assert all(0 < score <= 1 for _, score in results)
+
+
+def test_min_similarity_and_limit(index):
+    """Непохожие названия не возвращаются, limit ограничивает результат"""
+    assert index.search("холодильник") == []
+    assert len(index.search("смартфон samsung", limit=1)) == 1
+    assert index.search("samsung", limit=0) == []
+
+
+def test_exclude_skips_documents(index):
+    """exclude: уже найденные точным поиском товары не повторяются"""
+    found = [doc_id for doc_id, _ in index.search("samsung galaxy", exclude={1})]
+    
+    assert 1 not in found
+    assert 2 in found
+
+
+def test_add_update_remove(index):
+    """Добавление, замена названия и удаление документа"""
+    index.add(5, "Планшет Xiaomi Pad 6")
+    assert index.search("xiaomi pad")[0][0] == 5
+    
+    index.add(5, "Планшет Huawei MatePad")
+    assert index.search("xiaomi pad") == []
+    assert index.search("huawei matepad")[0][0] == 5
+    
+    index.remove(5)
+    index.remove(42)
+    assert index.search("huawei matepad") == []
+    assert len(index) == len(TITLES)
+
+
+@pytest.fixture
+def db():
+    """Сессия SQLite; общий индекс товаров очищается до и после теста"""
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    product_title_index.rebuild([])
+    yield session
+    session.close()
+    engine.dispose()
+    product_title_index.rebuild([])
+
+
+def indexed(query):
+    """ID товаров, найденных в общем индексе"""
+    return [doc_id for doc_id, _ in product_title_index.search(query)]
+
+
+def test_orm_changes_applied_after_commit(db):
+    """Товары, добавленные, переименованные и удаленные через ORM, попадают в индекс после commit"""
+    product = models.Product(title="Смартфон Samsung Galaxy S24")
+    db.add(product)
+    db.flush()
+    assert indexed("samsung galaxy") == []
+    
+    db.commit()
+    assert indexed("samsung galaxy") == [product.id_product]
+    
+    product.title = "Смартфон Honor X8b"
+    db.commit()
+    assert indexed("samsung galaxy") == []
+    assert indexed("honor x8b") == [product.id_product]
+    
+    db.delete(product)
+    db.commit()
+    assert indexed("honor x8b") == []
+
+
+def test_rolled_back_changes_are_not_indexed(db):
+    """Откат транзакции не оставляет в индексе несуществующих товаров и не удаляет существующие"""
+    kept = models.Product(title="Наушники Sony WH-1000XM5")
+    db.add(kept)
+    db.commit()
+    
+    db.add(models.Product(title="Смартфон Samsung Galaxy S24"))
+    db.flush()
+    db.rollback()
+    assert indexed("samsung galaxy") == []
+    
+    db.delete(db.get(models.Product, kept.id_product))
+    db.flush()
+    db.rollback()
+    assert indexed("sony wh") == [kept.id_product]
@@ -0,0 +1,94 @@
+"""
+Тесты разбора страницы поиска Яндекс.Маркета (YandexMarketExtractor)
+
+Страница в fixtures повторяет разметку выдачи: сниппеты с data-zone-name и
+data-auto, обфусцированные классы, рекламные блоки, фильтры и подвал с ценами.
+"""
+import os
+import re
+
+import pytest
+
+pytest.importorskip("lxml")
+
+from yandex_market_extractor import YandexMarketExtractor  # noqa: E402
+from yandex_market_parser import YandexMarketParser  # noqa: E402
+
+PAGE_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "yandex_market_search.html")
+BASE_URL = "https://market.yandex.ru"
+
+
+@pytest.fixture(scope="module")
+def page():
+    with open(PAGE_PATH, encoding="utf-8") as page_file:
+        return page_file.read()
+
+
+def strip_markup(html: str) -> str:
+    """Страница без data-zone-name и классов (как после смены верстки)"""
+    return re.sub(r'\s(?:data-zone-name|class)="[^"]*"', "", html)
+
+
+def unique_by_title(products):
+    """Товары без повторов названия (как их отдает YandexMarketExtractor)"""
+    seen = set()
+    result = []
+    for product in products:
+        if product.title.lower() not in seen:
+            seen.add(product.title.lower())
+            result.append((product.title, product.price, product.url))
+    return result
+
+
+def test_snippets_are_extracted(page):
+    """Товары со сниппетов: название, цена, ссылка и картинка из любого атрибута"""
+    products = YandexMarketExtractor(BASE_URL).extract(page, "смартфон", 30)
+    
+    assert [(p.title, p.price, p.brand) for p in products[:4]] == [
+        ("Смартфон Apple iPhone 15 128 ГБ, черный", 72990.0, "Apple"),
+        ("Смартфон Samsung Galaxy S24 8/256 ГБ, серый", 64499.0, "Samsung"),
+        ("Смартфон Xiaomi Redmi Note 13 8/256 ГБ, синий", 17290.0, "Xiaomi"),
+        ("Смартфон HONOR X8b 8/128 ГБ, серебристый", 14990.0, "Honor"),
+    ]
+    assert products[0].url == f"{BASE_URL}/product--smartfon-apple-iphone-15-128gb-chernyi/1968987605?sku=101"
+    assert [p.image for p in products[:4]] == [
+        f"https://avatars.mds.yandex.net/get-mpic/{sku}/img_id{sku}/orig" for sku in (101, 102, 103, 105)
+    ]
+    
+    titles = [p.title for p in products]
+    # Товар без цены и реклама не попадают в выдачу, повтор названия - тоже
+    assert not any("HUAWEI" in title for title in titles)
+    assert not any("Кредит" in title or "Распродажа" in title for title in titles)
+    assert len(titles) == len(set(titles))
+
+
+def test_limit_stops_extraction(page):
+    """Разбор останавливается, как только набрано limit товаров"""
+    products = YandexMarketExtractor(BASE_URL).extract(page, "смартфон", 2)
+    
+    assert [p.title for p in products] == [
+        "Смартфон Apple iPhone 15 128 ГБ, черный",
+        "Смартфон Samsung Galaxy S24 8/256 ГБ, серый",
+    ]
+
+
+@pytest.mark.parametrize("prepare", [lambda html: html, strip_markup], ids=["marked", "bare"])
+def test_same_products_as_soup(page, prepare):
+    """Результат совпадает с разбором через BeautifulSoup, в том числе без разметки"""
+    html = prepare(page)
+    parser = YandexMarketParser()
+    
+    fast = YandexMarketExtractor(BASE_URL).extract(html, "смартфон", 30)
+    soup = parser._extract_with_soup(html, "смартфон", 30)
+    
+    assert fast
+    assert unique_by_title(fast) == unique_by_title(soup)
+
+
+def test_bare_page_uses_structure(page):
+    """Без data-zone-name и классов товары ищутся по div со ссылкой и ценой"""
+    products = YandexMarketExtractor(BASE_URL).extract(strip_markup(page), "смартфон", 30)
+    
+    urls = [p.url for p in products]
+    assert f"{BASE_URL}/product--smartfon-apple-iphone-15-128gb-chernyi/1968987605?sku=101" in urls
+    assert all(p.price > 0 for p in products)
@@ -6,11 +6,19 @@ import redis
 import json
 import logging
 import hashlib
-from typing import Optional
+import re
+from typing import Iterable, List, Optional, Tuple
 from datetime import datetime, timedelta
 
+from core.cache_keys import CacheKeyBuilder
+from core.query_normalizer import normalize_query
+from core.redis_pool import get_redis_client
+
 logger = logging.getLogger(__name__)
 
+# Пути страниц ошибок/заглушек: URL с ними не считаются ссылками на товар
+SUSPICIOUS_PATHS_RE = re.compile(r"/proc|/error|/404|/common|/Common|/NotFound")
+
 
 class URLCacheService:
     """Сервис для кэширования URL товаров"""
@@ -18,33 +26,34 @@ class URLCacheService:
     def __init__(
         self,
         redis_client: Optional[redis.Redis] = None,
-        cache_ttl: int = 604800  # 7 дней по умолчанию
+        cache_ttl: int = 604800,  # 7 дней по умолчанию
+        key_builder: Optional[CacheKeyBuilder] = None,
+        redis_enabled: bool = True
     ):
         """
         Инициализация сервиса кэширования
         
         Args:
-            redis_client: Клиент Redis (если None, создается новый)
+            redis_client: Клиент Redis (если None, используется общий пул процесса)
             cache_ttl: Время жизни кэша в секундах (по умолчанию 7 дней)
+            key_builder: Построитель ключей (пространство имен "url" с поколениями)
+            redis_enabled: Подключаться ли к Redis, если клиент не передан
         """
         self.redis_client = redis_client
         self.cache_ttl = cache_ttl
+        self.key_builder = key_builder
         
-        if not self.redis_client:
+        if not self.redis_client and redis_enabled:
             try:
-                import os
-                self.redis_client = redis.Redis(
-                    host=os.getenv("REDIS_HOST", "localhost"),
-                    port=int(os.getenv("REDIS_PORT", "6379")),
-                    db=int(os.getenv("REDIS_DB", "0")),
-                    decode_responses=True,
-                    socket_connect_timeout=5
-                )
+                self.redis_client = get_redis_client()
                 self.redis_client.ping()
                 logger.info("✅ URL Cache Service: Redis подключен")
             except Exception as e:
                 logger.warning(f"URL Cache Service: Redis недоступен: {e}")
                 self.redis_client = None
+        
+        if self.key_builder is None:
+            self.key_builder = CacheKeyBuilder(self.redis_client)
     
     def _generate_cache_key(self, brand: Optional[str] = None, model: Optional[str] = None, title: Optional[str] = None) -> str:
         """
@@ -60,11 +69,11 @@ class URLCacheService:
         """
         if brand and model:
             # Приоритет: бренд + модель (самый точный)
-            key = f"url:{brand.lower().strip()}:{model.lower().strip()}"
+            key = self.key_builder.key("url", normalize_query(brand), normalize_query(model))
         elif title:
             # Fallback: хеш названия
-            title_hash = hashlib.md5(title.lower().strip().encode()).hexdigest()[:12]
-            key = f"url:title:{title_hash}"
+            title_hash = hashlib.md5(normalize_query(title).encode()).hexdigest()[:12]
+            key = self.key_builder.key("url", "title", title_hash)
         else:
             return None
         
@@ -148,6 +157,44 @@ class URLCacheService:
             logger.error(f"Ошибка сохранения URL в кэш: {e}")
             return False
     
+    def save_product_urls(
+        self,
+        items: Iterable[Tuple[str, Optional[str], Optional[str], Optional[str]]],
+        ttl: Optional[int] = None
+    ) -> int:
+        """
+        Сохранение URL нескольких товаров в кэш за одно обращение к Redis (pipeline)
+        
+        Args:
+            items: Кортежи (url, brand, model, title)
+            ttl: Время жизни в секундах (если None, используется self.cache_ttl)
+        
+        Returns:
+            Количество сохраненных URL
+        """
+        if not self.redis_client:
+            return 0
+        
+        ttl_to_use = ttl if ttl is not None else self.cache_ttl
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            saved = 0
+            for url, brand, model, title in items:
+                if not url or not url.strip():
+                    continue
+                cache_key = self._generate_cache_key(brand=brand, model=model, title=title)
+                if not cache_key:
+                    continue
+                pipe.setex(cache_key, ttl_to_use, url.strip())
+                saved += 1
+            if saved:
+                pipe.execute()
+                logger.debug(f"Сохранено {saved} URL в кэш")
+            return saved
+        except Exception as e:
+            logger.error(f"Ошибка сохранения URL в кэш: {e}")
+            return 0
+    
     def build_search_url(
         self,
         query: str,
@@ -240,25 +287,71 @@ class URLCacheService:
             partner_id=partner_id
         )
     
+    def get_or_build_urls(
+        self,
+        items: List[Tuple[Optional[str], Optional[str], Optional[str], Optional[str]]],
+        partner_id: Optional[str] = None
+    ) -> List[str]:
+        """
+        Получение URL нескольких товаров (те же приоритеты, что в get_or_build_url)
+        
+        Все URL, которых нет среди переданных, читаются из кэша одним MGET.
+        
+        Args:
+            items: Кортежи (brand, model, title, existing_url)
+            partner_id: Партнерский ID (для добавления к ссылкам)
+        
+        Returns:
+            URL для открытия товаров (в порядке items)
+        """
+        urls: List[Optional[str]] = [None] * len(items)
+        
+        # Приоритет 1: существующие URL
+        lookups = []
+        for index, (brand, model, title, existing_url) in enumerate(items):
+            url = existing_url.strip() if existing_url else ""
+            if self._is_valid_url(url):
+                urls[index] = url
+                continue
+            cache_key = self._generate_cache_key(brand=brand, model=model, title=title)
+            if cache_key:
+                lookups.append((index, cache_key))
+        
+        # Приоритет 2: кэш (одно обращение к Redis на все товары)
+        if lookups and self.redis_client:
+            try:
+                cached_urls = self.redis_client.mget([cache_key for _, cache_key in lookups])
+                for (index, _), cached_url in zip(lookups, cached_urls):
+                    if cached_url and self._is_valid_url(cached_url):
+                        urls[index] = cached_url
+            except Exception as e:
+                logger.error(f"Ошибка чтения URL из кэша: {e}")
+        
+        # Приоритет 3: поисковый URL
+        for index, (brand, model, title, _) in enumerate(items):
+            if urls[index] is None:
+                urls[index] = self.build_search_url(
+                    query=self._build_search_query(brand=brand, model=model, title=title),
+                    brand=brand,
+                    model=model,
+                    partner_id=partner_id
+                )
+            elif partner_id:
+                urls[index] = self._add_partner_id(urls[index], partner_id)
+        
+        return urls
+    
     def _is_valid_url(self, url: str) -> bool:
         """Проверка валидности URL"""
         if not url or len(url) < 10:
             return False
         
         # Проверяем формат URL
-        if not (url.startswith("http://") or url.startswith("https://")):
+        if not url.startswith(("http://", "https://")):
             return False
         
         # Проверяем на подозрительные пути
-        suspicious_paths = ['/proc', '/error', '/404', '/common', '/Common', '/NotFound']
-        if any(path in url for path in suspicious_paths):
-            return False
-        
-        # Проверяем формат URL
-        if url.startswith("http://") or url.startswith("https://"):
-            return True
-        
-        return False
+        return SUSPICIOUS_PATHS_RE.search(url) is None
     
     def _add_partner_id(self, url: str, partner_id: str) -> str:
         """Добавление партнерского ID к URL"""
@@ -0,0 +1,472 @@
+"""
+Быстрое извлечение товаров со страницы поиска Яндекс.Маркет (lxml)
+
+Страница разбирается один раз парсером lxml. Размеченные кандидаты в товары
+(data-zone-name, классы) собираются одним XPath-запросом по наличию
+атрибута, слова в атрибутах проверяются в Python. Структурный способ (div со
+ссылкой и ценой внутри) нужен, только если размеченных товаров не хватило:
+он выполняется лениво одним проходом по дереву, признаки "есть ссылка" и
+"есть цена" переносятся на предков с остановкой на уже отмеченном - без
+повторного просмотра поддеревьев. Поля товара ищутся ленивым обходом
+потомков до первого совпадения. Разбор кандидатов останавливается, как
+только набрано limit товаров.
+
+Порядок способов и правила извлечения полей - те же, что в
+YandexMarketParser при разборе через BeautifulSoup (используется, если lxml
+не установлен).
+"""
+import json
+import logging
+import re
+from datetime import datetime
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+from data_providers import ProductData
+
+try:
+    from lxml import etree
+    from lxml import html as lxml_html
+except ImportError:  # pragma: no cover - без lxml парсер использует BeautifulSoup
+    etree = None
+    lxml_html = None
+
+logger = logging.getLogger(__name__)
+
+# Доступен ли быстрый разбор (пакет lxml)
+LXML_AVAILABLE = etree is not None
+
+# Популярные бренды для определения бренда и модели по названию
+COMMON_BRANDS = [
+    "Samsung", "Apple", "Xiaomi", "Huawei", "OnePlus", "Google", "Sony", "LG",
+    "ASUS", "Lenovo", "Honor", "Realme", "Oppo", "Vivo", "Nokia", "Motorola",
+    "JBL", "Sennheiser", "Bose", "AirPods", "Beats", "HyperX", "Razer"
+]
+_COMMON_BRANDS_LOWER = [(brand, brand.lower()) for brand in COMMON_BRANDS]
+
+# Цена в тексте: число (с пробелами-разделителями разрядов) перед ₽/руб
+PRICE_TEXT_RE = re.compile(r'[\d\s]+₽|[\d\s]+руб', re.I)
+_PRICE_NUMBER_RE = re.compile(r'\d[\d\s]*')
+_WHITESPACE_RE = re.compile(r'\s+')
+_JSON_SCRIPT_RE = re.compile(r'window\.__INITIAL_STATE__|__APP_DATA__|products|offers', re.I)
+_JSON_PRODUCTS_RE = re.compile(r'\{[^{}]*"products"[^{}]*\}', re.DOTALL)
+
+
+def brand_and_model(title: str) -> Tuple[str, str]:
+    """
+    Бренд и модель по названию товара
+    
+    Известный бренд ищется в названии, модель - до трех слов после него;
+    иначе бренд - первое слово названия.
+    
+    Args:
+        title: Название товара
+    
+    Returns:
+        Кортеж (бренд, модель); пустые строки, если определить не удалось
+    """
+    title_lower = title.lower()
+    for brand, brand_lower in _COMMON_BRANDS_LOWER:
+        brand_pos = title_lower.find(brand_lower)
+        if brand_pos >= 0:
+            model_part = title[brand_pos + len(brand):].strip()
+            return brand, " ".join(model_part.split()[:3]).strip()
+    
+    words = title.split()
+    if not words:
+        return "", ""
+    return words[0], " ".join(words[1:4]) if len(words) > 1 else ""
+
+
+def parse_price(text: str) -> float:
+    """Первое число в тексте цены ("12 990 ₽" -> 12990.0), 0 - если числа нет"""
+    match = _PRICE_NUMBER_RE.search(text.replace(",", ""))
+    if not match:
+        return 0.0
+    try:
+        return float(_WHITESPACE_RE.sub("", match.group()))
+    except ValueError:
+        return 0.0
+
+
+def parse_json_product(item: dict, base_url: str) -> Optional[ProductData]:
+    """
+    Товар из JSON-данных страницы
+    
+    Args:
+        item: Словарь товара/оффера
+        base_url: Адрес Яндекс.Маркета для относительных ссылок
+    
+    Returns:
+        Товар или None, если нет названия или цены
+    """
+    try:
+        title = item.get('name') or item.get('title') or item.get('offerName', '')
+        if not title:
+            return None
+        
+        # Цена
+        price = 0
+        price_data = item.get('price', {})
+        if isinstance(price_data, dict):
+            price = float(price_data.get('value', 0) or price_data.get('amount', 0))
+        elif price_data:
+            price = float(price_data)
+        
+        if price <= 0:
+            return None
+        
+        # URL
+        url = item.get('url') or item.get('link') or item.get('offerUrl', '')
+        if url and not url.startswith('http'):
+            url = f"{base_url}{url}" if url.startswith('/') else f"{base_url}/{url}"
+        
+        # Изображение
+        image = ""
+        if 'pictures' in item and item['pictures']:
+            image = item['pictures'][0].get('url', '') or item['pictures'][0].get('original', '')
+        elif 'image' in item:
+            image = item['image']
+        
+        # Бренд и модель
+        brand = item.get('vendor', {}).get('name', '') if isinstance(item.get('vendor'), dict) else (item.get('vendor') or '')
+        model = item.get('model', {}).get('name', '') if isinstance(item.get('model'), dict) else (item.get('model') or '')
+        
+        # Если нет бренда, извлекаем из названия
+        if not brand:
+            title_lower = title.lower()
+            for b, b_lower in _COMMON_BRANDS_LOWER:
+                if b_lower in title_lower:
+                    brand = b
+                    break
+        
+        return ProductData(
+            title=title,
+            brand=brand or "Не указан",
+            model=model or "Не указана",
+            price=price,
+            shop_name="Яндекс.Маркет",
+            url=url or f"{base_url}/search",
+            image=image,
+            description=item.get('description', ''),
+            product_id=str(item.get('id', '')),
+            scraped_at=datetime.utcnow()
+        )
+    except Exception as e:
+        logger.debug(f"Ошибка парсинга JSON товара: {e}")
+        return None
+
+
+if LXML_AVAILABLE:
+    # Кандидаты по атрибутам за один XPath. Слова в атрибутах проверяются в Python:
+    # translate() для регистронезависимого сравнения в XPath на порядок медленнее
+    _MARKED_NODES = etree.XPath("//*[@data-zone-name] | //div[@class] | //article[@class]")
+    _FIRST_LINK = etree.XPath("(.//a[@href])[1]")
+    _IMAGES = [etree.XPath(f"(.//img[@{attr}])[1]") for attr in ("src", "data-src", "data-lazy-src")]
+    _JSON_SCRIPTS = etree.XPath("//script")
+    _DATA_STATE = etree.XPath("//*[@data-state]")
+
+# Слова в data-zone-name и class для способов поиска кандидатов (как в YandexMarketParser)
+_ZONE_WORDS = ("product",)
+_ZONE_WORDS_WIDE = ("product", "offer", "snippet")
+_CLASS_WORDS = ("product", "offer", "card", "snippet", "item")
+# Слова для поиска полей внутри кандидата
+_TITLE_WORDS = ("title", "name")
+_PRICE_WORDS = ("price",)
+_AMOUNT_WORDS = ("value", "amount")
+
+
+def _text(element) -> str:
+    """Текст элемента как get_text(strip=True) у BeautifulSoup"""
+    return "".join(part.strip() for part in element.itertext())
+
+
+def _first(xpath, element):
+    found = xpath(element)
+    return found[0] if found else None
+
+
+def _has_word(value: Optional[str], words: Sequence[str]) -> bool:
+    if not value:
+        return False
+    value = value.lower()
+    return any(word in value for word in words)
+
+
+def _find_first(element, tags: Sequence, attr: str, words: Sequence[str]):
+    """
+    Первый потомок с одним из words в атрибуте attr (без учета регистра)
+    
+    Обход ленивый и останавливается на первом совпадении, в отличие от
+    XPath "(.//*[...])[1]", который сначала собирает все совпадения.
+    """
+    for node in element.iterdescendants(*tags):
+        if _has_word(node.get(attr), words):
+            return node
+    return None
+
+
+def _mark_ancestors(element, marked: set) -> None:
+    """Отметка элемента и его предков (до первого уже отмеченного)"""
+    while element is not None and element not in marked:
+        marked.add(element)
+        element = element.getparent()
+
+
+def _has_price_text(text: Optional[str]) -> bool:
+    if not text:
+        return False
+    return ("₽" in text or "руб" in text.lower()) and PRICE_TEXT_RE.search(text) is not None
+
+
+def _marked_candidates(root) -> Tuple[List, List, List]:
+    """
+    Кандидаты по атрибутам за один проход
+    
+    Returns:
+        Элементы в порядке документа: по data-zone-name с "product", div/article
+        по классам и по data-zone-name (расширенный)
+    """
+    by_zone, by_class, by_zone_wide = [], [], []
+    for node in _MARKED_NODES(root):
+        zone = node.get("data-zone-name")
+        if _has_word(zone, _ZONE_WORDS):
+            by_zone.append(node)
+        if _has_word(zone, _ZONE_WORDS_WIDE):
+            by_zone_wide.append(node)
+        if node.tag in ("div", "article") and _has_word(node.get("class"), _CLASS_WORDS):
+            by_class.append(node)
+    return by_zone, by_class, by_zone_wide
+
+
+def _structural_candidates(root) -> List:
+    """
+    div со ссылкой и ценой внутри (страница без знакомой разметки)
+    
+    Один проход по дереву: каждая ссылка и каждый текст с ценой отмечают своих
+    предков, подъем останавливается на уже отмеченном. В отличие от
+    //div[.//a[@href]][...], где каждый div заново обходит свое поддерево,
+    время линейно от размера страницы.
+    """
+    with_link, with_price = set(), set()
+    for node in root.iter(etree.Element):
+        if _has_price_text(node.text):
+            _mark_ancestors(node, with_price)
+        if _has_price_text(node.tail):
+            # Хвост элемента (текст после него) принадлежит родителю
+            _mark_ancestors(node.getparent(), with_price)
+        if node.tag == "a" and node.get("href") is not None:
+            _mark_ancestors(node.getparent(), with_link)
+    return [div for div in root.iter("div") if div in with_link and div in with_price]
+
+
+class YandexMarketExtractor:
+    """Извлечение товаров со страницы поиска за один разбор HTML"""
+    
+    def __init__(self, base_url: str = "https://market.yandex.ru"):
+        """
+        Args:
+            base_url: Адрес Яндекс.Маркета для относительных ссылок
+        """
+        if not LXML_AVAILABLE:
+            raise RuntimeError("Для быстрого разбора установите lxml: pip install lxml")
+        self.base_url = base_url
+        self._parser = lxml_html.HTMLParser(encoding="utf-8")
+    
+    def extract(self, html_content: str, query: str, limit: int) -> List[ProductData]:
+        """
+        Товары со страницы поиска
+        
+        Сначала JSON-данные страницы, затем (если товаров меньше limit)
+        элементы разметки. Товары с одинаковым названием не повторяются.
+        
+        Args:
+            html_content: HTML страницы
+            query: Поисковый запрос (для ссылки по умолчанию)
+            limit: Количество товаров
+        
+        Returns:
+            Не больше limit товаров
+        """
+        root = lxml_html.fromstring(html_content.encode("utf-8"), parser=self._parser)
+        products: List[ProductData] = []
+        seen_titles = set()
+        
+        def add(product: Optional[ProductData]) -> bool:
+            if product is not None and product.title not in seen_titles:
+                seen_titles.add(product.title)
+                products.append(product)
+            return len(products) >= limit
+        
+        for product in self._iter_json_products(root):
+            if add(product):
+                return products
+        if products:
+            logger.info(f"Найдено {len(products)} товаров в JSON данных")
+        
+        # Как и при разборе через BeautifulSoup, пробуем не больше limit * 2 элементов
+        attempts = 0
+        for element in self._iter_candidates(root):
+            if attempts >= limit * 2:
+                break
+            attempts += 1
+            if add(self._parse_element(element, query)):
+                break
+        
+        logger.info(f"Разобрано элементов: {attempts}, товаров: {len(products)}")
+        return products
+    
+    def _iter_json_products(self, root) -> Iterator[ProductData]:
+        """Товары из JSON в script-тегах и data-state атрибутах"""
+        for script in _JSON_SCRIPTS(root):
+            text = script.text
+            if not text or (script.get("type") != "application/json" and not _JSON_SCRIPT_RE.search(text)):
+                continue
+            for match in _JSON_PRODUCTS_RE.findall(text):
+                try:
+                    data = json.loads(match)
+                except ValueError:
+                    continue
+                for item in data.get("products", []) if isinstance(data, dict) else []:
+                    if isinstance(item, dict):
+                        product = parse_json_product(item, self.base_url)
+                        if product:
+                            yield product
+        
+        for element in _DATA_STATE(root):
+            try:
+                state = json.loads(element.get("data-state") or "{}")
+            except ValueError:
+                continue
+            if not isinstance(state, dict) or ("products" not in state and "offers" not in state):
+                continue
+            for item in state.get("products", state.get("offers", [])):
+                if isinstance(item, dict):
+                    product = parse_json_product(item, self.base_url)
+                    if product:
+                        yield product
+    
+    @staticmethod
+    def _iter_candidates(root) -> Iterator:
+        """
+        Кандидаты в товары без повторов: способы в порядке приоритета
+        
+        Проход для структурного поиска выполняется, только если товаров из
+        размеченных элементов не хватило до limit.
+        """
+        seen = set()
+        
+        def unseen(elements):
+            for element in elements:
+                if element not in seen:
+                    seen.add(element)
+                    yield element
+        
+        for elements in _marked_candidates(root):
+            yield from unseen(elements)
+        yield from unseen(_structural_candidates(root))
+    
+    def _parse_element(self, element, query: str) -> Optional[ProductData]:
+        """Товар из элемента разметки (None, если нет названия или цены)"""
+        try:
+            title = self._extract_title(element)
+            if not title or len(title) < 3:
+                return None
+            
+            price = self._extract_price(element)
+            if price <= 0:
+                return None
+            
+            # URL товара
+            url = ""
+            link = _first(_FIRST_LINK, element)
+            if link is not None:
+                url = link.get("href", "")
+                if url and not url.startswith("http"):
+                    url = f"{self.base_url}{url}" if url.startswith("/") else f"{self.base_url}/{url}"
+            if not url:
+                url = f"{self.base_url}/search?text={query}"
+            
+            # Изображение
+            image = ""
+            for xpath in _IMAGES:
+                img = _first(xpath, element)
+                if img is not None:
+                    image = img.get("src") or img.get("data-src") or img.get("data-lazy-src", "")
+                    break
+            if image and not image.startswith("http"):
+                image = f"https:{image}" if image.startswith("//") else image
+            
+            brand, model = brand_and_model(title)
+            return ProductData(
+                title=title,
+                brand=brand or "Не указан",
+                model=model or "Не указана",
+                price=price,
+                shop_name="Яндекс.Маркет",
+                url=url,
+                image=image,
+                description="",
+                product_id="",
+                scraped_at=datetime.utcnow()
+            )
+        except Exception as e:
+            logger.debug(f"Ошибка парсинга элемента: {e}")
+            return None
+    
+    @staticmethod
+    def _extract_title(element) -> str:
+        """Название: data-zone-name, ссылка, заголовки, классы, атрибуты - по очереди"""
+        title = ""
+        title_elem = _find_first(element, (etree.Element,), "data-zone-name", _TITLE_WORDS)
+        if title_elem is not None:
+            title = _text(title_elem)
+        
+        if not title:
+            link = _first(_FIRST_LINK, element)
+            if link is not None:
+                title = _text(link)
+                if len(title) < 3:
+                    title_elem = _find_first(link, ("span", "div", "h3", "h4"), "class", _TITLE_WORDS)
+                    if title_elem is not None:
+                        title = _text(title_elem)
+        
+        if len(title) < 3:
+            for tag in ("h3", "h4", "h2"):
+                title_elem = next(element.iterdescendants(tag), None)
+                if title_elem is not None:
+                    title = _text(title_elem)
+                    if len(title) >= 3:
+                        break
+        
+        if len(title) < 3:
+            for tag in ("span", "div"):
+                title_elem = _find_first(element, (tag,), "class", _TITLE_WORDS)
+                if title_elem is not None:
+                    title = _text(title_elem)
+                    break
+        
+        if len(title) < 3:
+            title = element.get("aria-label", "") or element.get("title", "") or element.get("data-title", "")
+        return title
+    
+    @staticmethod
+    def _extract_price(element) -> float:
+        """Цена: data-zone-name, классы, текст с ₽/руб - по очереди"""
+        price_elem = _find_first(element, (etree.Element,), "data-zone-name", _PRICE_WORDS)
+        if price_elem is not None:
+            price = parse_price(_text(price_elem))
+            if price > 0:
+                return price
+        
+        for tag, words in (("span", _PRICE_WORDS), ("div", _PRICE_WORDS), ("span", _AMOUNT_WORDS)):
+            price_elem = _find_first(element, (tag,), "class", words)
+            if price_elem is not None:
+                price = parse_price(_text(price_elem))
+                if price > 0:
+                    return price
+                break
+        
+        for text in element.itertext():
+            if PRICE_TEXT_RE.search(text):
+                return parse_price(text.strip())
+        return 0.0
@@ -2,11 +2,19 @@
 Клиент для работы с Яндекс.Маркет OAuth API (для разработчиков)
 Документация: https://yandex.ru/dev/market/partner-api/doc/ru/
 """
+import asyncio
 import requests
 import logging
 from typing import List, Optional, Dict
 from datetime import datetime
 
+from core.http_session import (
+    ASYNC_HTTP_AVAILABLE,
+    get_async_http_client,
+    get_async_http_timeout,
+    get_http_session,
+    get_http_timeout
+)
 from data_providers import ProductData
 
 logger = logging.getLogger(__name__)
@@ -31,43 +39,68 @@ class YandexMarketOAuthAPI:
             "Authorization": f"OAuth {oauth_token}",
             "Content-Type": "application/json"
         }
+        # Общая сессия с пулом соединений (keep-alive между запросами)
+        self.session = get_http_session()
     
     def _make_request(self, method: str, endpoint: str, params: Optional[Dict] = None, json_data: Optional[Dict] = None) -> Optional[Dict]:
         """Выполнение HTTP запроса к API"""
         url = f"{self.BASE_URL}{endpoint}"
         
         try:
-            response = requests.request(
+            response = self.session.request(
                 method=method,
                 url=url,
                 headers=self.headers,
                 params=params,
                 json=json_data,
-                timeout=30
+                timeout=get_http_timeout(30)
             )
-            
-            if response.status_code == 200:
-                return response.json()
-            elif response.status_code == 401:
-                logger.error("Ошибка авторизации: неверный OAuth токен")
-                logger.error(f"Проверьте YANDEX_OAUTH_TOKEN в .env файле")
-                return None
-            elif response.status_code == 403:
-                logger.error("Ошибка доступа: недостаточно прав")
-                logger.error(f"Убедитесь, что у приложения есть право market:partner-api")
-                return None
-            elif response.status_code == 404:
-                logger.warning(f"Endpoint не найден: {endpoint}. Пробую альтернативный метод.")
-                return None
-            else:
-                logger.warning(f"Ошибка API: {response.status_code} - {response.text[:200]}")
-                logger.debug(f"Полный ответ: {response.text}")
-                return None
-                
+            return self._handle_response(response, endpoint)
         except requests.exceptions.RequestException as e:
             logger.error(f"Ошибка запроса к Яндекс.Маркет API: {e}")
             return None
     
+    async def _make_request_async(self, method: str, endpoint: str, params: Optional[Dict] = None, json_data: Optional[Dict] = None) -> Optional[Dict]:
+        """Асинхронное выполнение HTTP запроса к API (общий асинхронный клиент)"""
+        if not ASYNC_HTTP_AVAILABLE:
+            return await asyncio.to_thread(self._make_request, method, endpoint, params, json_data)
+        
+        url = f"{self.BASE_URL}{endpoint}"
+        try:
+            client = get_async_http_client()
+            response = await client.request(
+                method,
+                url,
+                headers=self.headers,
+                params=params,
+                json=json_data,
+                timeout=get_async_http_timeout(30)
+            )
+            return self._handle_response(response, endpoint)
+        except Exception as e:
+            logger.error(f"Ошибка запроса к Яндекс.Маркет API: {e}")
+            return None
+    
+    def _handle_response(self, response, endpoint: str) -> Optional[Dict]:
+        """Разбор ответа API (requests или httpx): JSON при 200, иначе None"""
+        if response.status_code == 200:
+            return response.json()
+        elif response.status_code == 401:
+            logger.error("Ошибка авторизации: неверный OAuth токен")
+            logger.error(f"Проверьте YANDEX_OAUTH_TOKEN в .env файле")
+            return None
+        elif response.status_code == 403:
+            logger.error("Ошибка доступа: недостаточно прав")
+            logger.error(f"Убедитесь, что у приложения есть право market:partner-api")
+            return None
+        elif response.status_code == 404:
+            logger.warning(f"Endpoint не найден: {endpoint}. Пробую альтернативный метод.")
+            return None
+        else:
+            logger.warning(f"Ошибка API: {response.status_code} - {response.text[:200]}")
+            logger.debug(f"Полный ответ: {response.text}")
+            return None
+    
     def get_campaigns(self) -> List[Dict]:
         """Получение списка кампаний"""
         response = self._make_request("GET", "/campaigns")
@@ -75,6 +108,13 @@ class YandexMarketOAuthAPI:
             return response["campaigns"]
         return []
     
+    async def get_campaigns_async(self) -> List[Dict]:
+        """Асинхронное получение списка кампаний"""
+        response = await self._make_request_async("GET", "/campaigns")
+        if response and "campaigns" in response:
+            return response["campaigns"]
+        return []
+    
     def search_products(
         self,
         query: str,
@@ -129,6 +169,62 @@ class YandexMarketOAuthAPI:
             logger.info(f"Пробую получить офферы из кампании {cid}")
             response = self._make_request("GET", endpoint, params=params)
         
+        return self._parse_search_response(response, query, limit)
+    
+    async def search_products_async(
+        self,
+        query: str,
+        limit: int = 10,
+        category_id: Optional[int] = None,
+        campaign_id: Optional[str] = None
+    ) -> List[ProductData]:
+        """
+        Асинхронный поиск товаров в Яндекс.Маркет (как search_products)
+        
+        Args:
+            query: Поисковый запрос
+            limit: Количество товаров
+            category_id: ID категории (опционально)
+            campaign_id: ID кампании (если не указан, используется self.campaign_id)
+        
+        Returns:
+            Список товаров ProductData
+        """
+        params = {
+            "query": query,
+            "count": min(limit, 30),
+            "page": 1
+        }
+        if category_id:
+            params["categoryId"] = category_id
+        
+        cid = campaign_id or self.campaign_id
+        if not cid:
+            campaigns = await self.get_campaigns_async()
+            if campaigns:
+                cid = str(campaigns[0].get("id", ""))
+                self.campaign_id = cid
+                logger.info(f"Автоматически получен campaign_id: {cid}")
+        
+        response = None
+        if cid:
+            logger.info(f"Пробую получить офферы из кампании {cid}")
+            response = await self._make_request_async("GET", f"/campaigns/{cid}/offers", params=params)
+        
+        return self._parse_search_response(response, query, limit)
+    
+    def _parse_search_response(self, response: Optional[Dict], query: str, limit: int) -> List[ProductData]:
+        """
+        Преобразование ответа API в товары
+        
+        Args:
+            response: Ответ API (None, если запрос не удался)
+            query: Поисковый запрос
+            limit: Количество товаров
+        
+        Returns:
+            Список товаров ProductData
+        """
         if not response:
             logger.warning(f"Не удалось получить данные через Partner API по запросу '{query}'")
             logger.info("Примечание: Partner API предназначен для работы с собственными товарами продавца.")
@@ -274,7 +370,6 @@ class YandexMarketOAuthAPI:
         Используется, если Partner API недоступен
         """
         try:
-            import requests
             from bs4 import BeautifulSoup
             
             # URL поиска Яндекс.Маркет
@@ -285,7 +380,7 @@ class YandexMarketOAuthAPI:
             }
             
             logger.info(f"Парсинг товаров с {search_url}")
-            response = requests.get(search_url, headers=headers, timeout=15)
+            response = self.session.get(search_url, headers=headers, timeout=get_http_timeout(15))
             
             if response.status_code != 200:
                 logger.warning(f"Ошибка парсинга: {response.status_code}")
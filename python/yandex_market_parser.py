@@ -2,14 +2,27 @@
 Парсер для получения товаров с Яндекс.Маркет через веб-интерфейс
 Используется как альтернатива API, когда Partner API недоступен
 """
+import asyncio
+import os
 import requests
 import logging
 import re
+import time
+import urllib.parse
 from typing import List, Optional
 from datetime import datetime
 from bs4 import BeautifulSoup
 
+from core.browser_pool import BrowserPool, BrowserPoolTimeout
+from core.http_session import (
+    ASYNC_HTTP_AVAILABLE,
+    get_async_http_client,
+    get_async_http_timeout,
+    get_http_session,
+    get_http_timeout
+)
 from data_providers import ProductData
+from yandex_market_extractor import LXML_AVAILABLE, YandexMarketExtractor, brand_and_model, parse_json_product
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +32,19 @@ class YandexMarketParser:
     
     BASE_URL = "https://market.yandex.ru"
     
+    # Поисковые запросы для популярных товаров по категориям
+    POPULAR_CATEGORY_QUERIES = {
+        "электроника": ["смартфон", "телефон"],
+        "компьютеры": ["ноутбук", "компьютер"],
+        "аудио": ["наушники", "колонка"]
+    }
+    
+    # Ресурсы, которые браузер Selenium не загружает (картинки, шрифты, стили)
+    SELENIUM_BLOCKED_URLS = [
+        "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico",
+        "*.woff", "*.woff2", "*.ttf", "*.otf", "*.css"
+    ]
+    
     def __init__(self, use_selenium: bool = False):
         """
         Инициализация парсера
@@ -31,48 +57,83 @@ class YandexMarketParser:
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
             "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
             "Accept-Language": "ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7",
-            "Accept-Encoding": "gzip, deflate, br",
             "Connection": "keep-alive",
             "Upgrade-Insecure-Requests": "1"
         }
+        # Общая сессия с пулом соединений (Accept-Encoding задает сессия)
+        self.session = get_http_session()
+        # Быстрый разбор страниц через lxml (без него - BeautifulSoup)
+        self.extractor = YandexMarketExtractor(self.BASE_URL) if LXML_AVAILABLE else None
         
-        self.selenium_driver = None
+        # Пул прогретых браузеров (браузер не закрывается после каждого поиска)
+        self.browser_pool: Optional[BrowserPool] = None
         if use_selenium:
             try:
-                from selenium import webdriver
-                from selenium.webdriver.chrome.options import Options
-                from selenium.webdriver.chrome.service import Service
-                from selenium.webdriver.common.by import By
-                from selenium.webdriver.support.ui import WebDriverWait
-                from selenium.webdriver.support import expected_conditions as EC
-                
-                chrome_options = Options()
-                chrome_options.add_argument('--headless')
-                chrome_options.add_argument('--no-sandbox')
-                chrome_options.add_argument('--disable-dev-shm-usage')
-                chrome_options.add_argument('--disable-gpu')
-                chrome_options.add_argument('--disable-blink-features=AutomationControlled')
-                chrome_options.add_argument(f'user-agent={self.headers["User-Agent"]}')
-                chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
-                chrome_options.add_experimental_option('useAutomationExtension', False)
-                
-                # Пробуем использовать webdriver-manager для автоматической установки драйвера
-                try:
-                    from webdriver_manager.chrome import ChromeDriverManager
-                    service = Service(ChromeDriverManager().install())
-                    self.selenium_driver = webdriver.Chrome(service=service, options=chrome_options)
-                    logger.info("✅ Selenium WebDriver инициализирован (с автоматической установкой драйвера)")
-                except ImportError:
-                    # Если webdriver-manager не установлен, пробуем использовать системный ChromeDriver
-                    logger.info("webdriver-manager не найден, пробую использовать системный ChromeDriver")
-                    self.selenium_driver = webdriver.Chrome(options=chrome_options)
-                    logger.info("✅ Selenium WebDriver инициализирован (используется системный драйвер)")
+                self.browser_pool = BrowserPool(
+                    self._create_selenium_driver,
+                    size=int(os.getenv("SELENIUM_POOL_SIZE", "2")),
+                    max_pages=int(os.getenv("SELENIUM_MAX_PAGES", "50")),
+                    checkout_timeout=float(os.getenv("SELENIUM_CHECKOUT_TIMEOUT", "30"))
+                )
+                # Первый браузер запускаем сразу: заодно проверяем, что Selenium работает
+                self.browser_pool.warm(1)
             except Exception as e:
                 logger.warning(f"Selenium недоступен: {e}. Использую обычный парсинг.")
                 logger.warning("Для установки Selenium выполните: pip install selenium webdriver-manager")
                 logger.warning("Также убедитесь, что установлен Google Chrome")
+                self.browser_pool = None
                 self.use_selenium = False
     
+    def _create_selenium_driver(self):
+        """
+        Запуск headless Chrome для пула
+        
+        Картинки, шрифты и CSS не загружаются: для разбора нужна только разметка.
+        """
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
+        from selenium.webdriver.chrome.service import Service
+        
+        chrome_options = Options()
+        chrome_options.add_argument('--headless')
+        chrome_options.add_argument('--no-sandbox')
+        chrome_options.add_argument('--disable-dev-shm-usage')
+        chrome_options.add_argument('--disable-gpu')
+        chrome_options.add_argument('--disable-blink-features=AutomationControlled')
+        chrome_options.add_argument('--blink-settings=imagesEnabled=false')
+        chrome_options.add_argument(f'user-agent={self.headers["User-Agent"]}')
+        chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
+        chrome_options.add_experimental_option('useAutomationExtension', False)
+        chrome_options.add_experimental_option("prefs", {
+            "profile.managed_default_content_settings.images": 2,
+            "profile.managed_default_content_settings.fonts": 2
+        })
+        
+        # Пробуем использовать webdriver-manager для автоматической установки драйвера
+        try:
+            from webdriver_manager.chrome import ChromeDriverManager
+            service = Service(ChromeDriverManager().install())
+            driver = webdriver.Chrome(service=service, options=chrome_options)
+            logger.info("✅ Selenium WebDriver инициализирован (с автоматической установкой драйвера)")
+        except ImportError:
+            # Если webdriver-manager не установлен, пробуем использовать системный ChromeDriver
+            logger.info("webdriver-manager не найден, пробую использовать системный ChromeDriver")
+            driver = webdriver.Chrome(options=chrome_options)
+            logger.info("✅ Selenium WebDriver инициализирован (используется системный драйвер)")
+        
+        # Блокировка загрузки картинок, шрифтов и стилей через DevTools
+        try:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": self.SELENIUM_BLOCKED_URLS})
+        except Exception as e:
+            logger.debug(f"Не удалось заблокировать загрузку ресурсов: {e}")
+        return driver
+    
+    def close(self) -> None:
+        """Закрытие браузеров пула Selenium"""
+        if self.browser_pool is not None:
+            self.browser_pool.close()
+    
     def search_products(self, query: str, limit: int = 10) -> List[ProductData]:
         """
         Поиск товаров на Яндекс.Маркет
@@ -85,14 +146,7 @@ class YandexMarketParser:
             Список товаров ProductData
         """
         try:
-            # Формируем URL поиска
-            search_url = f"{self.BASE_URL}/search"
-            params = {
-                "text": query,
-                "how": "aprice",  # Сортировка по цене (от дешевых к дорогим)
-                "local-offers-first": "0",  # Не приоритизировать локальные предложения
-                "onstock": "1"  # Только товары в наличии
-            }
+            full_url = self._build_search_url(query)
             
             logger.info(f"🔍 Парсинг товаров с Яндекс.Маркет: запрос '{query}'")
             logger.info(f"   Параметры: сортировка по цене, только в наличии")
@@ -100,177 +154,260 @@ class YandexMarketParser:
             html_content = None
             
             # Используем Selenium если доступен
-            if self.use_selenium and self.selenium_driver:
-                try:
-                    logger.info("🌐 Использую Selenium для рендеринга JavaScript...")
-                    # Кодируем запрос для URL
-                    import urllib.parse
-                    encoded_query = urllib.parse.quote(query)
-                    full_url = f"{search_url}?text={encoded_query}&how=aprice&local-offers-first=0"
-                    logger.info(f"   Открываю URL: {full_url}")
-                    
-                    self.selenium_driver.get(full_url)
-                    
-                    # Ждем загрузки контента
-                    from selenium.webdriver.support.ui import WebDriverWait
-                    from selenium.webdriver.support import expected_conditions as EC
-                    from selenium.webdriver.common.by import By
-                    
-                    try:
-                        logger.info("   Ожидание загрузки товаров...")
-                        WebDriverWait(self.selenium_driver, 15).until(
-                            EC.presence_of_element_located((By.CSS_SELECTOR, "[data-zone-name*='product'], [data-zone-name*='snippet'], [data-zone-name*='offer']"))
-                        )
-                        logger.info("   Товары загружены")
-                    except Exception as e:
-                        logger.warning(f"   Таймаут ожидания элементов: {e}, продолжаю...")
-                        # Даем еще немного времени на загрузку
-                        import time
-                        time.sleep(2)
-                    
-                    html_content = self.selenium_driver.page_source
-                    logger.info(f"✅ Страница загружена через Selenium, размер HTML: {len(html_content)} символов")
-                except Exception as e:
-                    logger.warning(f"⚠️ Ошибка Selenium: {e}, пробую обычный запрос", exc_info=True)
+            if self.use_selenium and self.browser_pool:
+                html_content = self._fetch_html_selenium(full_url)
             
             # Если Selenium не использовался или не сработал, используем requests
             if not html_content:
-                try:
-                    import urllib.parse
-                    encoded_query = urllib.parse.quote(query)
-                    full_url = f"{search_url}?text={encoded_query}&how=aprice&local-offers-first=0"
-                    logger.info(f"📡 Отправка HTTP запроса к Яндекс.Маркет...")
-                    logger.info(f"   URL: {full_url}")
-                    
-                    response = requests.get(full_url, headers=self.headers, timeout=20, allow_redirects=True)
-                    
-                    if response.status_code != 200:
-                        logger.error(f"❌ Ошибка при запросе: HTTP {response.status_code}")
-                        logger.error(f"   Ответ сервера (первые 500 символов): {response.text[:500]}")
-                        return []
-                    
-                    html_content = response.text
-                    logger.info(f"✅ Получен HTML контент, размер: {len(html_content)} символов")
-                    
-                    # Проверяем, не вернулась ли капча или блокировка
-                    if 'captcha' in html_content.lower() or 'робот' in html_content.lower():
-                        logger.warning("⚠️ Возможно, Яндекс.Маркет требует капчу. Рекомендуется использовать Selenium.")
-                    if len(html_content) < 1000:
-                        logger.warning(f"⚠️ Получен очень короткий HTML ({len(html_content)} символов), возможно, страница не загрузилась")
-                except requests.exceptions.Timeout:
-                    logger.error("Таймаут при запросе к Яндекс.Маркет")
-                    return []
-                except requests.exceptions.ConnectionError as e:
-                    logger.error(f"Ошибка подключения к Яндекс.Маркет: {e}")
-                    return []
-                except requests.exceptions.RequestException as e:
-                    logger.error(f"Ошибка запроса к Яндекс.Маркет: {e}")
+                html_content = self._fetch_html(full_url)
+                if html_content is None:
                     return []
             
-            # Парсим HTML
-            if not html_content or len(html_content) < 100:
-                logger.warning("Получен пустой или слишком короткий HTML контент")
-                return []
+            return self._parse_search_html(html_content, query, limit)
             
-            soup = BeautifulSoup(html_content, 'html.parser')
-            products = []
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Ошибка запроса к Яндекс.Маркет: {e}")
+            return []
+        except Exception as e:
+            logger.error(f"Ошибка парсинга: {e}", exc_info=True)
+            return []
+    
+    async def search_products_async(self, query: str, limit: int = 10) -> List[ProductData]:
+        """
+        Асинхронный поиск товаров на Яндекс.Маркет (как search_products)
+        
+        Страница загружается общим асинхронным HTTP-клиентом без занятия потока,
+        разбор HTML выполняется в пуле потоков, чтобы не блокировать event loop.
+        С Selenium (или без httpx) вызывается search_products в пуле потоков.
+        
+        Args:
+            query: Поисковый запрос
+            limit: Количество товаров
+        
+        Returns:
+            Список товаров ProductData
+        """
+        if (self.use_selenium and self.browser_pool) or not ASYNC_HTTP_AVAILABLE:
+            return await asyncio.to_thread(self.search_products, query, limit)
+        
+        try:
+            full_url = self._build_search_url(query)
+            logger.info(f"🔍 Парсинг товаров с Яндекс.Маркет (async): запрос '{query}'")
             
-            logger.info(f"HTML распарсен, ищем товары...")
+            html_content = await self._fetch_html_async(full_url)
+            if html_content is None:
+                return []
             
-            # Метод 1: Поиск данных в JSON (часто Яндекс.Маркет встраивает данные в script теги)
-            json_products = self._extract_from_json(soup)
-            if json_products:
-                logger.info(f"Найдено {len(json_products)} товаров в JSON данных")
-                products.extend(json_products[:limit])
+            return await asyncio.to_thread(self._parse_search_html, html_content, query, limit)
+        except Exception as e:
+            logger.error(f"Ошибка парсинга: {e}", exc_info=True)
+            return []
+    
+    def _build_search_url(self, query: str) -> str:
+        """URL поиска: сортировка по цене (от дешевых к дорогим), без приоритета локальных предложений"""
+        encoded_query = urllib.parse.quote(query)
+        return f"{self.BASE_URL}/search?text={encoded_query}&how=aprice&local-offers-first=0"
+    
+    def _fetch_html_selenium(self, full_url: str) -> Optional[str]:
+        """Загрузка страницы через Selenium (с рендерингом JavaScript) в браузере из пула"""
+        try:
+            logger.info("🌐 Использую Selenium для рендеринга JavaScript...")
+            logger.info(f"   Открываю URL: {full_url}")
             
-            # Метод 2: Поиск в HTML структуре
-            product_elements = []
-            if len(products) < limit:
-                product_elements = self._find_product_elements(soup)
-                logger.info(f"Найдено {len(product_elements)} элементов товаров в HTML")
+            # Ждем загрузки контента
+            from selenium.webdriver.support.ui import WebDriverWait
+            from selenium.webdriver.support import expected_conditions as EC
+            from selenium.webdriver.common.by import By
             
-            # Парсим элементы товаров из HTML
-            parsed_count = 0
-            failed_count = 0
-            for element in product_elements[:limit * 2]:  # Пробуем больше элементов, т.к. не все могут распарситься
+            with self.browser_pool.browser() as driver:
+                driver.get(full_url)
+                
                 try:
-                    product = self._parse_product_element(element, query)
-                    if product:
-                        if product not in products:  # Избегаем дубликатов
-                            products.append(product)
-                            parsed_count += 1
-                            logger.debug(f"Успешно распарсен товар: {product.title[:50]}")
-                        if len(products) >= limit:
-                            break
-                    else:
-                        failed_count += 1
+                    logger.info("   Ожидание загрузки товаров...")
+                    WebDriverWait(driver, 15).until(
+                        EC.presence_of_element_located((By.CSS_SELECTOR, "[data-zone-name*='product'], [data-zone-name*='snippet'], [data-zone-name*='offer']"))
+                    )
+                    logger.info("   Товары загружены")
                 except Exception as e:
-                    failed_count += 1
-                    logger.debug(f"Ошибка парсинга элемента товара: {e}")
-                    continue
-            
-            if parsed_count == 0 and failed_count > 0:
-                logger.warning(f"Найдено {len(product_elements)} элементов, но не удалось распарсить ни одного")
-                logger.warning("Возможные причины:")
-                logger.warning("  1. Изменилась структура HTML Яндекс.Маркет")
-                logger.warning("  2. Элементы не содержат необходимых данных (название, цена)")
-                logger.warning("  3. Требуется JavaScript для загрузки данных (нужен Selenium)")
-            
-            # Удаляем дубликаты по названию
-            seen_titles = set()
-            unique_products = []
-            for product in products:
-                if product.title not in seen_titles:
-                    seen_titles.add(product.title)
-                    unique_products.append(product)
-            products = unique_products
-            
-            if products:
-                logger.info(f"✅ Успешно распарсено {len(products)} товаров")
-            else:
-                logger.warning("=" * 80)
-                logger.warning("⚠️ Не удалось найти товары на странице. Возможные причины:")
-                logger.warning("   1. Изменилась структура HTML Яндекс.Маркет")
-                logger.warning("   2. Страница требует JavaScript (нужен Selenium)")
-                logger.warning("   3. Блокировка запросов со стороны Яндекс.Маркет")
-                logger.warning("   4. Страница возвращает капчу или требует авторизацию")
-                logger.warning("=" * 80)
-                
-                # Логируем информацию для отладки
-                logger.debug(f"Размер HTML: {len(html_content)} символов")
-                logger.debug(f"Найдено элементов для парсинга: {len(product_elements)}")
+                    logger.warning(f"   Таймаут ожидания элементов: {e}, продолжаю...")
+                    # Даем еще немного времени на загрузку
+                    time.sleep(2)
                 
-                # Сохраняем HTML для отладки (первые 5000 символов)
-                if len(html_content) > 0:
-                    logger.debug(f"HTML контент (первые 5000 символов):\n{html_content[:5000]}")
-                    
-                    # Пробуем найти ключевые слова в HTML
-                    if 'product' in html_content.lower():
-                        logger.debug("✅ В HTML найдено слово 'product'")
-                    if 'offer' in html_content.lower():
-                        logger.debug("✅ В HTML найдено слово 'offer'")
-                    if 'snippet' in html_content.lower():
-                        logger.debug("✅ В HTML найдено слово 'snippet'")
-                    if 'data-zone-name' in html_content:
-                        logger.debug("✅ В HTML найдены data-zone-name атрибуты")
-                    else:
-                        logger.warning("⚠️ В HTML НЕ найдены data-zone-name атрибуты - возможно, структура изменилась")
-            
-            return products
+                html_content = driver.page_source
+            logger.info(f"✅ Страница загружена через Selenium, размер HTML: {len(html_content)} символов")
+            return html_content
+        except BrowserPoolTimeout as e:
+            logger.warning(f"⚠️ {e}, пробую обычный запрос")
+            return None
+        except Exception as e:
+            logger.warning(f"⚠️ Ошибка Selenium: {e}, пробую обычный запрос", exc_info=True)
+            return None
+    
+    def _fetch_html(self, full_url: str) -> Optional[str]:
+        """Загрузка страницы обычным HTTP-запросом (None при ошибке)"""
+        try:
+            logger.info(f"📡 Отправка HTTP запроса к Яндекс.Маркет...")
+            logger.info(f"   URL: {full_url}")
+            
+            response = self.session.get(full_url, headers=self.headers, timeout=get_http_timeout(20), allow_redirects=True)
+            
+            if response.status_code != 200:
+                logger.error(f"❌ Ошибка при запросе: HTTP {response.status_code}")
+                logger.error(f"   Ответ сервера (первые 500 символов): {response.text[:500]}")
+                return None
             
+            html_content = response.text
+            self._check_html(html_content)
+            return html_content
+        except requests.exceptions.Timeout:
+            logger.error("Таймаут при запросе к Яндекс.Маркет")
+            return None
+        except requests.exceptions.ConnectionError as e:
+            logger.error(f"Ошибка подключения к Яндекс.Маркет: {e}")
+            return None
         except requests.exceptions.RequestException as e:
             logger.error(f"Ошибка запроса к Яндекс.Маркет: {e}")
-            return []
+            return None
+    
+    async def _fetch_html_async(self, full_url: str) -> Optional[str]:
+        """Асинхронная загрузка страницы (None при ошибке)"""
+        try:
+            logger.info(f"📡 Отправка HTTP запроса к Яндекс.Маркет (async): {full_url}")
+            client = get_async_http_client()
+            response = await client.get(full_url, headers=self.headers, timeout=get_async_http_timeout(20))
+            
+            if response.status_code != 200:
+                logger.error(f"❌ Ошибка при запросе: HTTP {response.status_code}")
+                logger.error(f"   Ответ сервера (первые 500 символов): {response.text[:500]}")
+                return None
+            
+            html_content = response.text
+            self._check_html(html_content)
+            return html_content
         except Exception as e:
-            logger.error(f"Ошибка парсинга: {e}", exc_info=True)
+            logger.error(f"Ошибка запроса к Яндекс.Маркет: {e}")
+            return None
+    
+    @staticmethod
+    def _check_html(html_content: str) -> None:
+        """Предупреждения о капче и недогруженной странице"""
+        logger.info(f"✅ Получен HTML контент, размер: {len(html_content)} символов")
+        
+        # Проверяем, не вернулась ли капча или блокировка
+        if 'captcha' in html_content.lower() or 'робот' in html_content.lower():
+            logger.warning("⚠️ Возможно, Яндекс.Маркет требует капчу. Рекомендуется использовать Selenium.")
+        if len(html_content) < 1000:
+            logger.warning(f"⚠️ Получен очень короткий HTML ({len(html_content)} символов), возможно, страница не загрузилась")
+    
+    def _parse_search_html(self, html_content: str, query: str, limit: int) -> List[ProductData]:
+        """
+        Разбор страницы поиска
+        
+        Args:
+            html_content: HTML страницы
+            query: Поисковый запрос
+            limit: Количество товаров
+        
+        Returns:
+            Список товаров ProductData
+        """
+        if not html_content or len(html_content) < 100:
+            logger.warning("Получен пустой или слишком короткий HTML контент")
             return []
-        finally:
-            # Закрываем Selenium если использовали
-            if self.use_selenium and self.selenium_driver:
-                try:
-                    self.selenium_driver.quit()
-                except:
-                    pass
+        
+        if self.extractor is not None:
+            products = self.extractor.extract(html_content, query, limit)
+        else:
+            products = self._extract_with_soup(html_content, query, limit)
+        
+        # Удаляем дубликаты по названию
+        seen_titles = set()
+        unique_products = []
+        for product in products:
+            if product.title not in seen_titles:
+                seen_titles.add(product.title)
+                unique_products.append(product)
+        products = unique_products
+        
+        if products:
+            logger.info(f"✅ Успешно распарсено {len(products)} товаров")
+        else:
+            logger.warning("=" * 80)
+            logger.warning("⚠️ Не удалось найти товары на странице. Возможные причины:")
+            logger.warning("   1. Изменилась структура HTML Яндекс.Маркет")
+            logger.warning("   2. Страница требует JavaScript (нужен Selenium)")
+            logger.warning("   3. Блокировка запросов со стороны Яндекс.Маркет")
+            logger.warning("   4. Страница возвращает капчу или требует авторизацию")
+            logger.warning("=" * 80)
+            
+            # Логируем информацию для отладки
+            logger.debug(f"Размер HTML: {len(html_content)} символов")
+            
+            # Сохраняем HTML для отладки (первые 5000 символов)
+            if len(html_content) > 0:
+                logger.debug(f"HTML контент (первые 5000 символов):\n{html_content[:5000]}")
+                
+                # Пробуем найти ключевые слова в HTML
+                if 'product' in html_content.lower():
+                    logger.debug("✅ В HTML найдено слово 'product'")
+                if 'offer' in html_content.lower():
+                    logger.debug("✅ В HTML найдено слово 'offer'")
+                if 'snippet' in html_content.lower():
+                    logger.debug("✅ В HTML найдено слово 'snippet'")
+                if 'data-zone-name' in html_content:
+                    logger.debug("✅ В HTML найдены data-zone-name атрибуты")
+                else:
+                    logger.warning("⚠️ В HTML НЕ найдены data-zone-name атрибуты - возможно, структура изменилась")
+        
+        return products
+    
+    def _extract_with_soup(self, html_content: str, query: str, limit: int) -> List[ProductData]:
+        """Извлечение товаров через BeautifulSoup (если lxml не установлен)"""
+        soup = BeautifulSoup(html_content, 'html.parser')
+        products = []
+        
+        logger.info(f"HTML распарсен, ищем товары...")
+        
+        # Метод 1: Поиск данных в JSON (часто Яндекс.Маркет встраивает данные в script теги)
+        json_products = self._extract_from_json(soup)
+        if json_products:
+            logger.info(f"Найдено {len(json_products)} товаров в JSON данных")
+            products.extend(json_products[:limit])
+        
+        # Метод 2: Поиск в HTML структуре
+        product_elements = []
+        if len(products) < limit:
+            product_elements = self._find_product_elements(soup)
+            logger.info(f"Найдено {len(product_elements)} элементов товаров в HTML")
+        
+        # Парсим элементы товаров из HTML
+        parsed_count = 0
+        failed_count = 0
+        for element in product_elements[:limit * 2]:  # Пробуем больше элементов, т.к. не все могут распарситься
+            try:
+                product = self._parse_product_element(element, query)
+                if product:
+                    if product not in products:  # Избегаем дубликатов
+                        products.append(product)
+                        parsed_count += 1
+                        logger.debug(f"Успешно распарсен товар: {product.title[:50]}")
+                    if len(products) >= limit:
+                        break
+                else:
+                    failed_count += 1
+            except Exception as e:
+                failed_count += 1
+                logger.debug(f"Ошибка парсинга элемента товара: {e}")
+                continue
+        
+        if parsed_count == 0 and failed_count > 0:
+            logger.warning(f"Найдено {len(product_elements)} элементов, но не удалось распарсить ни одного")
+            logger.warning("Возможные причины:")
+            logger.warning("  1. Изменилась структура HTML Яндекс.Маркет")
+            logger.warning("  2. Элементы не содержат необходимых данных (название, цена)")
+            logger.warning("  3. Требуется JavaScript для загрузки данных (нужен Selenium)")
+        
+        return products
     
     def _extract_from_json(self, soup: BeautifulSoup) -> List[ProductData]:
         """Извлечение товаров из JSON данных, встроенных в HTML"""
@@ -323,61 +460,7 @@ class YandexMarketParser:
     
     def _parse_json_product(self, item: dict) -> Optional[ProductData]:
         """Парсинг товара из JSON структуры"""
-        try:
-            title = item.get('name') or item.get('title') or item.get('offerName', '')
-            if not title:
-                return None
-            
-            # Цена
-            price = 0
-            price_data = item.get('price', {})
-            if isinstance(price_data, dict):
-                price = float(price_data.get('value', 0) or price_data.get('amount', 0))
-            elif price_data:
-                price = float(price_data)
-            
-            if price <= 0:
-                return None
-            
-            # URL
-            url = item.get('url') or item.get('link') or item.get('offerUrl', '')
-            if url and not url.startswith('http'):
-                url = f"{self.BASE_URL}{url}" if url.startswith('/') else f"{self.BASE_URL}/{url}"
-            
-            # Изображение
-            image = ""
-            if 'pictures' in item and item['pictures']:
-                image = item['pictures'][0].get('url', '') or item['pictures'][0].get('original', '')
-            elif 'image' in item:
-                image = item['image']
-            
-            # Бренд и модель
-            brand = item.get('vendor', {}).get('name', '') if isinstance(item.get('vendor'), dict) else (item.get('vendor') or '')
-            model = item.get('model', {}).get('name', '') if isinstance(item.get('model'), dict) else (item.get('model') or '')
-            
-            # Если нет бренда, извлекаем из названия
-            if not brand:
-                common_brands = ["Samsung", "Apple", "Xiaomi", "Huawei", "OnePlus", "Google", "Sony", "LG", "ASUS", "Lenovo"]
-                for b in common_brands:
-                    if b.lower() in title.lower():
-                        brand = b
-                        break
-            
-            return ProductData(
-                title=title,
-                brand=brand or "Не указан",
-                model=model or "Не указана",
-                price=price,
-                shop_name="Яндекс.Маркет",
-                url=url or f"{self.BASE_URL}/search",
-                image=image,
-                description=item.get('description', ''),
-                product_id=str(item.get('id', '')),
-                scraped_at=datetime.utcnow()
-            )
-        except Exception as e:
-            logger.debug(f"Ошибка парсинга JSON товара: {e}")
-            return None
+        return parse_json_product(item, self.BASE_URL)
     
     def _find_product_elements(self, soup: BeautifulSoup) -> List:
         """Поиск элементов товаров в HTML"""
@@ -549,42 +632,7 @@ class YandexMarketParser:
                     image = f"https:{image}" if image.startswith('//') else image
             
             # Бренд и модель из названия
-            brand = ""
-            model = ""
-            
-            # Список популярных брендов
-            common_brands = [
-                "Samsung", "Apple", "Xiaomi", "Huawei", "OnePlus", "Google", "Sony", "LG", 
-                "ASUS", "Lenovo", "Honor", "Realme", "Oppo", "Vivo", "Nokia", "Motorola",
-                "JBL", "Sennheiser", "Bose", "AirPods", "Beats", "HyperX", "Razer"
-            ]
-            
-            title_lower = title.lower()
-            for b in common_brands:
-                if b.lower() in title_lower:
-                    brand = b
-                    # Пытаемся извлечь модель после бренда
-                    brand_pos = title_lower.find(b.lower())
-                    if brand_pos >= 0:
-                        model_part = title[brand_pos + len(b):].strip()
-                        # Берем первые слова как модель
-                        model_words = model_part.split()[:3]
-                        model = ' '.join(model_words).strip()
-                    break
-            
-            # Если бренд не найден, пробуем извлечь из начала названия
-            words = title.split()  # Определяем words заранее
-            if not brand and words:
-                first_word = words[0]
-                # Проверяем, может это бренд
-                if any(b.lower() == first_word.lower() for b in common_brands):
-                    brand = first_word
-                    model = ' '.join(words[1:4]) if len(words) > 1 else ""
-            
-            # Если все еще нет бренда, используем первое слово как бренд
-            if not brand and words:
-                brand = words[0]
-                model = ' '.join(words[1:4]) if len(words) > 1 else ""
+            brand, model = brand_and_model(title)
             
             return ProductData(
                 title=title,
@@ -614,12 +662,6 @@ class YandexMarketParser:
         Returns:
             Список популярных товаров
         """
-        search_queries = {
-            "электроника": ["смартфон", "телефон"],
-            "компьютеры": ["ноутбук", "компьютер"],
-            "аудио": ["наушники", "колонка"]
-        }
-        
-        query = search_queries.get(category, ["смартфон"])[0]
+        query = self.POPULAR_CATEGORY_QUERIES.get(category, ["смартфон"])[0]
         return self.search_products(query=query, limit=limit)
 